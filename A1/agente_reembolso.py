@@ -1,14 +1,18 @@
 import os
+import re
 import sys
+import time
+import uuid
+import atexit
 import asyncio
+import threading
 from dotenv import load_dotenv
 
 load_dotenv()
 
 from agno.agent import Agent
+from agno.run.agent import RunEvent
 from agno.tools import tool
-from agno.models.azure.openai_chat import AzureOpenAI
-from agno.knowledge.embedder.azure_openai import AzureOpenAIEmbedder
 #from agno.knowledge.embedder.sentence_transformer import SentenceTransformerEmbedder
 from agno.knowledge.reader.pdf_reader import PDFReader
 from agno.knowledge.knowledge import Knowledge
@@ -19,6 +23,96 @@ from agno.db.sqlite.sqlite import SqliteDb
 from agno.memory import MemoryManager, UserMemory
 from agno.db.base import BaseDb
 
+# Ingestão incremental (manifesto com hash do documento)
+from ingestao import ingerir_documento
+
+# Ingestão em fluxo para arquivos grandes (páginas em paralelo, lotes com backpressure)
+from ingestao_fluxo import ingerir_em_fluxo, usar_fluxo, INGESTAO_LOTE
+
+# Índice ANN, compactação e limpeza de versões do LanceDB
+from indice_lancedb import manter_indice, buscar_filtrado, LANCEDB_NPROBES
+
+# Corpus com vários documentos/versões (opcional, CORPUS_DIR)
+from corpus import (CORPUS_DIR, CORPUS_INTERVALO_SEGUNDOS, carregar_corpus, aplicar_versoes,
+                    observar_corpus, identificar_versao)
+
+# Cache semântico de respostas (perguntas frequentes sem chamar o LLM)
+from cache_respostas import CacheSemantico
+
+# Memórias e resumos em segundo plano (a resposta não espera por eles)
+from memoria_adiada import FilaMemoria
+
+# Histórico com tamanho fixo (últimos turnos + resumo incremental)
+from historico import GerenciadorHistorico
+
+# Busca híbrida (BM25 + vetores) e reranker opcional
+from busca_hibrida import tipo_busca, criar_reordenador, RERANKER_CANDIDATOS
+
+# Embeddings na própria máquina (opcional, EMBEDDINGS_BACKEND=local ou onnx)
+from embeddings_locais import EmbedderLocal
+
+# Motor de cálculo compartilhado com o A3 (pasta comum/ na raiz do repositório)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "comum"))
+from motor_reembolso import calcular, formatar_reais, formatar_percentual, TETO_APROVACAO, para_centavos
+
+# Fatos da política (prazos, imposto, teto) lidos do .txt uma vez, em memória
+from politica import carregar_fatos
+
+# Clientes de modelo compartilhados (pool de conexões + limite por deployment), também usados pelo A2
+from clientes_modelo import criar_modelo_chat, criar_embedder, executar_async
+
+# Métricas de latência/tokens por etapa e por usuário (comando "stats" e endpoint /metrics)
+from metricas import metricas, usuario_atual, iniciar_servidor_metricas
+
+
+# Configurações da Knowledge Base
+# Se qualquer uma delas mudar, o manifesto de ingestão força um novo embedding
+ARQUIVO_POLITICA = "politica_reembolso_v1.0.pdf"
+EMBEDDER_DEPLOYMENT = "text-embedding-3-large"
+
+# "azure" (padrão) usa o deployment acima; "local" / "onnx" usam o EmbedderLocal (CPU, sem rede)
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "azure")
+
+# Dimensões reduzidas (ex.: 1024 em vez das 1536 padrão do embedder do Agno): vetores menores
+# no disco e na busca. Nos embeddings locais, só para modelos Matryoshka.
+# 0 (padrão) = não mexe: cada embedder usa a sua dimensão padrão.
+EMBEDDINGS_DIMENSOES = int(os.getenv("EMBEDDINGS_DIMENSOES", "0")) or None
+
+# MEMORIA_ADIADA=0 volta ao modo antigo (memórias e resumo extraídos a cada turno, antes da resposta)
+MEMORIA_ADIADA = os.getenv("MEMORIA_ADIADA", "1") == "1"
+
+# HISTORICO_GERENCIADO=0 volta ao histórico do Agno (conversa inteira, sem limite)
+HISTORICO_GERENCIADO = os.getenv("HISTORICO_GERENCIADO", "1") == "1"
+
+# Chunks = seções numeradas da política ("1) Requisitos", "3) Restrições"...).
+# Vai para o manifesto de ingestão: mudar qualquer item reembeda os documentos.
+# (O índice de texto da busca híbrida não entra aqui: manter_indice cria/apaga sozinho.)
+CONFIG_CHUNKER = {"leitor": "PDFReader", "estrategia": "secoes", "chunk_size": 5000}
+
+
+# Cálculo de Reembolso (regra pura, sem LLM)
+
+def calcular_reembolso(valor: float) -> str:
+    """
+    Aplica a regra de imposto e teto e devolve o texto do resultado.
+    Usada pela ferramenta compute_refund e pelo atalho determinístico.
+    A conta é feita pelo motor compartilhado (centavos exatos); aqui só formatamos.
+    """
+    calculo = calcular(valor)
+    teto = formatar_reais(para_centavos(TETO_APROVACAO))
+
+    resultado = f"""💰 Cálculo de Reembolso
+
+Valor original: {formatar_reais(calculo["valor_centavos"])}
+Imposto ({formatar_percentual()}): {formatar_reais(calculo["imposto_centavos"])}
+Valor final do reembolso: {formatar_reais(calculo["liquido_centavos"])}"""
+    
+    if calculo["precisa_aprovacao"]:
+        resultado += f"\n⚠️ ATENÇÃO: Valor acima de {teto} - Precisa aprovação do Financeiro!"
+    else:
+        resultado += f"\n✅ Reembolso aprovado automaticamente (abaixo de {teto})."
+    return resultado
+
 
 # Ferramenta de Cálculo de Reembolso
 @tool(stop_after_tool_call=False)
@@ -26,26 +120,205 @@ def compute_refund(valor: float):
     """
     Calcula o reembolso considerando imposto e teto máximo, recebe um valor e retorna o resultado do cálculo.
     """
-    percentual_imposto: float = 15.0
-    teto: float = 1000.0
+    return calcular_reembolso(valor)
 
-    imposto = valor * (percentual_imposto / 100)
-    valor_final = valor - imposto
 
-    precisa_aprovacao = valor_final > teto
-  
 
-    resultado = f"""💰 Cálculo de Reembolso
+# Atalho determinístico para pedidos de cálculo
+# "Calcule o reembolso de R$ 1.250,00" não precisa de LLM: reconhecemos o valor em reais
+# e a intenção de cálculo e chamamos a regra direto. Na dúvida, devolvemos None e o agente responde.
 
-Valor original: R$ {valor}
-Imposto (15%): R$ {imposto}
-Valor final do reembolso: R$ {valor_final}"""
-    
-    if precisa_aprovacao:
-        resultado += f"\n⚠️ ATENÇÃO: Valor acima de R$ {teto} - Precisa aprovação do Financeiro!"
-    else:
-        resultado += f"\n✅ Reembolso aprovado automaticamente (abaixo de R$ {teto})."
-    return resultado
+PADRAO_VALOR_REAIS = re.compile(r"R\$\s*(\d{1,3}(?:\.\d{3})+(?:,\d{1,2})?|\d+(?:[.,]\d{1,2})?)(?![\d.,]*\d)", re.IGNORECASE)
+
+PADRAO_INTENCAO_CALCULO = re.compile(
+    r"\b(calcul\w*|simul\w*|quanto\s+(?:eu\s+)?(?:recebo|receberia|vou receber|fica|ficaria)|valor\s+(?:final|l[ií]quido))\b",
+    re.IGNORECASE,
+)
+
+# Palavras que indicam que a pergunta pede mais do que o cálculo (política, memória, condições)
+# ou traz outra taxa ("com imposto de 10%") - o atalho sempre usa a taxa da política
+PADRAO_AMBIGUO = re.compile(
+    r"\b(prazos?|dias?|devolu\w*|defeito|arrepend\w*|evid\w*|nota|pix|formul\w*|calculei|anterior|[uú]ltimo|meu|minha|se|ou"
+    r"|impostos?|taxas?|al[ií]quotas?|percent\w*|porcent\w*|juros|descontos?|tarifas?)\b",
+    re.IGNORECASE,
+)
+
+
+def converter_valor_reais(texto: str) -> float:
+    """
+    Converte "1.250,00", "1.250", "500", "99,90" ou "99.90" para float.
+    """
+    if "," in texto:
+        return float(texto.replace(".", "").replace(",", "."))
+    if re.fullmatch(r"\d{1,3}(?:\.\d{3})+", texto):
+        return float(texto.replace(".", ""))
+    return float(texto)
+
+
+def responder_calculo_direto(pergunta: str):
+    """
+    Retorna o texto do cálculo se a pergunta for claramente um pedido de cálculo
+    com um único valor em reais; senão retorna None (o agente responde).
+    """
+    valores = PADRAO_VALOR_REAIS.findall(pergunta)
+    if len(valores) != 1:
+        return None
+    if not PADRAO_INTENCAO_CALCULO.search(pergunta) or PADRAO_AMBIGUO.search(pergunta):
+        return None
+    # Fora o valor em reais, qualquer outro número ou % muda o pedido (ex.: "10%", "2 parcelas")
+    if re.search(r"[\d%]", PADRAO_VALOR_REAIS.sub("", pergunta)):
+        return None
+
+    return calcular_reembolso(converter_valor_reais(valores[0]))
+
+
+
+# Atalho determinístico para perguntas sobre fatos da política
+# "Qual o prazo para devolução por defeito?" ou "Qual o teto de aprovação do reembolso?" têm
+# resposta fixa no texto da política: respondemos direto do índice de fatos, sem
+# busca na Knowledge e sem LLM. Perguntas com números, valores ou situação pessoal
+# ("comprei há 10 dias, ainda posso devolver?") continuam indo para o agente.
+
+FATOS_POLITICA = carregar_fatos()
+
+PADRAO_FATO_PERGUNTA_PRAZO = re.compile(r"\b(prazos?|quantos\s+dias|at[eé]\s+quando|quanto\s+tempo|em\s+quanto\s+tempo)\b", re.IGNORECASE)
+PADRAO_FATO_DEVOLUCAO = re.compile(r"\b(devol\w*|arrepend\w*|desist\w*|defeit\w*)\b", re.IGNORECASE)
+PADRAO_FATO_PAGAMENTO = re.compile(r"\b(pix|pagamento|pago|dinheiro|receb\w*|cair)\b", re.IGNORECASE)
+PADRAO_FATO_TETO = re.compile(r"\b(teto|limite|aprova[cç][aã]o|financeiro)\b", re.IGNORECASE)
+PADRAO_FATO_IMPOSTO = re.compile(r"\b(imposto|al[ií]quota|percentual)\b", re.IGNORECASE)
+# "limite" e "percentual" sozinhos podem ser de qualquer coisa (bagagem, hotel, cupom):
+# teto e imposto só valem com o reembolso na mesma pergunta
+PADRAO_FATO_REEMBOLSO = re.compile(r"\b(reembols\w*|devol\w*|estorn\w*)\b", re.IGNORECASE)
+
+# Situação pessoal ou condição: precisa de raciocínio, não só do fato
+PADRAO_FATO_PESSOAL = re.compile(
+    r"(\d|\b(meu|minha|comprei|recebi|posso|consigo|se|mas|ainda|j[aá])\b)",
+    re.IGNORECASE,
+)
+
+# Fora das palavras dos fatos, só estas podem aparecer na pergunta. Qualquer outra
+# ("importados", "digitais", "usado", "cancelamento"...) é um detalhe que a política
+# pode tratar de outro jeito: o agente responde.
+PALAVRAS_NEUTRAS_FATO = frozenset("""
+    qual quais o a os as é e de do da dos das para pra por pelo pela no na nos nas em
+    um uma que quanto quantos quantas tempo dia dias até ate quando tem tenho há ha
+    são sao ser fica vale existe sobre
+    produto produtos compra compras pedido pedidos item itens valor política politica
+""".split())
+
+PADROES_PALAVRAS_FATO = (
+    PADRAO_FATO_PERGUNTA_PRAZO, PADRAO_FATO_DEVOLUCAO, PADRAO_FATO_PAGAMENTO,
+    PADRAO_FATO_TETO, PADRAO_FATO_IMPOSTO, PADRAO_FATO_REEMBOLSO,
+)
+
+
+def _so_palavras_do_fato(pergunta: str) -> bool:
+    # Tira as palavras dos fatos e confere se sobrou só palavra neutra
+    restante = pergunta
+    for padrao in PADROES_PALAVRAS_FATO:
+        restante = padrao.sub(" ", restante)
+    return all(palavra in PALAVRAS_NEUTRAS_FATO for palavra in re.findall(r"\w+", restante.lower()))
+
+
+CAUSAS_DEVOLUCAO = {
+    "arrependimento": re.compile(r"\b(arrepend\w*|desist\w*)\b", re.IGNORECASE),
+    "defeito": re.compile(r"\b(defeit\w*)\b", re.IGNORECASE),
+}
+
+
+def _texto_prazos_devolucao(pergunta: str) -> str:
+    causas = [causa for causa, padrao in CAUSAS_DEVOLUCAO.items()
+              if padrao.search(pergunta) and FATOS_POLITICA.prazo(causa) is not None]
+    causas = causas or list(FATOS_POLITICA.prazos_dias)
+
+    linhas = [f"• Devolução por {causa}: até {FATOS_POLITICA.prazo(causa)} dias" for causa in causas]
+    texto = "📋 Prazo para devolução\n\n" + "\n".join(linhas)
+    if FATOS_POLITICA.contagem_prazo:
+        texto += f"\n\nInício da contagem: {FATOS_POLITICA.contagem_prazo}."
+    return texto
+
+
+def responder_fato_politica(pergunta: str):
+    """
+    Retorna o texto do fato se a pergunta for só sobre um prazo, o imposto ou o teto
+    de aprovação da política; senão retorna None (o agente responde).
+    """
+    if PADRAO_VALOR_REAIS.search(pergunta) or PADRAO_FATO_PESSOAL.search(pergunta):
+        return None
+    if not _so_palavras_do_fato(pergunta):
+        return None  # pergunta com algum detalhe além do fato (tipo de produto, situação...)
+
+    pergunta_prazo = PADRAO_FATO_PERGUNTA_PRAZO.search(pergunta)
+    teto = PADRAO_FATO_TETO.search(pergunta)
+    imposto = PADRAO_FATO_IMPOSTO.search(pergunta)
+    sobre_reembolso = PADRAO_FATO_REEMBOLSO.search(pergunta)
+    assuntos = {
+        "devolucao": bool(pergunta_prazo and PADRAO_FATO_DEVOLUCAO.search(pergunta)),
+        "pagamento": bool(pergunta_prazo and PADRAO_FATO_PAGAMENTO.search(pergunta)),
+        "teto": bool(teto and sobre_reembolso),
+        "imposto": bool(imposto and sobre_reembolso),
+    }
+    encontrados = [assunto for assunto, achou in assuntos.items() if achou]
+    if pergunta_prazo and not (assuntos["devolucao"] or assuntos["pagamento"]):
+        return None  # prazo de quê? o agente pergunta ou procura
+    if (teto or imposto) and not sobre_reembolso:
+        return None  # limite/percentual de outra coisa (bagagem, hotel, cupom...)
+    if len(encontrados) != 1:
+        return None  # nenhum fato, ou mais de um assunto na mesma pergunta
+
+    fatos = FATOS_POLITICA
+    assunto = encontrados[0]
+    if assunto == "devolucao":
+        return _texto_prazos_devolucao(pergunta)
+
+    if assunto == "pagamento":
+        if not fatos.dias_uteis_pagamento:
+            return None
+        texto = "📋 Prazo do reembolso\n\n"
+        if fatos.dias_confirmacao:
+            texto += (f"• Confirmação da possibilidade de reembolso: até {fatos.dias_confirmacao} dias "
+                      "depois do e-mail de recebimento do pedido\n")
+        texto += f"• Pagamento: até {fatos.dias_uteis_pagamento} dias úteis após a confirmação"
+        if fatos.forma_pagamento:
+            texto += f", via {fatos.forma_pagamento}"
+        return texto
+
+    teto = formatar_reais(para_centavos(fatos.teto_aprovacao))
+    imposto = formatar_percentual(fatos.percentual_imposto)
+    if assunto == "teto":
+        return (f"📋 Teto de aprovação\n\nSe o valor final do reembolso (descontado o imposto de {imposto}) "
+                f"for maior que {teto}, o reembolso precisa de aprovação do {fatos.aprovador}.")
+
+    return (f"📋 Imposto\n\nO reembolso tem imposto de {imposto} sobre o valor. "
+            f"Se o valor final passar de {teto}, precisa de aprovação do {fatos.aprovador}.")
+
+
+def resumo_fatos_politica() -> str:
+    """
+    Fatos da política em tópicos curtos (vão nas instruções do agente).
+    """
+    fatos = FATOS_POLITICA
+    linhas = [f"- Devolução por {causa}: máximo de {dias} dias" for causa, dias in fatos.prazos_dias.items()]
+    if fatos.contagem_prazo:
+        linhas.append(f"- Início da contagem dos prazos: {fatos.contagem_prazo}")
+    linhas.append(f"- Imposto de {formatar_percentual(fatos.percentual_imposto)} sobre o valor do reembolso")
+    linhas.append(f"- Valor final acima de {formatar_reais(para_centavos(fatos.teto_aprovacao))} "
+                  f"precisa de aprovação do {fatos.aprovador}")
+    return "\n".join(linhas)
+
+
+def responder_sem_llm(pergunta: str):
+    """
+    Atalhos determinísticos (cálculo claro ou fato da política), com métricas.
+    Retorna o texto ou None se a pergunta precisa do agente.
+    """
+    with metricas.medir("calculo_direto"):
+        calculo = responder_calculo_direto(pergunta)
+    if calculo is not None:
+        return calculo
+
+    with metricas.medir("fato_politica"):
+        return responder_fato_politica(pergunta)
 
 
 
@@ -62,17 +335,33 @@ def carregar_politica():
 
 # Função para carregar Knowledge Base
 
-async def load_knowledge_base(kb: Knowledge):
+async def load_knowledge_base(kb: Knowledge, identificador_embedder: str = EMBEDDER_DEPLOYMENT):
     """
     Carrega o conteúdo na Knowledge Base de forma assíncrona.
+    Só envia chunks ao embedder quando o PDF (ou a configuração) mudou.
+    Com CORPUS_DIR, carrega o diretório inteiro de políticas (ver corpus.py).
+    Retorna o resumo da carga do corpus (ou None no modo de um arquivo só).
     """
     try:
-        await kb.add_content_async(
-            name="politica_reembolso",
-            path="politica_reembolso_v1.0.pdf",   
-           
-        )
+        resumo = None
+        if CORPUS_DIR:
+            resumo = await carregar_corpus(kb, CORPUS_DIR, CONFIG_CHUNKER, identificador_embedder)
+            aplicar_versoes(kb, resumo)
+        else:
+            familia, versao = identificar_versao(ARQUIVO_POLITICA)
+            ingerir = ingerir_em_fluxo if usar_fluxo(ARQUIVO_POLITICA) else ingerir_documento
+            await ingerir(
+                kb,
+                caminho=ARQUIVO_POLITICA,
+                nome="politica_reembolso",
+                config_chunker=CONFIG_CHUNKER,
+                embedder_deployment=identificador_embedder,
+                metadados={"familia": familia, "versao": versao},
+            )
+        # Índice ANN / compactação (só faz algo se a tabela cresceu ou mudou)
+        manter_indice(kb.vector_db)
         print("Knowledge Base carregada com sucesso!")
+        return resumo
     except Exception as e:
         print(f"Erro ao carregar Knowledge Base: {e}")
 
@@ -80,16 +369,74 @@ async def load_knowledge_base(kb: Knowledge):
 
 # Sistema de Memória Simples
 
-def criar_memoria():
+# Versões medidas da memória e da Knowledge: registram quanto tempo o agente
+# passa atualizando memórias e buscando trechos da política (RAG)
+
+class MemoryManagerMedido(MemoryManager):
+
+    def create_user_memories(self, *args, **kwargs):
+        with metricas.medir("memoria", kwargs.get("user_id")):
+            return super().create_user_memories(*args, **kwargs)
+
+    async def acreate_user_memories(self, *args, **kwargs):
+        with metricas.medir("memoria", kwargs.get("user_id")):
+            return await super().acreate_user_memories(*args, **kwargs)
+
+
+class KnowledgeMedida(Knowledge):
+
+    # Com reordenador, a busca traz mais candidatos e o cross-encoder escolhe os max_results melhores
+    reordenador = None
+
+    # Corpus com versões: condição SQL que deixa de fora as versões não ativas (corpus.py).
+    # Vai dentro da consulta ao LanceDB, então os candidatos já vêm todos da versão ativa.
+    filtro_versoes = None
+
+    def _limites(self, max_results=None):
+        limite = max_results or self.max_results
+        candidatos = limite if self.reordenador is None else max(limite, RERANKER_CANDIDATOS)
+        return limite, candidatos
+
+    def search(self, query, max_results=None, **kwargs):
+        limite, candidatos = self._limites(max_results)
+        with metricas.medir("rag"):
+            if self.filtro_versoes:
+                documentos = buscar_filtrado(self.vector_db, query, candidatos, self.filtro_versoes)
+            else:
+                documentos = super().search(query, max_results=candidatos, **kwargs)
+
+        if self.reordenador is None or len(documentos) <= 1:
+            return documentos[:limite]
+        with metricas.medir("rerank"):
+            return self.reordenador.reordenar(query, documentos, limite)
+
+    async def async_search(self, query, max_results=None, **kwargs):
+        limite, candidatos = self._limites(max_results)
+        with metricas.medir("rag"):
+            if self.filtro_versoes:
+                # O LanceDB é síncrono: roda numa thread para não travar o event loop
+                documentos = await asyncio.to_thread(buscar_filtrado, self.vector_db, query, candidatos,
+                                                     self.filtro_versoes)
+            else:
+                documentos = await super().async_search(query, max_results=candidatos, **kwargs)
+
+        if self.reordenador is None or len(documentos) <= 1:
+            return documentos[:limite]
+        with metricas.medir("rerank"):
+            return await self.reordenador.async_reordenar(query, documentos, limite)
+
+
+def criar_memoria(db=None):
     """
     Cria o sistema de memória do agente.
     Bem simples - só configura a memória do usuário.
+    Recebe o banco do agente para não abrir uma segunda conexão SQLite.
     """
     # 1) Banco de dados para memórias
-    memory_db = SqliteDb(db_file="../tmp/agent_data.db")
+    memory_db = db or SqliteDb(db_file="../tmp/agent_data.db")
     
     # 2) Sistema de memória
-    memory_manager = MemoryManager(
+    memory_manager = MemoryManagerMedido(
         db=memory_db,
         memory_capture_instructions="""
         Colete informações importantes sobre o usuário:
@@ -98,12 +445,7 @@ def criar_memoria():
         - Valores e tipos de despesas
         - Preferências e histórico
         """,
-        model=AzureOpenAI( 
-            azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"), 
-            azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"), 
-            api_key=os.getenv("AZURE_OPENAI_API_KEY"), 
-            api_version=os.getenv("AZURE_OPENAI_API_VERSION")
-        )
+        model=criar_modelo_chat()
     )
     
     print("Sistema de memória criado!")
@@ -111,52 +453,196 @@ def criar_memoria():
 
 
 
-# Agente com Knowledge (RAG) + Memória
+# Partes pesadas do agente (Knowledge, banco, memória e modelo)
 
-def criar_agente():
+def criar_componentes():
     """
-    Cria um Agent do Agno com:
+    Cria as partes pesadas do agente, que podem ser compartilhadas entre usuários:
       - Knowledge (RAG) em cima de arquivo PDF
+      - Banco SQLite (sessões + memórias)
       - Sistema de memória integrado
       - Modelo Azure OpenAI (chat)
-      - Ferramenta compute_refund
     """
 
-    # 1) Knowledge (LanceDB + Azure Embedder)
-    embedding_provider = AzureOpenAIEmbedder(
-    azure_deployment="text-embedding-3-large",
-    azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT")
-    )
-    # embedding_provider = SentenceTransformerEmbedder(726, "	PORTULAN/albertina-100m-portuguese-ptbr-encoder")
+    # 1) Knowledge (LanceDB + Embedder Azure ou local)
+    if EMBEDDINGS_BACKEND in ("local", "onnx"):
+        # Modelo via EMBEDDINGS_MODELO_LOCAL (ex.: PORTULAN/albertina-100m-portuguese-ptbr-encoder)
+        embedding_provider = EmbedderLocal(backend=EMBEDDINGS_BACKEND, dimensoes=EMBEDDINGS_DIMENSOES)
+        identificador_embedder = embedding_provider.identificador
+    else:
+        # enable_batch: na ingestão, os chunks vão ao Azure em lotes (não um por chamada).
+        # dimensions só quando configurado: None apagaria o padrão do Agno e o LanceDb
+        # recusaria o embedder ("Embedder.dimensions must be set").
+        opcoes_embedder = {"enable_batch": True, "batch_size": min(INGESTAO_LOTE, 100)}
+        if EMBEDDINGS_DIMENSOES:
+            opcoes_embedder["dimensions"] = EMBEDDINGS_DIMENSOES
+        embedding_provider = criar_embedder(EMBEDDER_DEPLOYMENT, **opcoes_embedder)
+
+        # Vai para o manifesto: mudar as dimensões apaga a tabela, o manifesto e o estado do índice
+        # (verificar_embedder) - vetores de tamanhos diferentes nunca ficam misturados
+        identificador_embedder = EMBEDDER_DEPLOYMENT
+        if EMBEDDINGS_DIMENSOES:
+            identificador_embedder += f":{EMBEDDINGS_DIMENSOES}d"
 
-    kb = Knowledge(
+    # Busca híbrida: índice de texto (BM25, nativo do LanceDB - use_tantivy=False) + vetores, fundidos por RRF
+    kb = KnowledgeMedida(
         vector_db=LanceDb(
             table_name="reembolso_kb",
             uri="../tmp/lancedb",
-            embedder=embedding_provider
+            embedder=embedding_provider,
+            search_type=tipo_busca(),
+            use_tantivy=False,
+            nprobes=LANCEDB_NPROBES,   # só tem efeito depois que o índice ANN existe
         ),
         max_results=2,
     )
+    kb.reordenador = criar_reordenador()  # None com RERANKER=0
 
-    # 2) Carrega conteúdo na Knowledge Base (assíncrono) carrega somente uma vez na inicialização
-    asyncio.run(load_knowledge_base(kb))
+    # 2) Carrega conteúdo na Knowledge Base (assíncrono) - pula o embedding se o PDF não mudou
+    resumo_corpus = executar_async(load_knowledge_base(kb, identificador_embedder))
     
-    # 3) Banco de dados para o agente
+    # 3) Banco de dados para o agente (o mesmo é usado pela memória)
     db = SqliteDb(db_file="../tmp/agent_data.db")
 
     # 4) Sistema de memória
-    memory_manager = criar_memoria()
+    memory_manager = criar_memoria(db)
 
     # 5) Modelo de chat
-    chat_model = AzureOpenAI(
-        temperature=0.0, 
-        azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"), 
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"), 
-        api_key=os.getenv("AZURE_OPENAI_API_KEY"), 
-        api_version=os.getenv("AZURE_OPENAI_API_VERSION")
-    )
+    chat_model = criar_modelo_chat(temperature=0.0)
+
+    # 6) Cache de respostas (descartado sozinho se o PDF da política mudar)
+    cache = CacheSemantico(embedding_provider, arquivo_politica=ARQUIVO_POLITICA)
+
+    # 6.1) Corpus observado: reindexa o que mudar no diretório e descarta o cache de respostas
+    if CORPUS_DIR and CORPUS_INTERVALO_SEGUNDOS > 0:
+        observar_corpus(kb, CORPUS_DIR, CONFIG_CHUNKER, identificador_embedder,
+                        ao_atualizar=cache.limpar,
+                        digital_inicial=resumo_corpus["impressao_digital"] if resumo_corpus else None)
+
+    # 7) Histórico com tamanho fixo (substitui o histórico completo e o resumo de sessão do Agno)
+    global _fila_memoria, _historico
+    historico = GerenciadorHistorico(criar_modelo_chat()) if HISTORICO_GERENCIADO else None
+    _historico = historico
+
+    # 8) Memória adiada: memórias (e resumo da sessão, se o histórico não for o nosso) em segundo plano
+    fila_memoria = None
+    if MEMORIA_ADIADA:
+        fila_memoria = FilaMemoria(memory_manager, db, criar_modelo_chat(), resumir_sessao=historico is None)
+        atexit.register(fila_memoria.parar)  # não perde os últimos turnos ao sair
+    _fila_memoria = fila_memoria
+
+    # 9) Endpoint Prometheus (só se METRICAS_PORTA estiver definida)
+    iniciar_servidor_metricas()
+
+    return {
+        "knowledge": kb,
+        "db": db,
+        "memory_manager": memory_manager,
+        "chat_model": chat_model,
+        "cache": cache,
+        "fila_memoria": fila_memoria,
+        "historico": historico,
+    }
 
-    # 6) Instruções
+
+# Fila de memória e histórico do processo (criados em criar_componentes)
+_fila_memoria = None
+_historico = None
+
+
+def registrar_turno_memoria(agente, user_id: str, session_id: str, pergunta: str, resposta: str):
+    """
+    Manda o turno para a fila de memória (só quando o agente não extrai memórias sozinho).
+    """
+    if _fila_memoria is None or agente.enable_user_memories:
+        return
+    _fila_memoria.registrar_turno(user_id, session_id or agente.session_id, pergunta, resposta)
+
+
+def gerenciador_memoria(agente):
+    # Com a fila de memória o agente não tem memory_manager; o da fila lê o mesmo db
+    if agente.memory_manager is None and _fila_memoria is not None:
+        return _fila_memoria.memory_manager
+    return agente.memory_manager
+
+
+def chave_historico(agente, user_id: str, session_id: str = None) -> str:
+    # Sem sessão definida (CLI), o histórico fica por usuário
+    return session_id or agente.session_id or f"usuario:{user_id}"
+
+
+def opcoes_historico(chave: str) -> dict:
+    """
+    Parâmetros extras do run/arun com o histórico da sessão (resumo + últimos turnos).
+    Vai por execução (dependencies), então sessões diferentes no mesmo agente não se misturam.
+    """
+    if _historico is None:
+        return {}
+    texto = _historico.contexto(chave)
+    if not texto:
+        return {}
+    return {"dependencies": {"conversa_anterior": texto}, "add_dependencies_to_context": True}
+
+
+def registrar_turno_historico(chave: str, pergunta: str, resposta: str):
+    if _historico is not None:
+        _historico.registrar_turno(chave, pergunta, resposta)
+
+
+def registrar_turno_sem_llm(agente, user_id: str, session_id: str, pergunta: str, resposta: str):
+    # Resposta que não passou pelo agente também é turno da conversa (histórico + memória)
+    registrar_turno_memoria(agente, user_id, session_id, pergunta, resposta)
+    registrar_turno_historico(chave_historico(agente, user_id, session_id), pergunta, resposta)
+
+
+# Componentes compartilhados pelo processo inteiro (ex.: todas as abas do Streamlit)
+_componentes_compartilhados = None
+_lock_componentes = threading.Lock()
+
+
+def obter_componentes_compartilhados():
+    """
+    Retorna os componentes pesados do processo, criando-os na primeira chamada.
+    O lock garante que duas sessões abrindo ao mesmo tempo não criem tudo duas vezes.
+    """
+    global _componentes_compartilhados
+
+    if _componentes_compartilhados is None:
+        with _lock_componentes:
+            if _componentes_compartilhados is None:
+                _componentes_compartilhados = criar_componentes()
+    return _componentes_compartilhados
+
+
+
+# Agente com Knowledge (RAG) + Memória
+
+def criar_agente(componentes=None, user_id: str = None, session_id: str = None):
+    """
+    Cria um Agent do Agno com:
+      - Knowledge (RAG) em cima de arquivo PDF
+      - Sistema de memória integrado
+      - Modelo Azure OpenAI (chat)
+      - Ferramenta compute_refund
+
+    Se receber `componentes` (ver criar_componentes), o agente só reaproveita
+    as partes pesadas e fica leve - um por usuário/sessão.
+    """
+    if componentes is None:
+        componentes = criar_componentes()
+
+    # Com a fila de memória, o agente não extrai memórias/resumo durante a resposta
+    memoria_na_hora = componentes.get("fila_memoria") is None
+
+    # O Agno extrai memórias em todo run quando tem memory_manager (mesmo com
+    # enable_user_memories=False). Na fila, o agente fica sem ele: as memórias
+    # continuam no contexto porque o Agno as lê direto do db.
+    memory_manager = componentes["memory_manager"] if memoria_na_hora else None
+
+    # Com o histórico próprio, o Agno não manda a conversa inteira nem o resumo dele
+    historico_agno = componentes.get("historico") is None
+
+    # 1) Instruções
     instructions = """
     Você é um assistente de políticas de reembolso.
     Regras:
@@ -164,18 +650,22 @@ def criar_agente():
     - Use suas memórias sobre o usuário para personalizar respostas.
     - Se precisar calcular, use a ferramenta compute_refund.
     - Seja claro e educado nas respostas.
-    """
 
-    # 7) Cria o Agent com RAG + Memória
+    Fatos oficiais da política (use sempre estes números):
+    """ + resumo_fatos_politica()
+
+    # 2) Cria o Agent com RAG + Memória
     agente = Agent(
-        model=chat_model,
+        model=componentes["chat_model"],
         name="Assistente de Reembolso",
         instructions=instructions,
-        db=db,
-        memory_manager=memory_manager,     # Sistema de memória integrado
+        db=componentes["db"],
+        memory_manager=memory_manager,     # Sistema de memória integrado (None com a fila)
+        user_id=user_id,
+        session_id=session_id,
         
         # RAG
-        knowledge=kb,
+        knowledge=componentes["knowledge"],
         search_knowledge=True,
         add_knowledge_to_context=True,
 
@@ -183,9 +673,11 @@ def criar_agente():
         tools=[compute_refund],
 
         # Configurações de memória
-        enable_user_memories=True,         # Ativa memórias do usuário
-        enable_session_summaries=True,     # Ativa resumos de sessão
-        add_history_to_context=True,      # Adiciona histórico às mensagens
+        enable_user_memories=memoria_na_hora,       # Extrai memórias a cada turno (ou na fila, em lote)
+        enable_session_summaries=memoria_na_hora and historico_agno,   # Resume a sessão a cada turno (ou na fila, em lote)
+        add_memories_to_context=True,               # As memórias continuam no contexto nos dois modos
+        add_session_summary_to_context=historico_agno,
+        add_history_to_context=historico_agno,      # Histórico completo do Agno (sem o GerenciadorHistorico)
         #add_history_to_context_max_responses=10,           # Últimas 10 respostas no contexto
 
         markdown=True,
@@ -193,18 +685,240 @@ def criar_agente():
     return agente
 
 
-def processar_pergunta(agente, pergunta: str, user_id: str = "usuario_padrao"):
+def criar_agente_usuario(user_id: str, session_id: str = None):
+    """
+    Agente leve para um usuário/sessão, usando os componentes compartilhados do processo.
+    """
+    return criar_agente(obter_componentes_compartilhados(), user_id=user_id, session_id=session_id)
+
+
+def registrar_metricas_execucao(resposta, inicio: float, user_id: str):
+    # Tokens vêm das métricas do Agno; a latência é o tempo total visto por quem perguntou
+    metricas.registrar_execucao("agente", getattr(resposta, "metrics", None),
+                                duracao=time.perf_counter() - inicio, user_id=user_id)
+    for ferramenta in getattr(resposta, "tools", None) or []:
+        metricas.registrar_ferramenta(ferramenta, user_id)
+
+
+def processar_pergunta(agente, pergunta: str, user_id: str = "usuario_padrao", cache: CacheSemantico = None):
     
+    token_usuario = usuario_atual.set(user_id)
     try:
+        # Pedido de cálculo claro ou fato da política? Responde direto, sem LLM
+        direto = responder_sem_llm(pergunta)
+        if direto is not None:
+            registrar_turno_sem_llm(agente, user_id, None, pergunta, direto)
+            return direto
+        
+        # Pergunta frequente já respondida? Devolve do cache sem chamar o LLM
+        embedding = None
+        if cache is not None:
+            with metricas.medir("cache"):
+                em_cache, embedding = cache.buscar(pergunta, user_id)
+            if em_cache is not None:
+                registrar_turno_sem_llm(agente, user_id, None, pergunta, em_cache)
+                return em_cache
         
-        resposta = agente.run(pergunta, user_id=user_id)
+        chave = chave_historico(agente, user_id)
+        inicio = time.perf_counter()
+        resposta = agente.run(pergunta, user_id=user_id, **opcoes_historico(chave))
+        registrar_metricas_execucao(resposta, inicio, user_id)
         texto_resposta = getattr(resposta, "content", str(resposta)) # (getattr) atributo de um objeto, nesse caso Retorna o texto da resposta ou a resposta completa / # Em prod usar o Try Except para retornar o texto da resposta ou a resposta completa (mais seguro)
+        registrar_turno_memoria(agente, user_id, getattr(resposta, "session_id", None), pergunta, texto_resposta)
+        registrar_turno_historico(chave, pergunta, texto_resposta)
         
+        if cache is not None:
+            cache.guardar(pergunta, user_id, texto_resposta, embedding)
         
         return texto_resposta
         
     except Exception as e:
         return f"❌ Erro ao processar pergunta: {e}"
+    finally:
+        usuario_atual.reset(token_usuario)
+
+
+def processar_pergunta_stream(agente, pergunta: str, user_id: str = "usuario_padrao", cache: CacheSemantico = None):
+    """
+    Versão em streaming de processar_pergunta.
+    Gera eventos assim que chegam do modelo (em vez de esperar a resposta inteira):
+      - {"tipo": "conteudo", "texto": "<pedaço da resposta>"}
+      - {"tipo": "ferramenta", "nome": "compute_refund", "status": "inicio" | "fim"}
+      - {"tipo": "erro", "texto": "<mensagem>"}
+    """
+    token_usuario = usuario_atual.set(user_id)
+    try:
+        # Pedido de cálculo claro ou fato da política: responde direto, sem LLM
+        direto = responder_sem_llm(pergunta)
+        if direto is not None:
+            registrar_turno_sem_llm(agente, user_id, None, pergunta, direto)
+            yield {"tipo": "conteudo", "texto": direto}
+            return
+
+        # Acerto no cache: a resposta inteira sai de uma vez
+        embedding = None
+        if cache is not None:
+            with metricas.medir("cache"):
+                em_cache, embedding = cache.buscar(pergunta, user_id)
+            if em_cache is not None:
+                registrar_turno_sem_llm(agente, user_id, None, pergunta, em_cache)
+                yield {"tipo": "conteudo", "texto": em_cache}
+                return
+
+        partes = []
+        session_id = None
+        chave = chave_historico(agente, user_id)
+        inicio = time.perf_counter()
+        eventos = agente.run(pergunta, user_id=user_id, stream=True, stream_intermediate_steps=True,
+                             **opcoes_historico(chave))
+
+        for evento in eventos:
+            if evento.event == RunEvent.run_content:
+                if evento.content:
+                    partes.append(str(evento.content))
+                    yield {"tipo": "conteudo", "texto": str(evento.content)}
+
+            elif evento.event == RunEvent.tool_call_started:
+                yield {"tipo": "ferramenta", "nome": evento.tool.tool_name, "status": "inicio"}
+
+            elif evento.event == RunEvent.tool_call_completed:
+                metricas.registrar_ferramenta(evento.tool, user_id)
+                yield {"tipo": "ferramenta", "nome": evento.tool.tool_name, "status": "fim"}
+
+            elif evento.event == RunEvent.run_completed:
+                # Último evento: traz os tokens da execução inteira
+                metricas.registrar_execucao("agente", getattr(evento, "metrics", None),
+                                            duracao=time.perf_counter() - inicio, user_id=user_id)
+                session_id = getattr(evento, "session_id", None)
+
+        registrar_turno_memoria(agente, user_id, session_id, pergunta, "".join(partes))
+        registrar_turno_historico(chave, pergunta, "".join(partes))
+
+        if cache is not None:
+            cache.guardar(pergunta, user_id, "".join(partes), embedding)
+
+    except Exception as e:
+        yield {"tipo": "erro", "texto": f"❌ Erro ao processar pergunta: {e}"}
+    finally:
+        usuario_atual.reset(token_usuario)
+
+
+def imprimir_resposta_stream(agente, pergunta: str, user_id: str = "usuario_padrao", cache: CacheSemantico = None):
+    """
+    Mostra a resposta no terminal conforme os tokens chegam e retorna o texto completo.
+    """
+    partes = []
+    print("🤖 Resposta: ", end="", flush=True)
+
+    for evento in processar_pergunta_stream(agente, pergunta, user_id, cache):
+        if evento["tipo"] == "ferramenta":
+            if evento["status"] == "inicio":
+                print(f"\n   🔧 Usando ferramenta {evento['nome']}...", flush=True)
+            continue
+
+        partes.append(evento["texto"])
+        print(evento["texto"], end="", flush=True)
+
+    print("\n")
+    return "".join(partes)
+
+
+# Caminho assíncrono (várias perguntas ao mesmo tempo)
+
+# Máximo de chamadas simultâneas ao Azure OpenAI - ajuste conforme a cota (TPM/RPM) do deployment
+MAX_CONCORRENCIA = int(os.getenv("AZURE_OPENAI_MAX_CONCORRENCIA", "8"))
+
+
+async def processar_pergunta_async(agente, pergunta: str, user_id: str = "usuario_padrao",
+                                   session_id: str = None, semaforo: asyncio.Semaphore = None,
+                                   cache: CacheSemantico = None):
+    """
+    Versão assíncrona de processar_pergunta (usa agente.arun).
+    Se receber um semáforo, espera uma vaga antes de chamar o modelo.
+    """
+    # Cada tarefa do gather tem o seu próprio contexto, mas quem chama direto com await
+    # divide o contexto com esta função: restaura o usuário anterior no fim
+    token_usuario = usuario_atual.set(user_id)
+    try:
+        # Pedido de cálculo claro ou fato da política: responde direto, sem LLM (nem ocupa vaga do semáforo)
+        direto = responder_sem_llm(pergunta)
+        if direto is not None:
+            registrar_turno_sem_llm(agente, user_id, session_id, pergunta, direto)
+            return direto
+
+        # O cache usa o embedder síncrono - roda numa thread para não travar o event loop
+        embedding = None
+        if cache is not None:
+            with metricas.medir("cache"):
+                em_cache, embedding = await asyncio.to_thread(cache.buscar, pergunta, user_id)
+            if em_cache is not None:
+                registrar_turno_sem_llm(agente, user_id, session_id, pergunta, em_cache)
+                return em_cache
+
+        chave = chave_historico(agente, user_id, session_id)
+        opcoes = opcoes_historico(chave)
+
+        if semaforo is None:
+            inicio = time.perf_counter()
+            resposta = await agente.arun(pergunta, user_id=user_id, session_id=session_id, **opcoes)
+        else:
+            async with semaforo:
+                inicio = time.perf_counter()
+                resposta = await agente.arun(pergunta, user_id=user_id, session_id=session_id, **opcoes)
+        registrar_metricas_execucao(resposta, inicio, user_id)
+
+        texto_resposta = getattr(resposta, "content", str(resposta))
+        registrar_turno_memoria(agente, user_id, session_id or getattr(resposta, "session_id", None),
+                                pergunta, texto_resposta)
+        registrar_turno_historico(chave, pergunta, texto_resposta)
+
+        if cache is not None:
+            await asyncio.to_thread(cache.guardar, pergunta, user_id, texto_resposta, embedding)
+
+        return texto_resposta
+
+    except Exception as e:
+        return f"❌ Erro ao processar pergunta: {e}"
+    finally:
+        usuario_atual.reset(token_usuario)
+
+
+async def processar_lote_async(agente, perguntas, user_id: str = "usuario_padrao",
+                               max_concorrencia: int = MAX_CONCORRENCIA, cache: CacheSemantico = None):
+    """
+    Responde um lote de perguntas num único event loop, com no máximo
+    `max_concorrencia` chamadas ao modelo em andamento.
+
+    `perguntas` pode ser uma lista de textos ou de dicts
+    {"pergunta": ..., "user_id": ..., "session_id": ...}.
+    Cada pergunta sem session_id ganha uma sessão própria (tickets não se misturam).
+    Retorna as respostas na mesma ordem das perguntas.
+    """
+    semaforo = asyncio.Semaphore(max_concorrencia)
+    tarefas = []
+
+    for item in perguntas:
+        if isinstance(item, str):
+            item = {"pergunta": item}
+
+        tarefas.append(processar_pergunta_async(
+            agente,
+            item["pergunta"],
+            user_id=item.get("user_id", user_id),
+            session_id=item.get("session_id") or str(uuid.uuid4()),
+            semaforo=semaforo,
+            cache=cache,
+        ))
+
+    return await asyncio.gather(*tarefas)
+
+
+def processar_lote(agente, perguntas, user_id: str = "usuario_padrao",
+                   max_concorrencia: int = MAX_CONCORRENCIA, cache: CacheSemantico = None):
+    """
+    Atalho síncrono para processar_lote_async (para scripts e filas de tickets).
+    """
+    return executar_async(processar_lote_async(agente, perguntas, user_id, max_concorrencia, cache))
 
 
 def mostrar_memorias_usuario(agente, user_id: str = "usuario_padrao"):
@@ -212,7 +926,11 @@ def mostrar_memorias_usuario(agente, user_id: str = "usuario_padrao"):
     # Mostra as memórias do usuário de forma simples.
    
     try:
-        memorias = agente.memory_manager.get_user_memories(user_id=user_id)
+        # Turnos ainda na fila de memória entram antes de listar
+        if _fila_memoria is not None:
+            _fila_memoria.esvaziar()
+        
+        memorias = gerenciador_memoria(agente).get_user_memories(user_id=user_id)
         
         print(f"\n🧠 **Memórias do usuário {user_id}:**")
         if memorias:
@@ -233,13 +951,20 @@ def mostrar_estatisticas(agente, user_id: str = "usuario_padrao"):
         print("\n📊 **Estatísticas do Sistema:**")
         
         # Memórias do usuário
-        memorias = agente.memory_manager.get_user_memories(user_id=user_id)
+        memorias = gerenciador_memoria(agente).get_user_memories(user_id=user_id)
         print(f"   • Memórias do usuário: {len(memorias)}")
         
         # Histórico da sessão
         mensagens = agente.get_messages_for_session()
         print(f"   • Mensagens na sessão: {len(mensagens)}")
         
+        if _fila_memoria is not None:
+            print(f"   • Turnos aguardando extração de memória: {_fila_memoria.pendentes()}")
+        
+        # Latência e tokens por etapa (só deste usuário)
+        print(f"\n⏱️  **Latência e tokens de {user_id} (por etapa):**")
+        metricas.imprimir_resumo(user_id)
+        
     except Exception as e:
         print(f"❌ Erro ao mostrar estatísticas: {e}")
 
@@ -247,7 +972,9 @@ def mostrar_estatisticas(agente, user_id: str = "usuario_padrao"):
 if __name__ == "__main__":
     try:
         print("🚀 Iniciando agente de reembolso com memória integrada...")
-        agente = criar_agente()
+        componentes = criar_componentes()
+        agente = criar_agente(componentes)
+        cache = componentes["cache"]
         
         # ID do usuário (pode ser personalizado)
         user_id = "usuario_padrao"
@@ -283,23 +1010,19 @@ if __name__ == "__main__":
 
                 pergunta1 = "Olá! Meu nome é João Silva e trabalho na empresa TechCorp."
                 print(f"❓ Pergunta 1: {pergunta1}")
-                resposta1 = processar_pergunta(agente, pergunta1, user_id)
-                print(f"🤖 Resposta: {resposta1}\n")
+                imprimir_resposta_stream(agente, pergunta1, user_id, cache)
 
                 pergunta2 = "Quais despesas são reembolsáveis e qual o prazo para solicitação?"
                 print(f"❓ Pergunta 2: {pergunta2}")
-                resposta2 = processar_pergunta(agente, pergunta2, user_id)
-                print(f"🤖 Resposta: {resposta2}\n")
+                imprimir_resposta_stream(agente, pergunta2, user_id, cache)
 
                 pergunta3 = "Calcule o reembolso de R$ 1.250,00"
                 print(f"❓ Pergunta 3: {pergunta3}")
-                resposta3 = processar_pergunta(agente, pergunta3, user_id)
-                print(f"🤖 Resposta: {resposta3}\n")
+                imprimir_resposta_stream(agente, pergunta3, user_id, cache)
                 
                 pergunta4 = "Qual é o meu nome mesmo?"  # Testa a memória!
                 print(f"❓ Pergunta 4 (testando memória): {pergunta4}")
-                resposta4 = processar_pergunta(agente, pergunta4, user_id)
-                print(f"🤖 Resposta: {resposta4}\n")
+                imprimir_resposta_stream(agente, pergunta4, user_id, cache)
                 
                 # Mostra estatísticas e memórias
                 mostrar_estatisticas(agente, user_id)
@@ -308,8 +1031,9 @@ if __name__ == "__main__":
                 break
             
             # Processa pergunta normal com memória integrada
-            resposta = processar_pergunta(agente, pergunta, user_id)
-            print(f"\n🤖 Resposta: {resposta}\n")
+            # (a resposta aparece conforme os tokens chegam)
+            print()
+            imprimir_resposta_stream(agente, pergunta, user_id, cache)
 
     except Exception as e:
         print(f"❌ Erro ao executar o agente: {e}")
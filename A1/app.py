@@ -1,6 +1,10 @@
 
+import uuid
 import streamlit as st
-from agente_reembolso import criar_agente, processar_pergunta
+from agente_reembolso import criar_agente_usuario, obter_componentes_compartilhados, processar_pergunta_stream
+
+# Usuário do app (o agente é leve e fica preso a este usuário + sessão da aba)
+USER_ID = "usuario_streamlit"
 
 # Função para tratar a resposta antes de mostrar
 def tratar_resposta(resposta):
@@ -12,9 +16,9 @@ def tratar_resposta(resposta):
     if not texto.startswith(('💰', '🤖', '✅', '❌', '⚠️')):
         texto = "🤖 " + texto
     
-    # Exemplo 2: Destaca valores em reais
+    # Exemplo 2: Destaca valores em reais (1.250,00 ou 1250.00)
     import re
-    texto = re.sub(r'R\$\s*(\d+(?:,\d{3})*(?:\.\d{2})?)', r'**R$ \1**', texto)
+    texto = re.sub(r'R\$\s*(\d{1,3}(?:\.\d{3})+(?:,\d{2})?|\d+(?:[.,]\d{1,2})?)', r'**R$ \1**', texto)
     
     # Exemplo 3: Formata listas (sem quebrar linhas desnecessariamente)
     # texto = texto.replace('- ', '\n- ')  # Comentado para evitar quebras desnecessárias
@@ -26,6 +30,29 @@ def tratar_resposta(resposta):
     return texto
 
 
+# Versão em streaming: recebe os eventos de processar_pergunta_stream e,
+# a cada pedaço novo, devolve o texto acumulado já tratado (pronto para mostrar)
+def tratar_resposta_stream(eventos):
+    
+    texto = ""
+    ferramenta_em_uso = None
+    
+    for evento in eventos:
+        if evento["tipo"] == "ferramenta":
+            # Mostra um aviso enquanto a ferramenta roda e some quando ela termina
+            ferramenta_em_uso = evento["nome"] if evento["status"] == "inicio" else None
+        else:
+            texto += evento["texto"]
+        
+        if not texto and not ferramenta_em_uso:
+            continue
+        
+        parcial = tratar_resposta(texto) if texto else ""
+        if ferramenta_em_uso:
+            parcial += f"\n\n_🔧 Usando ferramenta {ferramenta_em_uso}..._"
+        yield parcial
+
+
 # Configurações iniciais da página
 
 
@@ -65,6 +92,9 @@ with st.sidebar:
     # Botão para limpar conversa
     if st.button("🗑️ Limpar Conversa"):
         st.session_state.mensagens = []
+        # Nova sessão = novo agente leve (os componentes pesados continuam compartilhados)
+        st.session_state.pop("agente", None)
+        st.session_state.pop("session_id", None)
         st.rerun()
 
 # INICIALIZAR O AGENTE
@@ -73,11 +103,20 @@ with st.sidebar:
 if "mensagens" not in st.session_state:
     st.session_state.mensagens = []
 
-# Cria o agente (só uma vez)
+# Cada aba tem sua própria sessão
+if "session_id" not in st.session_state:
+    st.session_state.session_id = str(uuid.uuid4())
+
+# Cria o agente (só uma vez por aba)
+# Knowledge, banco, memória e modelo são criados uma vez por processo e
+# compartilhados entre todas as abas - aqui só nasce o agente leve do usuário.
 if "agente" not in st.session_state:
     with st.spinner("Iniciando assistente..."):
         try:
-            st.session_state.agente = criar_agente()
+            st.session_state.agente = criar_agente_usuario(
+                user_id=USER_ID,
+                session_id=st.session_state.session_id
+            )
             st.success("✅ Assistente pronto!", icon="🤖")
         except Exception as e:
             st.error(f"❌ Erro ao criar agente: {str(e)}")
@@ -105,30 +144,34 @@ if pergunta := st.chat_input("Digite sua pergunta aqui..."):
     with st.chat_message("user"):
         st.markdown(pergunta)
     
-    # Processa e mostra a resposta do agente
+    # Processa e mostra a resposta do agente (conforme os tokens chegam)
     with st.chat_message("assistant"):
-        with st.spinner("Pensando..."):
-            try:
-                # Chama o agente (ele já tem memória integrada)
-                resposta = processar_pergunta(
-                    st.session_state.agente, 
-                    pergunta,
-                    user_id="usuario_streamlit"
-                )
-                
-                # Trata a resposta antes de mostrar
-                resposta_tratada = tratar_resposta(resposta)
-                # Mostra a resposta tratada
-                st.markdown(resposta_tratada)
-                
-                # Adiciona resposta tratada ao histórico visual
-                st.session_state.mensagens.append({
-                    "role": "assistant",
-                    "content": resposta_tratada
-                })
-                
-            except Exception as e:
-                st.error(f"❌ Erro: {str(e)}")
+        try:
+            espaco_resposta = st.empty()
+            espaco_resposta.markdown("_Pensando..._")
+            
+            # Chama o agente em streaming (ele já tem memória integrada)
+            eventos = processar_pergunta_stream(
+                st.session_state.agente, 
+                pergunta,
+                user_id=USER_ID,
+                cache=obter_componentes_compartilhados()["cache"]
+            )
+            
+            # Trata e mostra a resposta aos poucos
+            resposta_tratada = ""
+            for resposta_tratada in tratar_resposta_stream(eventos):
+                espaco_resposta.markdown(resposta_tratada + " ▌")
+            espaco_resposta.markdown(resposta_tratada)
+            
+            # Adiciona resposta tratada ao histórico visual
+            st.session_state.mensagens.append({
+                "role": "assistant",
+                "content": resposta_tratada
+            })
+            
+        except Exception as e:
+            st.error(f"❌ Erro: {str(e)}")
 
 
 # RODAPÉ
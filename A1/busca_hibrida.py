@@ -0,0 +1,77 @@
+import os
+import asyncio
+import threading
+from typing import List
+
+from agno.knowledge.document import Document
+from agno.vectordb.search import SearchType
+
+
+# Busca híbrida + reranker para a Knowledge da política
+#
+# Só com vetores, perguntas como "o prazo é de 7 ou 30 dias?" ou "precisa de
+# nota fiscal?" às vezes trazem o trecho errado: os números e termos exatos
+# pesam pouco no embedding. Agora:
+#   - BUSCA_HIBRIDA=1 (padrão): o LanceDB busca pelo índice de texto (BM25) e pelo
+#     índice vetorial e junta as duas listas por reciprocal rank fusion (RRF,
+#     o reranker padrão da busca híbrida do LanceDB)
+#   - RERANKER=1 (padrão): a busca traz RERANKER_CANDIDATOS trechos e um
+#     cross-encoder pequeno (CPU) escolhe os max_results melhores
+#   - RERANKER=0 desliga o cross-encoder (fica só a fusão)
+#
+# Dependência opcional do reranker: pip install sentence-transformers
+
+BUSCA_HIBRIDA = os.getenv("BUSCA_HIBRIDA", "1") == "1"
+RERANKER_ATIVO = os.getenv("RERANKER", "1") == "1"
+RERANKER_MODELO = os.getenv("RERANKER_MODELO", "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1")
+RERANKER_CANDIDATOS = int(os.getenv("RERANKER_CANDIDATOS", "8"))
+
+
+def tipo_busca() -> SearchType:
+    return SearchType.hybrid if BUSCA_HIBRIDA else SearchType.vector
+
+
+class ReordenadorCrossEncoder:
+    """
+    Dá uma nota para cada par (pergunta, trecho) e devolve os trechos na ordem da nota.
+    """
+
+    def __init__(self, modelo: str = RERANKER_MODELO):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("O reranker precisa do pacote sentence-transformers "
+                              "(pip install sentence-transformers)") from e
+
+        self.modelo = modelo
+        self._modelo = CrossEncoder(modelo, device="cpu")
+        self._lock = threading.Lock()  # o modelo não é seguro para várias threads ao mesmo tempo
+
+    def reordenar(self, pergunta: str, documentos: List[Document], limite: int) -> List[Document]:
+        if len(documentos) <= 1:
+            return documentos[:limite]
+
+        with self._lock:
+            notas = self._modelo.predict([(pergunta, documento.content) for documento in documentos],
+                                         show_progress_bar=False)
+
+        for documento, nota in zip(documentos, notas):
+            documento.reranking_score = float(nota)
+        ordenados = sorted(documentos, key=lambda documento: documento.reranking_score, reverse=True)
+        return ordenados[:limite]
+
+    async def async_reordenar(self, pergunta: str, documentos: List[Document], limite: int) -> List[Document]:
+        return await asyncio.to_thread(self.reordenar, pergunta, documentos, limite)
+
+
+def criar_reordenador():
+    """
+    Reranker configurado no .env, ou None se estiver desligado / sem o pacote.
+    """
+    if not RERANKER_ATIVO:
+        return None
+    try:
+        return ReordenadorCrossEncoder()
+    except Exception as e:
+        print(f"⚠️  Reranker desligado: {e}")
+        return None
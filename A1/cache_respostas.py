@@ -0,0 +1,209 @@
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+from ingestao import hash_arquivo
+
+
+# Cache semântico de respostas
+# A maioria das perguntas é sempre a mesma ("qual o prazo", "preciso de nota fiscal"...).
+# Se uma pergunta parecida (embedding com similaridade >= limiar) já foi respondida,
+# devolvemos a resposta guardada sem chamar o LLM.
+#
+# Regras:
+#   - Cada usuário tem o seu escopo: o agente monta a resposta com as memórias e o
+#     histórico da pessoa (mesmo numa pergunta neutra como "qual o prazo?"), então
+#     uma resposta guardada nunca vai para outro usuário.
+#   - TTL + LRU: entradas velhas expiram e o cache tem tamanho máximo.
+#   - Se o arquivo da política mudar, o cache inteiro é descartado.
+#   - A comparação de embeddings é uma multiplicação de matriz (NumPy) sobre as
+#     entradas do escopo, feita fora do lock.
+
+LIMIAR_SIMILARIDADE = float(os.getenv("CACHE_LIMIAR_SIMILARIDADE", "0.92"))
+TTL_SEGUNDOS = int(os.getenv("CACHE_TTL_SEGUNDOS", "3600"))
+MAX_ITENS = int(os.getenv("CACHE_MAX_ITENS", "500"))
+
+
+def normalizar_pergunta(pergunta: str) -> str:
+    """
+    Minúsculas, sem acentos, sem pontuação e sem espaços repetidos.
+    """
+    texto = unicodedata.normalize("NFKD", pergunta.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^\w\s$,.]", " ", texto)
+    texto = re.sub(r"[?!.]+$", "", texto.strip())
+    return re.sub(r"\s+", " ", texto).strip()
+
+
+def vetor_unitario(embedding) -> np.ndarray:
+    # Com os vetores normalizados, a similaridade de cosseno vira um produto escalar
+    vetor = np.asarray(embedding, dtype=np.float32)
+    norma = np.linalg.norm(vetor)
+    return vetor / norma if norma else vetor
+
+
+class CacheSemantico:
+    """
+    Cache de respostas indexado pelo embedding da pergunta normalizada.
+    Seguro para uso por várias sessões do Streamlit ao mesmo tempo.
+    """
+
+    def __init__(self, embedder, arquivo_politica: str, limiar: float = LIMIAR_SIMILARIDADE,
+                 ttl_segundos: int = TTL_SEGUNDOS, max_itens: int = MAX_ITENS):
+        self.embedder = embedder
+        self.arquivo_politica = arquivo_politica
+        self.limiar = limiar
+        self.ttl_segundos = ttl_segundos
+        self.max_itens = max_itens
+
+        self._itens = OrderedDict()     # chave -> {"escopo", "normalizada", "vetor", "resposta", "criado_em"}
+        self._exatos = {}               # (escopo, pergunta normalizada) -> chave
+        self._por_escopo = {}           # escopo -> {chave: vetor}
+        self._matrizes = {}             # escopo -> (chaves, matriz de vetores), refeita quando o escopo muda
+        self._lock = threading.RLock()
+        self._proxima_chave = 0
+
+        self._mtime_politica = None
+        self._hash_politica = None
+        self._verificar_politica()
+
+        self.acertos = 0
+        self.erros = 0
+
+    def _escopo(self, user_id: str) -> str:
+        return f"usuario:{user_id}"
+
+    def _verificar_politica(self):
+        """
+        Descarta o cache se o arquivo da política mudou.
+        Só recalcula o hash quando a data de modificação muda (stat é barato).
+        """
+        try:
+            mtime = os.stat(self.arquivo_politica).st_mtime
+        except FileNotFoundError:
+            return
+
+        if mtime == self._mtime_politica:
+            return
+
+        hash_atual = hash_arquivo(self.arquivo_politica)
+        if self._hash_politica is not None and hash_atual != self._hash_politica:
+            print("♻️  Política mudou - cache de respostas descartado.")
+            self.limpar()
+
+        self._mtime_politica = mtime
+        self._hash_politica = hash_atual
+
+    def _remover(self, chave):
+        item = self._itens.pop(chave, None)
+        if item:
+            self._exatos.pop((item["escopo"], item["normalizada"]), None)
+            do_escopo = self._por_escopo.get(item["escopo"], {})
+            do_escopo.pop(chave, None)
+            if not do_escopo:
+                self._por_escopo.pop(item["escopo"], None)
+            self._matrizes.pop(item["escopo"], None)
+
+    def _matriz(self, escopo: str):
+        # Chamado com o lock: a matriz é montada só quando o escopo mudou desde a última busca
+        if escopo not in self._matrizes:
+            do_escopo = self._por_escopo.get(escopo)
+            if not do_escopo:
+                return [], None
+            self._matrizes[escopo] = (list(do_escopo), np.stack(list(do_escopo.values())))
+        return self._matrizes[escopo]
+
+    def _remover_expirados(self):
+        limite = time.time() - self.ttl_segundos
+        # Os mais antigos (menos usados) ficam no início do OrderedDict
+        for chave in [c for c, item in self._itens.items() if item["criado_em"] < limite]:
+            self._remover(chave)
+
+    def buscar(self, pergunta: str, user_id: str):
+        """
+        Retorna (resposta, embedding). A resposta é None quando não há acerto;
+        o embedding é devolvido para ser reaproveitado em guardar().
+        """
+        escopo = self._escopo(user_id)
+        normalizada = normalizar_pergunta(pergunta)
+
+        with self._lock:
+            self._verificar_politica()
+            self._remover_expirados()
+
+            # 1) Pergunta idêntica: nem precisa de embedding
+            chave = self._exatos.get((escopo, normalizada))
+            if chave is not None:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return self._itens[chave]["resposta"], None
+
+            chaves, matriz = self._matriz(escopo)
+
+        # 2) Pergunta parecida: compara embeddings (fora do lock - o embedding é uma
+        #    chamada de rede e a comparação é uma multiplicação de matriz)
+        embedding = self.embedder.get_embedding(normalizada)
+        melhor_chave, melhor_score = None, 0.0
+        if chaves:
+            scores = matriz @ vetor_unitario(embedding)
+            indice = int(np.argmax(scores))
+            melhor_chave, melhor_score = chaves[indice], float(scores[indice])
+
+        with self._lock:
+            # A entrada pode ter expirado/saído enquanto comparávamos
+            if melhor_chave in self._itens and melhor_score >= self.limiar:
+                self._itens.move_to_end(melhor_chave)
+                self.acertos += 1
+                return self._itens[melhor_chave]["resposta"], embedding
+
+            self.erros += 1
+            return None, embedding
+
+    def guardar(self, pergunta: str, user_id: str, resposta: str, embedding=None):
+        # Respostas de erro não vão para o cache
+        if not resposta or resposta.startswith("❌"):
+            return
+
+        escopo = self._escopo(user_id)
+        normalizada = normalizar_pergunta(pergunta)
+        if embedding is None:
+            embedding = self.embedder.get_embedding(normalizada)
+        vetor = vetor_unitario(embedding)
+
+        with self._lock:
+            antiga = self._exatos.get((escopo, normalizada))
+            if antiga is not None:
+                self._remover(antiga)
+
+            chave = self._proxima_chave
+            self._proxima_chave += 1
+            self._itens[chave] = {
+                "escopo": escopo,
+                "normalizada": normalizada,
+                "vetor": vetor,
+                "resposta": resposta,
+                "criado_em": time.time(),
+            }
+            self._exatos[(escopo, normalizada)] = chave
+            self._por_escopo.setdefault(escopo, {})[chave] = vetor
+            self._matrizes.pop(escopo, None)
+
+            # LRU: remove os menos usados quando passa do limite
+            while len(self._itens) > self.max_itens:
+                self._remover(next(iter(self._itens)))
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+            self._exatos.clear()
+            self._por_escopo.clear()
+            self._matrizes.clear()
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            return {"itens": len(self._itens), "acertos": self.acertos, "erros": self.erros}
@@ -0,0 +1,286 @@
+import os
+import re
+import time
+import asyncio
+import threading
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from agno.knowledge.document import Document
+
+from ingestao import (
+    CAMINHO_MANIFESTO,
+    carregar_manifesto,
+    condicao_metadado,
+    documento_em_dia,
+    ingerir_documento,
+    ler_chunks,
+    manifesto_compativel,
+    remover_documento,
+)
+from ingestao_fluxo import ingerir_em_fluxo, usar_fluxo
+from indice_lancedb import conferir_busca_filtrada, manter_indice
+
+
+# Corpus de políticas com versões (vários documentos, reindexação incremental)
+#
+# Em vez de um PDF fixo, a Knowledge carrega todos os PDF/TXT de CORPUS_DIR:
+#
+#   politicas/
+#   ├── politica_reembolso_v1.0.pdf        -> família "politica_reembolso", versão 1.0
+#   ├── v2.0/politica_reembolso.pdf        -> família "politica_reembolso", versão 2.0
+#   └── regional/sul/frete_v1.3.txt        -> família "regional/sul/frete", versão 1.3
+#
+#   - Só os arquivos novos ou alterados (pelo manifesto) são lidos e embedados
+#   - A leitura/quebra dos arquivos roda em paralelo em processos (CORPUS_WORKERS);
+#     arquivos grandes (INGESTAO_FLUXO_MB) vão pela ingestão em fluxo (ingestao_fluxo.py)
+#   - Arquivos apagados do diretório saem do índice
+#   - Cada chunk leva "familia" e "versao"; a busca fica só com a versão ativa de
+#     cada família (a mais nova, ou POLITICA_VERSAO se a família tiver essa versão).
+#     O filtro vai dentro da consulta ao LanceDB: os k chunks devolvidos já são da versão ativa
+#   - CORPUS_INTERVALO_SEGUNDOS > 0 observa o diretório e reindexa o que mudar
+#
+# Sem CORPUS_DIR, o agente continua carregando só o politica_reembolso_v1.0.pdf.
+
+CORPUS_DIR = os.getenv("CORPUS_DIR")
+CORPUS_WORKERS = int(os.getenv("CORPUS_WORKERS", str(os.cpu_count() or 2)))
+CORPUS_INTERVALO_SEGUNDOS = float(os.getenv("CORPUS_INTERVALO_SEGUNDOS", "0"))
+POLITICA_VERSAO = os.getenv("POLITICA_VERSAO")
+
+EXTENSOES = (".pdf", ".txt")
+
+PADRAO_VERSAO_ARQUIVO = re.compile(r"^(.+?)[_\-\s]v(\d+(?:\.\d+)*)$", re.IGNORECASE)
+PADRAO_VERSAO_PASTA = re.compile(r"^v?(\d+(?:\.\d+)*)$", re.IGNORECASE)
+
+
+# Versões
+
+def identificar_versao(caminho_relativo: str):
+    """
+    "v2.0/politica.pdf" ou "politica_v2.0.pdf" -> ("politica", "2.0"). Sem versão -> versão "0".
+    """
+    partes = caminho_relativo.replace("\\", "/").split("/")
+    base = os.path.splitext(partes[-1])[0]
+    pastas = []
+    versao = None
+
+    for pasta in partes[:-1]:
+        encontrado = PADRAO_VERSAO_PASTA.match(pasta)
+        if encontrado and versao is None:
+            versao = encontrado.group(1)
+        else:
+            pastas.append(pasta)
+
+    encontrado = PADRAO_VERSAO_ARQUIVO.match(base)
+    if encontrado:
+        base = encontrado.group(1)
+        versao = versao or encontrado.group(2)
+
+    return "/".join(pastas + [base]), versao or "0"
+
+
+def chave_versao(versao: str):
+    return tuple(int(numero) for numero in versao.split("."))
+
+
+def versoes_ativas(arquivos, versao_escolhida: str = POLITICA_VERSAO) -> dict:
+    """
+    Versão ativa de cada família.
+    """
+    por_familia = defaultdict(set)
+    for arquivo in arquivos:
+        por_familia[arquivo["familia"]].add(arquivo["versao"])
+
+    ativas = {}
+    for familia, versoes in por_familia.items():
+        if versao_escolhida in versoes:
+            ativas[familia] = versao_escolhida
+        else:
+            ativas[familia] = max(versoes, key=chave_versao)
+    return ativas
+
+
+def filtro_versoes(arquivos, ativas: dict):
+    """
+    Condição SQL que deixa de fora os documentos de versões não ativas (None se não há nenhum).
+    Chunks sem família (ingeridos antes das versões) continuam passando.
+    """
+    inativos = [arquivo["nome"] for arquivo in arquivos if ativas.get(arquivo["familia"]) != arquivo["versao"]]
+    if not inativos:
+        return None
+    return "NOT (" + " OR ".join(condicao_metadado("documento", nome) for nome in inativos) + ")"
+
+
+def aplicar_versoes(kb, resumo: dict):
+    # A KnowledgeMedida passa este filtro para o LanceDB em cada busca
+    kb.filtro_versoes = resumo["filtro_versoes"]
+    conferir_busca_filtrada(kb.vector_db, kb.filtro_versoes)
+
+
+# Arquivos
+
+def listar_arquivos(diretorio: str):
+    arquivos = []
+    for raiz, pastas, nomes in os.walk(diretorio):
+        pastas.sort()
+        for nome_arquivo in sorted(nomes):
+            if not nome_arquivo.lower().endswith(EXTENSOES):
+                continue
+            caminho = os.path.join(raiz, nome_arquivo)
+            relativo = os.path.relpath(caminho, diretorio).replace("\\", "/")
+            familia, versao = identificar_versao(relativo)
+            arquivos.append({"caminho": caminho, "nome": relativo, "familia": familia, "versao": versao})
+    return arquivos
+
+
+def _impressao_digital(arquivos):
+    # Data de modificação + tamanho de cada arquivo: muda se algo foi criado, alterado ou apagado
+    digital = {}
+    for arquivo in arquivos:
+        try:
+            info = os.stat(arquivo["caminho"])
+            digital[arquivo["caminho"]] = (info.st_mtime, info.st_size)
+        except FileNotFoundError:
+            pass
+    return digital
+
+
+def _quebrar_em_processo(caminho: str, nome: str, config_chunker: dict):
+    # Roda num processo do pool: devolve só texto + metadados (fácil de mandar de volta)
+    documentos = asyncio.run(ler_chunks(caminho, nome, config_chunker))
+    return [(documento.content, documento.meta_data or {}) for documento in documentos]
+
+
+# Carga
+
+async def carregar_corpus(
+    kb,
+    diretorio: str,
+    config_chunker: dict,
+    identificador_embedder: str,
+    workers: int = CORPUS_WORKERS,
+    caminho_manifesto: str = CAMINHO_MANIFESTO,
+) -> dict:
+    """
+    Deixa a Knowledge igual ao diretório: ingere o que é novo/alterado e remove o que sumiu.
+    Retorna um resumo com os números da carga e as versões ativas.
+    """
+    arquivos = listar_arquivos(diretorio)
+    manifesto = carregar_manifesto(caminho_manifesto)
+    tabela_existe = kb.vector_db.exists()
+    mesmo_embedder = manifesto_compativel(manifesto, identificador_embedder)
+
+    pendentes = [
+        arquivo for arquivo in arquivos
+        if not (mesmo_embedder and documento_em_dia(manifesto, arquivo["nome"], arquivo["caminho"],
+                                                    config_chunker, tabela_existe))
+    ]
+
+    # O corpus é a Knowledge inteira: o que não está no diretório sai do índice
+    nomes = {arquivo["nome"] for arquivo in arquivos}
+    removidos = [nome for nome in manifesto["documentos"] if nome not in nomes]
+    for nome in removidos:
+        remover_documento(kb, nome, caminho_manifesto)
+
+    print(f"📚 Corpus '{diretorio}': {len(arquivos)} arquivo(s), {len(pendentes)} novo(s)/alterado(s), "
+          f"{len(removidos)} removido(s).")
+
+    # Arquivos grandes: um de cada vez, cada um já paraleliza as próprias páginas
+    grandes = [arquivo for arquivo in pendentes if usar_fluxo(arquivo["caminho"])]
+    pequenos = [arquivo for arquivo in pendentes if arquivo not in grandes]
+
+    chunks = 0
+    erros = 0
+    for arquivo in grandes:
+        try:
+            chunks += await ingerir_em_fluxo(
+                kb,
+                caminho=arquivo["caminho"],
+                nome=arquivo["nome"],
+                config_chunker=config_chunker,
+                embedder_deployment=identificador_embedder,
+                caminho_manifesto=caminho_manifesto,
+                metadados={"familia": arquivo["familia"], "versao": arquivo["versao"]},
+            )
+        except Exception as e:
+            erros += 1
+            print(f"❌ Erro ao ingerir '{arquivo['nome']}': {e}")
+
+    if pequenos:
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=max(1, min(workers, len(pequenos)))) as pool:
+
+            async def quebrar(arquivo):
+                try:
+                    partes = await loop.run_in_executor(
+                        pool, _quebrar_em_processo, arquivo["caminho"], arquivo["nome"], config_chunker
+                    )
+                    return arquivo, partes, None
+                except Exception as e:
+                    return arquivo, None, e
+
+            # Os processos quebram os arquivos em paralelo; cada um que fica pronto já vai para o embedder
+            for tarefa in asyncio.as_completed([quebrar(arquivo) for arquivo in pequenos]):
+                arquivo, partes, erro = await tarefa
+                if erro is None:
+                    try:
+                        documentos = [Document(name=arquivo["nome"], content=conteudo, meta_data=meta)
+                                      for conteudo, meta in partes]
+                        chunks += await ingerir_documento(
+                            kb,
+                            caminho=arquivo["caminho"],
+                            nome=arquivo["nome"],
+                            config_chunker=config_chunker,
+                            embedder_deployment=identificador_embedder,
+                            caminho_manifesto=caminho_manifesto,
+                            metadados={"familia": arquivo["familia"], "versao": arquivo["versao"]},
+                            documentos=documentos,
+                        )
+                        continue
+                    except Exception as e:
+                        erro = e
+                erros += 1
+                print(f"❌ Erro ao ingerir '{arquivo['nome']}': {erro}")
+
+    ativas = versoes_ativas(arquivos)
+    return {
+        "arquivos": len(arquivos),
+        "ingeridos": len(pendentes) - erros,
+        "removidos": len(removidos),
+        "erros": erros,
+        "chunks": chunks,
+        "versoes_ativas": ativas,
+        "filtro_versoes": filtro_versoes(arquivos, ativas),
+        "impressao_digital": _impressao_digital(arquivos),
+    }
+
+
+def observar_corpus(kb, diretorio: str, config_chunker: dict, identificador_embedder: str,
+                    intervalo: float = CORPUS_INTERVALO_SEGUNDOS, ao_atualizar=None, digital_inicial=None):
+    """
+    Thread que olha o diretório a cada `intervalo` segundos e reindexa só quando algo mudou.
+    `ao_atualizar` é chamado depois de cada reindexação (ex.: limpar o cache de respostas).
+    """
+    from clientes_modelo import executar_async  # pasta comum/ (o agente já a coloca no sys.path)
+
+    def rodar():
+        digital = digital_inicial
+        while True:
+            time.sleep(intervalo)
+            try:
+                atual = _impressao_digital(listar_arquivos(diretorio))
+                if atual == digital:
+                    continue
+
+                resumo = executar_async(carregar_corpus(kb, diretorio, config_chunker, identificador_embedder))
+                aplicar_versoes(kb, resumo)
+                manter_indice(kb.vector_db)
+                digital = resumo["impressao_digital"]
+                if (resumo["ingeridos"] or resumo["removidos"]) and ao_atualizar is not None:
+                    ao_atualizar()
+            except Exception as e:
+                print(f"\n⚠️  Erro ao atualizar o corpus: {e}")
+
+    thread = threading.Thread(target=rodar, name="observar-corpus", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,191 @@
+import os
+import queue
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from array import array
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from agno.knowledge.embedder.base import Embedder
+
+
+# Embeddings locais (CPU, sem rede)
+#
+# Alternativa ao AzureOpenAIEmbedder: o modelo roda na própria máquina com
+# sentence-transformers, então a ingestão e a busca de cada pergunta funcionam
+# offline e sem custo por chamada.
+#
+#   - Cache em disco (SQLite) pelo hash do texto: o mesmo trecho/pergunta nunca
+#     é calculado duas vezes, nem entre execuções
+#   - Perguntas que chegam juntas (várias abas do Streamlit, lote assíncrono)
+#     são agrupadas numa única chamada ao modelo (janela de poucos ms)
+#   - Caminho ONNX opcional (ex.: modelo quantizado int8) para ficar ainda mais rápido
+#
+# Dependências opcionais: pip install sentence-transformers
+#                         pip install "sentence-transformers[onnx]"   (para backend="onnx")
+
+MODELO_LOCAL = os.getenv("EMBEDDINGS_MODELO_LOCAL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+ARQUIVO_ONNX = os.getenv("EMBEDDINGS_ARQUIVO_ONNX")  # ex.: onnx/model_qint8_avx512_vnni.onnx
+CAMINHO_CACHE = os.getenv("EMBEDDINGS_CACHE", "../tmp/embeddings_cache.db")
+
+
+class _CacheVetores:
+    """
+    Vetores guardados em SQLite (float32 em bytes), pela chave = hash(modelo + texto).
+    """
+
+    def __init__(self, caminho: str):
+        os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("CREATE TABLE IF NOT EXISTS vetores (chave TEXT PRIMARY KEY, vetor BLOB NOT NULL)")
+
+    def buscar(self, chaves: List[str]) -> Dict[str, List[float]]:
+        encontrados = {}
+        with self._lock:
+            # Em blocos para não passar do limite de parâmetros do SQLite
+            for inicio in range(0, len(chaves), 500):
+                bloco = chaves[inicio:inicio + 500]
+                marcadores = ", ".join("?" for _ in bloco)
+                for chave, vetor in self.conexao.execute(
+                    f"SELECT chave, vetor FROM vetores WHERE chave IN ({marcadores})", bloco
+                ):
+                    valores = array("f")
+                    valores.frombytes(vetor)
+                    encontrados[chave] = valores.tolist()
+        return encontrados
+
+    def guardar(self, itens: Dict[str, List[float]]):
+        with self._lock:
+            self.conexao.executemany(
+                "INSERT OR REPLACE INTO vetores (chave, vetor) VALUES (?, ?)",
+                [(chave, array("f", vetor).tobytes()) for chave, vetor in itens.items()],
+            )
+
+
+@dataclass
+class EmbedderLocal(Embedder):
+    """
+    Embedder do Agno que roda na CPU, com cache em disco e agrupamento de consultas.
+    """
+
+    modelo: str = MODELO_LOCAL
+    backend: str = "local"                  # "local" (PyTorch) ou "onnx"
+    arquivo_onnx: Optional[str] = ARQUIVO_ONNX
+    caminho_cache: str = CAMINHO_CACHE
+    janela_ms: float = 2.0                  # quanto esperar por outras consultas para agrupar
+    dimensoes: Optional[int] = None         # corta o vetor (modelos Matryoshka); None = dimensão do modelo
+    dimensions: Optional[int] = None        # preenchido com a dimensão real do modelo
+    enable_batch: bool = True
+    batch_size: int = 64
+
+    def __post_init__(self):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("Embeddings locais precisam do pacote sentence-transformers "
+                              "(pip install sentence-transformers)") from e
+
+        opcoes = {"device": "cpu"}
+        if self.dimensoes:
+            opcoes["truncate_dim"] = self.dimensoes
+        if self.backend == "onnx":
+            opcoes["backend"] = "onnx"
+            if self.arquivo_onnx:
+                opcoes["model_kwargs"] = {"file_name": self.arquivo_onnx}
+
+        self._modelo = SentenceTransformer(self.modelo, **opcoes)
+        self.dimensions = self._modelo.get_sentence_embedding_dimension()
+        self._cache = _CacheVetores(self.caminho_cache)
+
+        self._pedidos = queue.Queue()
+        threading.Thread(target=self._agrupar_consultas, name="embeddings-locais", daemon=True).start()
+
+    @property
+    def identificador(self) -> str:
+        # Vai para o manifesto de ingestão: mudar modelo/backend recria o índice
+        partes = [self.backend, self.modelo]
+        if self.backend == "onnx" and self.arquivo_onnx:
+            partes.append(self.arquivo_onnx)
+        if self.dimensoes:
+            partes.append(f"{self.dimensoes}d")
+        return ":".join(partes)
+
+    def _chave(self, texto: str) -> str:
+        return hashlib.sha256(f"{self.identificador}\n{texto}".encode("utf-8")).hexdigest()
+
+    def _calcular(self, textos: List[str]) -> List[List[float]]:
+        # Vetores normalizados: similaridade de cosseno = produto escalar
+        vetores = self._modelo.encode(textos, batch_size=self.batch_size,
+                                      normalize_embeddings=True, show_progress_bar=False)
+        return [vetor.tolist() for vetor in vetores]
+
+    # Lote (ingestão): cache primeiro, o resto numa chamada só
+
+    def embed_lote(self, textos: List[str]) -> List[List[float]]:
+        chaves = [self._chave(texto) for texto in textos]
+        encontrados = self._cache.buscar(list(set(chaves)))
+
+        faltando = {}
+        for chave, texto in zip(chaves, textos):
+            if chave not in encontrados:
+                faltando[chave] = texto
+
+        if faltando:
+            novos = dict(zip(faltando, self._calcular(list(faltando.values()))))
+            self._cache.guardar(novos)
+            encontrados.update(novos)
+
+        return [encontrados[chave] for chave in chaves]
+
+    # Consultas (uma pergunta por vez): agrupadas por uma thread
+
+    def _agrupar_consultas(self):
+        while True:
+            pedidos = [self._pedidos.get()]
+            # Espera um pouquinho por outras consultas que chegaram junto
+            try:
+                while len(pedidos) < self.batch_size:
+                    pedidos.append(self._pedidos.get(timeout=self.janela_ms / 1000))
+            except queue.Empty:
+                pass
+
+            try:
+                vetores = self.embed_lote([texto for texto, _ in pedidos])
+                for (_, futuro), vetor in zip(pedidos, vetores):
+                    futuro.set_result(vetor)
+            except Exception as e:
+                for _, futuro in pedidos:
+                    futuro.set_exception(e)
+
+    def _pedir(self, texto: str) -> Future:
+        futuro = Future()
+        self._pedidos.put((texto, futuro))
+        return futuro
+
+    # Interface do Agno
+
+    def get_embedding(self, text: str) -> List[float]:
+        return self._pedir(text).result()
+
+    def get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return self.get_embedding(text), None
+
+    async def async_get_embedding(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self._pedir(text))
+
+    async def async_get_embedding_and_usage(self, text: str) -> Tuple[List[float], Optional[Dict]]:
+        return await self.async_get_embedding(text), None
+
+    def get_embeddings_batch_and_usage(self, texts: List[str]) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        return self.embed_lote(texts), [None] * len(texts)
+
+    async def async_get_embeddings_batch_and_usage(
+        self, texts: List[str]
+    ) -> Tuple[List[List[float]], List[Optional[Dict]]]:
+        vetores = await asyncio.to_thread(self.embed_lote, texts)
+        return vetores, [None] * len(texts)
@@ -0,0 +1,178 @@
+import os
+import time
+import queue
+import threading
+from collections import OrderedDict, deque
+
+from agno.agent import Agent
+
+
+# Histórico da conversa com tamanho fixo
+#
+# Com add_history_to_context=True (sem limite), o Agno manda a conversa inteira
+# a cada pergunta: numa sessão longa do Streamlit o prompt só cresce (e com ele
+# a latência e o custo). Aqui o contexto tem tamanho constante:
+#   - Os últimos HISTORICO_MAX_TURNOS turnos vão na íntegra, desde que caibam
+#     em HISTORICO_ORCAMENTO_TOKENS
+#   - Os turnos que saem da janela são "dobrados" num resumo, atualizado aos
+#     poucos (resumo anterior + turnos que saíram), fora da resposta
+#   - Os resumos rodam em HISTORICO_WORKERS threads; cada sessão sempre cai na
+#     mesma fila, então as dobras de uma sessão entram no resumo na ordem
+#   - Sessões paradas há mais de HISTORICO_TTL_SEGUNDOS, ou além das
+#     HISTORICO_MAX_SESSOES mais recentes, saem da memória
+#
+# O texto vai para o agente como dependência da execução (dependencies=...),
+# então cada chamada leva o histórico da sua própria sessão.
+
+HISTORICO_MAX_TURNOS = int(os.getenv("HISTORICO_MAX_TURNOS", "6"))
+HISTORICO_ORCAMENTO_TOKENS = int(os.getenv("HISTORICO_ORCAMENTO_TOKENS", "2000"))
+HISTORICO_WORKERS = int(os.getenv("HISTORICO_WORKERS", "2"))
+HISTORICO_MAX_SESSOES = int(os.getenv("HISTORICO_MAX_SESSOES", "1000"))
+HISTORICO_TTL_SEGUNDOS = float(os.getenv("HISTORICO_TTL_SEGUNDOS", "3600"))
+
+# Contagem de tokens: tiktoken se estiver instalado, senão a aproximação de ~4 caracteres por token
+try:
+    import tiktoken
+    _codificador = tiktoken.get_encoding("o200k_base")
+
+    def contar_tokens(texto: str) -> int:
+        return len(_codificador.encode(texto))
+except ImportError:
+    def contar_tokens(texto: str) -> int:
+        return len(texto) // 4 + 1
+
+
+def _formatar_turno(pergunta: str, resposta: str) -> str:
+    return f"Usuário: {pergunta}\nAssistente: {resposta}"
+
+
+class _Sessao:
+    def __init__(self):
+        self.turnos = deque()      # (pergunta, resposta, tokens) - mais antigo à esquerda
+        self.resumo = ""
+        self.lock = threading.Lock()   # protege turnos/resumo (rápido)
+        self.ultimo_uso = time.monotonic()
+
+
+class GerenciadorHistorico:
+    """
+    Guarda, por sessão, os últimos turnos + um resumo do que veio antes.
+    """
+
+    def __init__(self, modelo, max_turnos: int = HISTORICO_MAX_TURNOS,
+                 orcamento_tokens: int = HISTORICO_ORCAMENTO_TOKENS, workers: int = HISTORICO_WORKERS,
+                 max_sessoes: int = HISTORICO_MAX_SESSOES, ttl_segundos: float = HISTORICO_TTL_SEGUNDOS):
+        self.max_turnos = max_turnos
+        self.orcamento_tokens = orcamento_tokens
+        self.max_sessoes = max(1, max_sessoes)
+        self.ttl_segundos = ttl_segundos
+        self._sessoes = OrderedDict()   # chave -> _Sessao, da menos para a mais usada
+        self._lock = threading.Lock()
+
+        # Uma fila por worker; a sessão escolhe a fila pela chave (sempre a mesma)
+        self._filas = [queue.Queue() for _ in range(max(1, workers))]
+        for numero, fila in enumerate(self._filas):
+            threading.Thread(target=self._rodar, args=(fila,), name=f"historico-{numero}", daemon=True).start()
+
+        self.resumidor = Agent(
+            model=modelo,
+            name="Resumidor de Conversa",
+            instructions="""
+            Você mantém o resumo de uma conversa entre um usuário e um assistente de reembolsos.
+            Recebe o resumo atual e os turnos mais antigos que saíram da conversa recente.
+            Devolva um novo resumo curto (no máximo 150 palavras) com fatos, valores, pedidos
+            e decisões importantes. Não invente nada.
+            """,
+        )
+
+    def _sessao(self, chave: str) -> _Sessao:
+        agora = time.monotonic()
+        with self._lock:
+            sessao = self._sessoes.get(chave)
+            if sessao is None:
+                sessao = self._sessoes[chave] = _Sessao()
+            else:
+                self._sessoes.move_to_end(chave)
+            sessao.ultimo_uso = agora
+
+            # LRU + TTL: as menos usadas ficam no começo (a atual acabou de ir para o fim)
+            while self._sessoes:
+                antiga = next(iter(self._sessoes.values()))
+                if len(self._sessoes) <= self.max_sessoes and agora - antiga.ultimo_uso <= self.ttl_segundos:
+                    break
+                self._sessoes.popitem(last=False)
+            return sessao
+
+    # Leitura (antes de cada pergunta)
+
+    def contexto(self, chave: str) -> str:
+        """
+        Texto com o resumo + os turnos recentes que cabem no orçamento ("" se a sessão é nova).
+        """
+        sessao = self._sessao(chave)
+        with sessao.lock:
+            resumo = sessao.resumo
+            turnos = list(sessao.turnos)
+
+        restante = self.orcamento_tokens - contar_tokens(resumo)
+        recentes = []
+        for pergunta, resposta, tokens in reversed(turnos):
+            if tokens > restante:
+                break
+            recentes.append(_formatar_turno(pergunta, resposta))
+            restante -= tokens
+        recentes.reverse()
+
+        partes = []
+        if resumo:
+            partes.append(f"Resumo da conversa até aqui:\n{resumo}")
+        if recentes:
+            partes.append("Mensagens mais recentes:\n" + "\n\n".join(recentes))
+        return "\n\n".join(partes)
+
+    # Escrita (depois de cada resposta)
+
+    def registrar_turno(self, chave: str, pergunta: str, resposta: str):
+        """
+        Guarda o turno; o que passar do limite de turnos/tokens vai para o resumo em segundo plano.
+        """
+        sessao = self._sessao(chave)
+        tokens = contar_tokens(_formatar_turno(pergunta, resposta))
+
+        with sessao.lock:
+            sessao.turnos.append((pergunta, resposta, tokens))
+            saindo = []
+            while len(sessao.turnos) > 1 and (
+                len(sessao.turnos) > self.max_turnos
+                or sum(t[2] for t in sessao.turnos) > self.orcamento_tokens
+            ):
+                saindo.append(sessao.turnos.popleft())
+
+        if saindo:
+            self._filas[hash(chave) % len(self._filas)].put((sessao, saindo))
+
+    # Worker
+
+    def _rodar(self, fila: queue.Queue):
+        while True:
+            sessao, saindo = fila.get()
+            self._dobrar(sessao, saindo)
+
+    def _dobrar(self, sessao: _Sessao, saindo):
+        # Só o worker da sessão chama aqui, um lote de cada vez e na ordem em que os
+        # turnos saíram; quem lê o contexto não espera o LLM resumir
+        texto = "\n\n".join(_formatar_turno(p, r) for p, r, _ in saindo)
+        with sessao.lock:
+            resumo_atual = sessao.resumo
+        try:
+            resposta = self.resumidor.run(
+                f"RESUMO ATUAL:\n{resumo_atual or '(vazio)'}\n\nTURNOS QUE SAÍRAM DA CONVERSA RECENTE:\n{texto}"
+            )
+            novo_resumo = resposta.content
+        except Exception as e:
+            # Sem o LLM, pelo menos não perde o fio: anexa o texto cortado
+            print(f"\n⚠️  Erro ao resumir o histórico: {e}")
+            novo_resumo = (resumo_atual + "\n" + texto)[-2000:]
+
+        with sessao.lock:
+            sessao.resumo = novo_resumo
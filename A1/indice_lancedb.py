@@ -0,0 +1,173 @@
+import os
+import math
+from datetime import timedelta
+
+from agno.vectordb.search import SearchType
+
+from busca_hibrida import BUSCA_HIBRIDA
+from ingestao import CAMINHO_MANIFESTO, carregar_manifesto, salvar_manifesto
+
+
+# Manutenção do índice do LanceDB (ANN, compactação, limpeza de versões)
+#
+# Com as opções padrão, toda busca compara a pergunta com TODOS os vetores
+# (busca exata) e cada ingestão deixa fragmentos pequenos e versões antigas no
+# disco. Com um corpus grande, a latência e o espaço crescem junto. Depois de
+# cada carga, manter_indice():
+#
+#   - Cria um índice ANN quando a tabela passa de LANCEDB_INDICE_MIN_LINHAS linhas
+#     (LANCEDB_TIPO_INDICE: IVF_PQ, IVF_HNSW_SQ ou IVF_HNSW_PQ - todos guardam os
+#     vetores quantizados no índice) e o recria quando a tabela dobra de tamanho
+#   - Cria o índice de texto (BM25) da busca híbrida quando BUSCA_HIBRIDA=1 e o
+#     apaga quando é desligada - os vetores ficam como estão
+#   - Roda optimize() se a tabela mudou desde a última vez: junta fragmentos
+#     pequenos, inclui as linhas novas nos índices (vetorial e de texto) e apaga
+#     versões com mais de LANCEDB_LIMPAR_VERSOES_HORAS
+#
+# O estado (linhas no último índice, versão já otimizada) fica no manifesto de ingestão.
+
+LANCEDB_INDICE_MIN_LINHAS = int(os.getenv("LANCEDB_INDICE_MIN_LINHAS", "50000"))
+LANCEDB_TIPO_INDICE = os.getenv("LANCEDB_TIPO_INDICE", "IVF_PQ")
+LANCEDB_LIMPAR_VERSOES_HORAS = float(os.getenv("LANCEDB_LIMPAR_VERSOES_HORAS", "24"))
+LANCEDB_NPROBES = int(os.getenv("LANCEDB_NPROBES", "20"))  # partições visitadas por busca (mais = mais recall)
+
+COLUNA_VETOR = "vector"  # nome da coluna de vetores nas tabelas do LanceDb do Agno
+COLUNA_TEXTO = "payload"  # JSON do chunk; é a coluna que o Agno usa na busca por texto
+
+
+def _dimensao(tabela) -> int:
+    return tabela.schema.field(COLUNA_VETOR).type.list_size
+
+
+def _sub_vetores(dimensao: int) -> int:
+    # PQ: cada sub-vetor de 16 dimensões vira 1 byte (1536 -> 96 bytes por vetor em vez de 6 KB)
+    for tamanho in (16, 8, 4, 2):
+        if dimensao % tamanho == 0:
+            return dimensao // tamanho
+    return 1
+
+
+def _indice_da_coluna(tabela, coluna: str):
+    for indice in tabela.list_indices():
+        colunas = getattr(indice, "columns", None) or [getattr(indice, "column", None)]
+        if coluna in colunas:
+            return indice
+    return None
+
+
+def criar_indice_vetorial(tabela, linhas: int, tipo: str = LANCEDB_TIPO_INDICE):
+    dimensao = _dimensao(tabela)
+    particoes = max(1, min(int(math.sqrt(linhas)), linhas // 256))
+    opcoes = {}
+    if tipo.endswith("PQ"):
+        opcoes["num_sub_vectors"] = _sub_vetores(dimensao)
+
+    print(f"🗂️  Criando índice {tipo} ({linhas} linhas, {dimensao} dimensões, {particoes} partições)...")
+    tabela.create_index(
+        metric="cosine",
+        vector_column_name=COLUNA_VETOR,
+        index_type=tipo,
+        num_partitions=particoes,
+        replace=True,
+        **opcoes,
+    )
+
+
+def ajustar_indice_texto(vector_db, ligado: bool = BUSCA_HIBRIDA):
+    """
+    Deixa o índice de texto da tabela de acordo com a busca híbrida (cria ou apaga).
+    """
+    tabela = vector_db.table
+    indice = _indice_da_coluna(tabela, COLUNA_TEXTO)
+    if ligado and indice is None:
+        print("🔤 Criando índice de texto da busca híbrida...")
+        tabela.create_fts_index(COLUNA_TEXTO, replace=True, use_tantivy=False)
+    elif not ligado and indice is not None:
+        print("🔤 Busca híbrida desligada - apagando o índice de texto...")
+        tabela.drop_index(indice.name)
+    # Sem isto o LanceDb do Agno recria o índice inteiro na 1ª busca híbrida de cada processo
+    vector_db.fts_index_exists = ligado
+
+
+def buscar_filtrado(vector_db, query: str, limite: int, filtro: str):
+    """
+    Mesma busca do LanceDb do Agno (vetorial ou híbrida), mas com `filtro` dentro da consulta
+    (prefilter): o LanceDB já devolve os `limite` chunks mais próximos entre os que passam.
+    """
+    tabela = vector_db.table
+    embedding = vector_db.embedder.get_embedding(query)
+
+    if vector_db.search_type == SearchType.hybrid:
+        if not vector_db.fts_index_exists:
+            ajustar_indice_texto(vector_db, ligado=True)
+        busca = tabela.search(vector_column_name=COLUNA_VETOR, query_type="hybrid").vector(embedding).text(query)
+    else:
+        busca = tabela.search(embedding, vector_column_name=COLUNA_VETOR)
+
+    busca = busca.where(filtro, prefilter=True).limit(limite)
+    if vector_db.nprobes:
+        busca = busca.nprobes(vector_db.nprobes)
+
+    # O Agno monta os Documents a partir de um DataFrame (e engole erros: lista vazia)
+    linhas = busca.to_pandas()
+    documentos = vector_db._build_search_results(linhas)
+    if len(linhas) and not documentos:
+        raise RuntimeError(f"A busca filtrada achou {len(linhas)} trecho(s), mas nenhum virou Document")
+    return documentos
+
+
+def conferir_busca_filtrada(vector_db, filtro: str, pergunta: str = "reembolso") -> bool:
+    """
+    Busca de teste com o filtro das versões: se a tabela tem trechos que passam no filtro,
+    a busca tem que trazer algum. Avisa (e retorna False) se não trouxer.
+    """
+    if not filtro or not vector_db.exists():
+        return True
+    try:
+        if vector_db.table.count_rows(filtro) == 0 or buscar_filtrado(vector_db, pergunta, 1, filtro):
+            return True
+        print("⚠️  A busca filtrada pelas versões ativas não trouxe nenhum trecho - confira o filtro.")
+    except Exception as e:
+        print(f"⚠️  Erro na busca filtrada pelas versões ativas: {e}")
+    return False
+
+
+def manter_indice(vector_db, caminho_manifesto: str = CAMINHO_MANIFESTO, indice_texto: bool = BUSCA_HIBRIDA):
+    """
+    Cria/recria o índice ANN, ajusta o índice de texto e compacta a tabela quando precisa.
+    Barato quando nada mudou.
+    """
+    tabela = getattr(vector_db, "table", None)
+    if tabela is None or not vector_db.exists():
+        return
+
+    manifesto = carregar_manifesto(caminho_manifesto)
+    estado = manifesto.get("indice") or {}
+
+    try:
+        linhas = tabela.count_rows()
+
+        # 1) Índice ANN: ao passar do limite, ao dobrar de tamanho ou se o tipo mudou
+        if linhas >= LANCEDB_INDICE_MIN_LINHAS:
+            sem_indice = _indice_da_coluna(tabela, COLUNA_VETOR) is None
+            cresceu = linhas >= 2 * estado.get("linhas", linhas)
+            tipo_mudou = estado.get("tipo") not in (None, LANCEDB_TIPO_INDICE)
+            if sem_indice or cresceu or tipo_mudou:
+                criar_indice_vetorial(tabela, linhas)
+                estado.update({"linhas": linhas, "tipo": LANCEDB_TIPO_INDICE})
+
+        # 2) Índice de texto: só existe com a busca híbrida ligada
+        ajustar_indice_texto(vector_db, indice_texto)
+
+        # 3) Compactação + atualização incremental dos índices + limpeza de versões antigas
+        if tabela.version != estado.get("versao_otimizada"):
+            tabela.optimize(cleanup_older_than=timedelta(hours=LANCEDB_LIMPAR_VERSOES_HORAS))
+            estado["versao_otimizada"] = tabela.version
+            print(f"🧹 LanceDB otimizado ({linhas} linhas).")
+
+    except Exception as e:
+        print(f"⚠️  Erro na manutenção do índice do LanceDB: {e}")
+        return
+
+    manifesto["indice"] = estado
+    salvar_manifesto(manifesto, caminho_manifesto)
@@ -0,0 +1,355 @@
+import os
+import re
+import json
+import asyncio
+import hashlib
+
+from agno.knowledge.document import Document
+from agno.knowledge.reader.pdf_reader import PDFReader
+
+
+# Manifesto de ingestão
+# Fica ao lado do LanceDB e registra o que já foi embedado:
+#   - hash de cada documento (e data de modificação/tamanho, para nem recalcular o hash)
+#   - configurações do chunker usadas para quebrar o documento
+#   - deployment do embedder (se mudar, os vetores antigos não servem mais)
+#   - hash de cada chunk (para re-embedar só o que mudou)
+
+CAMINHO_MANIFESTO = "../tmp/lancedb_manifesto.json"
+FORMATO_IDS = "documento+chunk"  # como as linhas são identificadas (ver id_chunk)
+
+
+def hash_arquivo(caminho: str) -> str:
+    """
+    Calcula o SHA-256 do conteúdo de um arquivo (lendo em blocos).
+    """
+    sha = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+
+def hash_texto(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+# Chunking por seções da política ("1) Requisitos", "3) Restrições"...)
+# Cada seção vira um chunk com o título junto, em vez de cortar o texto por tamanho:
+# a busca devolve a regra inteira ("arrependimento (máximo de 7 dias)") e não meio parágrafo.
+
+PADRAO_SECAO = re.compile(r"^[ \t]*(\d+)\)[ \t]+(\S.*?)[ \t]*$", re.MULTILINE)
+
+
+def _cortar_paragrafo(paragrafo: str, tamanho_maximo: int):
+    # Parágrafo maior que o chunk (ex.: contrato sem linhas em branco): corta no último espaço
+    while len(paragrafo) > tamanho_maximo:
+        corte = paragrafo.rfind(" ", 0, tamanho_maximo)
+        corte = corte if corte > tamanho_maximo // 2 else tamanho_maximo
+        yield paragrafo[:corte]
+        paragrafo = paragrafo[corte:].lstrip()
+    yield paragrafo
+
+
+def _dividir_por_tamanho(texto: str, tamanho_maximo: int):
+    # Seção grande demais: corta nos parágrafos (linhas em branco)
+    partes, atual = [], ""
+    paragrafos = (pedaco for paragrafo in re.split(r"\n\s*\n", texto)
+                  for pedaco in _cortar_paragrafo(paragrafo, tamanho_maximo))
+    for paragrafo in paragrafos:
+        if atual and len(atual) + len(paragrafo) + 2 > tamanho_maximo:
+            partes.append(atual)
+            atual = paragrafo
+        else:
+            atual = f"{atual}\n\n{paragrafo}" if atual else paragrafo
+    if atual:
+        partes.append(atual)
+    return partes
+
+
+def quebrar_por_secoes(texto: str, nome: str, tamanho_maximo: int):
+    """
+    Quebra o texto nas seções numeradas. Retorna None se o texto não tiver seções.
+    """
+    marcas = list(PADRAO_SECAO.finditer(texto))
+    if not marcas:
+        return None
+
+    linhas_titulo = [linha.strip() for linha in texto[:marcas[0].start()].splitlines() if linha.strip()]
+    titulo_documento = linhas_titulo[-1] if linhas_titulo else nome
+
+    documentos = []
+    for i, marca in enumerate(marcas):
+        fim = marcas[i + 1].start() if i + 1 < len(marcas) else len(texto)
+        secao = f"{marca.group(1)}) {marca.group(2)}"
+        corpo = texto[marca.end():fim].strip()
+
+        for parte in _dividir_por_tamanho(corpo, tamanho_maximo):
+            documentos.append(Document(
+                name=nome,
+                content=f"{titulo_documento} - {secao}\n{parte}",
+                meta_data={"secao": secao},
+            ))
+    return documentos
+
+
+async def ler_chunks(caminho: str, nome: str, config_chunker: dict):
+    """
+    Lê o PDF (ou TXT) e quebra em chunks conforme a estratégia do config_chunker:
+      - "secoes": uma seção numerada por chunk (cai para "tamanho" se não achar seções)
+      - "tamanho" (padrão): chunks de chunk_size caracteres do PDFReader
+    """
+    if caminho.lower().endswith(".txt"):
+        with open(caminho, "r", encoding="utf-8") as f:
+            texto = f.read()
+        documentos = None
+        if config_chunker.get("estrategia") == "secoes":
+            documentos = quebrar_por_secoes(texto, nome, config_chunker["chunk_size"])
+        if not documentos:
+            documentos = [Document(name=nome, content=parte)
+                          for parte in _dividir_por_tamanho(texto.strip(), config_chunker["chunk_size"])]
+        return documentos
+
+    if config_chunker.get("estrategia") == "secoes":
+        paginas = await PDFReader(chunk=False).async_read(caminho, name=nome)
+        texto = "\n".join(pagina.content for pagina in paginas)
+        documentos = quebrar_por_secoes(texto, nome, config_chunker["chunk_size"])
+        if documentos:
+            return documentos
+        print(f"⚠️  '{nome}' não tem seções numeradas - usando chunks por tamanho.")
+
+    leitor = PDFReader(chunk=True, chunk_size=config_chunker["chunk_size"])
+    return await leitor.async_read(caminho, name=nome)
+
+
+def carregar_manifesto(caminho: str = CAMINHO_MANIFESTO) -> dict:
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            manifesto = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"embedder": None, "documentos": {}}
+
+    # Manifestos antigos guardavam o liga/desliga da busca híbrida junto do chunker;
+    # o índice de texto agora é cuidado pelo indice_lancedb.py (sem reembedar nada)
+    for registro in manifesto["documentos"].values():
+        registro["chunker"].pop("indice_texto", None)
+    return manifesto
+
+
+def salvar_manifesto(manifesto: dict, caminho: str = CAMINHO_MANIFESTO):
+    """
+    Salva o manifesto de forma atômica (escreve num temporário e renomeia),
+    para que uma queda no meio da escrita não deixe o arquivo corrompido.
+    """
+    os.makedirs(os.path.dirname(caminho) or ".", exist_ok=True)
+    temporario = caminho + ".tmp"
+    with open(temporario, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+    os.replace(temporario, caminho)
+
+
+def verificar_embedder(vector_db, manifesto: dict, embedder_deployment: str) -> dict:
+    """
+    Se o embedder mudou (modelo, backend ou dimensões) ou a tabela é do formato antigo de ids,
+    apaga a tabela e começa um manifesto novo - sem documentos e sem o estado do índice ANN
+    (ver indice_lancedb.py).
+    """
+    if not manifesto_compativel(manifesto, embedder_deployment):
+        if manifesto.get("embedder") is not None and vector_db.exists():
+            if manifesto["embedder"] != embedder_deployment:
+                print(f"♻️  Embedder mudou ({manifesto['embedder']} -> {embedder_deployment}) - recriando índice...")
+            else:
+                print("♻️  Índice com ids do formato antigo (um por conteúdo) - recriando índice...")
+            vector_db.drop()
+        manifesto = {"embedder": embedder_deployment, "ids": FORMATO_IDS, "documentos": {}}
+    return manifesto
+
+
+def manifesto_compativel(manifesto: dict, embedder_deployment: str) -> bool:
+    # Mesmo embedder e linhas gravadas com id por documento (tabelas antigas dividiam linhas)
+    return manifesto.get("embedder") == embedder_deployment and manifesto.get("ids") == FORMATO_IDS
+
+
+# Filtros no LanceDB
+# O LanceDb do Agno guarda os metadados de cada chunk dentro da coluna "payload" (JSON).
+# Para filtrar dentro da consulta (e não em Python, linha por linha), a condição SQL
+# procura o par "chave": "valor" exatamente como o json.dumps do Agno escreveu.
+
+REMOVER_POR_VEZ = 500  # chunks por DELETE (a condição cresce com a quantidade)
+
+
+def condicao_metadado(chave: str, valor: str) -> str:
+    """
+    Condição SQL para "meta_data[chave] == valor", usável em table.delete() e .where().
+    """
+    par = json.dumps({chave: valor})[1:-1]                 # '"documento": "v2.0/politica.pdf"'
+    par = re.sub(r"[\\%_]", "_", par).replace("'", "''")   # curingas do LIKE viram "_" (qualquer caractere)
+    return f"payload LIKE '%{par}%'"
+
+
+def remover_chunks(vector_db, nome: str, hashes):
+    """
+    Apaga do LanceDB os chunks `hashes` do documento `nome` num DELETE só (por lote).
+    """
+    hashes = sorted(hashes)
+    # Filtra pelo documento também: o mesmo texto pode existir em outra versão/documento
+    documento = condicao_metadado("documento", nome)
+    for inicio in range(0, len(hashes), REMOVER_POR_VEZ):
+        chunks = " OR ".join(condicao_metadado("chunk_hash", h) for h in hashes[inicio:inicio + REMOVER_POR_VEZ])
+        vector_db.table.delete(f"{documento} AND ({chunks})")
+
+
+def id_chunk(nome: str, hash_chunk: str) -> str:
+    # O Agno usaria md5(conteúdo): uma seção igual na v1.0 e na v2.0 viraria uma linha só,
+    # com os metadados da v1.0 - o filtro de versões esconderia a única cópia e apagar a
+    # v1.0 levaria junto o que a v2.0 usa. Aqui cada documento tem as suas linhas.
+    return hashlib.md5(f"{nome}\n{hash_chunk}".encode("utf-8")).hexdigest()
+
+
+async def gravar_chunks(vector_db, documentos, content_hash: str):
+    """
+    Embeda os chunks (chamadas em lote do embedder) e grava todos num table.add só,
+    no mesmo formato de linha do LanceDb do Agno, com o id de id_chunk().
+    Os documentos precisam de "documento" e "chunk_hash" no meta_data.
+    """
+    embedder = vector_db.embedder
+    textos = [documento.content for documento in documentos]
+    if hasattr(embedder, "async_get_embeddings_batch_and_usage"):
+        vetores, usos = await embedder.async_get_embeddings_batch_and_usage(textos)
+    else:
+        pares = await asyncio.gather(*(embedder.async_get_embedding_and_usage(texto) for texto in textos))
+        vetores, usos = [vetor for vetor, _ in pares], [uso for _, uso in pares]
+
+    # O embedder do Agno só registra o erro e devolve menos vetores: melhor falhar do que gravar buracos
+    if len(vetores) != len(documentos) or not all(vetores):
+        raise RuntimeError(f"O embedder devolveu {len(vetores)} vetor(es) para {len(documentos)} chunk(s)")
+
+    linhas = []
+    for documento, vetor, uso in zip(documentos, vetores, usos):
+        payload = {
+            "name": documento.name,
+            "meta_data": documento.meta_data,
+            "content": documento.content.replace("\x00", "\ufffd"),
+            "usage": uso,
+            "content_id": getattr(documento, "content_id", None),
+            "content_hash": content_hash,
+        }
+        linhas.append({
+            "id": id_chunk(documento.meta_data["documento"], documento.meta_data["chunk_hash"]),
+            "vector": [float(x) for x in vetor],
+            "payload": json.dumps(payload),
+        })
+
+    # O append é síncrono: roda numa thread para o event loop seguir livre
+    await asyncio.to_thread(vector_db.table.add, linhas)
+
+
+def documento_em_dia(manifesto: dict, nome: str, caminho: str, config_chunker: dict, tabela_existe: bool) -> bool:
+    """
+    True se o documento já está no índice com o mesmo conteúdo e o mesmo chunker.
+    Data de modificação e tamanho iguais ao manifesto bastam; senão compara o hash.
+    """
+    registro = manifesto["documentos"].get(nome)
+    if not (registro and tabela_existe and registro["chunker"] == config_chunker):
+        return False
+
+    info = os.stat(caminho)
+    if registro.get("mtime") == info.st_mtime and registro.get("tamanho") == info.st_size:
+        return True
+    return registro["hash"] == hash_arquivo(caminho)
+
+
+def remover_documento(kb, nome: str, caminho_manifesto: str = CAMINHO_MANIFESTO):
+    """
+    Tira do LanceDB e do manifesto os chunks de um documento que não existe mais.
+    """
+    manifesto = carregar_manifesto(caminho_manifesto)
+    if kb.vector_db.exists():
+        kb.vector_db.delete_by_name(nome)
+    manifesto["documentos"].pop(nome, None)
+    salvar_manifesto(manifesto, caminho_manifesto)
+    print(f"🗑️  '{nome}' removido da Knowledge Base.")
+
+
+async def ingerir_documento(
+    kb,
+    caminho: str,
+    nome: str,
+    config_chunker: dict,
+    embedder_deployment: str,
+    caminho_manifesto: str = CAMINHO_MANIFESTO,
+    metadados: dict = None,
+    documentos=None,
+) -> int:
+    """
+    Ingere um documento na Knowledge Base somente se ele mudou.
+
+    - Documento, chunker e embedder iguais ao manifesto -> nada é lido nem embedado.
+    - Documento mudou -> só os chunks novos vão para o embedder e os que
+      sumiram são removidos do LanceDB.
+    - Embedder mudou -> a tabela é recriada do zero (dimensões diferentes).
+
+    `metadados` (ex.: {"familia": ..., "versao": ...}) vai para todos os chunks.
+    `documentos` já quebrados (ex.: por um processo do corpus.py) pulam a leitura.
+
+    Retorna quantos chunks foram enviados ao embedder.
+    """
+    vector_db = kb.vector_db
+
+    # 1) Embedder diferente invalida todos os vetores já gravados
+    manifesto = verificar_embedder(vector_db, carregar_manifesto(caminho_manifesto), embedder_deployment)
+
+    tabela_existe = vector_db.exists()
+    registro = manifesto["documentos"].get(nome)
+
+    # 2) Nada mudou -> pula leitura e embeddings
+    if documento_em_dia(manifesto, nome, caminho, config_chunker, tabela_existe):
+        print(f"⏭️  '{nome}' sem alterações - embeddings reaproveitados.")
+        return 0
+    info = os.stat(caminho)
+    hash_atual = hash_arquivo(caminho)
+
+    # 3) Lê e quebra o documento localmente (sem custo de embedding)
+    if documentos is None:
+        documentos = await ler_chunks(caminho, nome, config_chunker)
+
+    chunks = {}
+    for documento in documentos:
+        hash_chunk = hash_texto(documento.content)
+        documento.meta_data = {**(documento.meta_data or {}), **(metadados or {}),
+                               "documento": nome, "chunk_hash": hash_chunk}
+        chunks[hash_chunk] = documento
+
+    # 4) Descobre o que precisa ser embedado / removido
+    reaproveitar = tabela_existe and registro is not None and registro["chunker"] == config_chunker
+    chunks_antigos = set(registro["chunks"]) if reaproveitar else set()
+
+    if not tabela_existe:
+        vector_db.create()
+    elif registro is not None and not reaproveitar:
+        # Chunker mudou: os chunks antigos deste documento não servem mais
+        vector_db.delete_by_name(nome)
+
+    novos = [h for h in chunks if h not in chunks_antigos]
+    removidos = chunks_antigos - set(chunks)
+
+    if removidos:
+        remover_chunks(vector_db, nome, removidos)
+
+    if novos:
+        await gravar_chunks(vector_db, [chunks[h] for h in novos], hash_atual)
+
+    # 5) Atualiza o manifesto só depois de gravar os vetores
+    manifesto["documentos"][nome] = {
+        "arquivo": caminho,
+        "hash": hash_atual,
+        "mtime": info.st_mtime,
+        "tamanho": info.st_size,
+        "chunker": config_chunker,
+        "chunks": list(chunks),
+    }
+    salvar_manifesto(manifesto, caminho_manifesto)
+
+    print(f"📥 '{nome}': {len(novos)} chunk(s) embedado(s), {len(removidos)} removido(s), "
+          f"{len(chunks) - len(novos)} reaproveitado(s).")
+    return len(novos)
@@ -0,0 +1,281 @@
+import os
+import queue
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from agno.knowledge.document import Document
+
+from ingestao import (
+    CAMINHO_MANIFESTO,
+    PADRAO_SECAO,
+    _dividir_por_tamanho,
+    carregar_manifesto,
+    documento_em_dia,
+    gravar_chunks,
+    hash_arquivo,
+    hash_texto,
+    remover_chunks,
+    salvar_manifesto,
+    verificar_embedder,
+)
+
+
+# Ingestão em fluxo para documentos grandes (ex.: arquivo de contratos com 10 mil páginas)
+#
+# O PDFReader lê o PDF inteiro num processo só e devolve todos os chunks de uma vez:
+# num arquivo grande isso demora e ocupa memória proporcional ao documento.
+# Aqui cada etapa passa adiante aos poucos:
+#
+#   processos (páginas) -> gerador de chunks -> lotes fixos -> fila limitada -> embedder + LanceDB
+#
+#   - As páginas são extraídas em paralelo (INGESTAO_WORKERS processos, blocos de
+#     INGESTAO_PAGINAS_POR_TAREFA páginas), com no máximo 2 blocos por processo em andamento
+#   - Os chunks saem de um gerador (por seção ou por tamanho, como no ingestao.py)
+#   - A cada INGESTAO_LOTE chunks, um lote entra numa fila de INGESTAO_LOTES_NA_FILA lugares:
+#     se o embedder está mais lento, a leitura espera (backpressure)
+#   - Cada lote é embedado (chamadas em lote do embedder) e gravado no LanceDB com um
+#     table.add só (gravar_chunks, no ingestao.py) - o manifesto já diz o que é novo
+#
+# Memória máxima ~ blocos de páginas em andamento + lotes na fila, qualquer que seja
+# o tamanho do documento. Usado para arquivos a partir de INGESTAO_FLUXO_MB.
+
+INGESTAO_WORKERS = int(os.getenv("INGESTAO_WORKERS", str(os.cpu_count() or 2)))
+INGESTAO_PAGINAS_POR_TAREFA = int(os.getenv("INGESTAO_PAGINAS_POR_TAREFA", "50"))
+INGESTAO_LOTE = int(os.getenv("INGESTAO_LOTE", "256"))
+INGESTAO_LOTES_NA_FILA = int(os.getenv("INGESTAO_LOTES_NA_FILA", "4"))
+INGESTAO_FLUXO_MB = float(os.getenv("INGESTAO_FLUXO_MB", "10"))
+
+LINHAS_POR_BLOCO_TXT = 2000
+
+
+def usar_fluxo(caminho: str) -> bool:
+    return os.path.getsize(caminho) >= INGESTAO_FLUXO_MB * 1024 * 1024
+
+
+# 1) Páginas (em paralelo, na ordem)
+
+def _extrair_paginas(caminho: str, inicio: int, fim: int):
+    # Roda num processo do pool: abre o PDF e extrai só as páginas [inicio, fim)
+    from pypdf import PdfReader
+
+    leitor = PdfReader(caminho)
+    return [leitor.pages[i].extract_text() or "" for i in range(inicio, fim)]
+
+
+def paginas_pdf(caminho: str, workers: int = INGESTAO_WORKERS,
+                paginas_por_tarefa: int = INGESTAO_PAGINAS_POR_TAREFA):
+    """
+    Gera o texto de cada página, na ordem, extraindo blocos de páginas em vários processos.
+    """
+    from pypdf import PdfReader
+
+    total = len(PdfReader(caminho).pages)
+    max_em_andamento = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        em_andamento = deque()
+        for inicio in range(0, total, paginas_por_tarefa):
+            em_andamento.append(pool.submit(_extrair_paginas, caminho, inicio,
+                                            min(inicio + paginas_por_tarefa, total)))
+            # Não dispara o documento inteiro: espera o bloco mais antigo antes de mandar mais
+            if len(em_andamento) >= max_em_andamento:
+                yield from em_andamento.popleft().result()
+        while em_andamento:
+            yield from em_andamento.popleft().result()
+
+
+def paginas_txt(caminho: str):
+    """
+    Gera o TXT em blocos de linhas (o "equivalente" a páginas), sem ler o arquivo inteiro.
+    """
+    with open(caminho, "r", encoding="utf-8") as f:
+        bloco = []
+        for linha in f:
+            bloco.append(linha)
+            if len(bloco) >= LINHAS_POR_BLOCO_TXT:
+                yield "".join(bloco)
+                bloco = []
+        if bloco:
+            yield "".join(bloco)
+
+
+def ler_paginas(caminho: str, workers: int = INGESTAO_WORKERS):
+    if caminho.lower().endswith(".txt"):
+        return paginas_txt(caminho)
+    return paginas_pdf(caminho, workers)
+
+
+# 2) Chunks (gerador)
+
+def chunks_em_fluxo(paginas, nome: str, config_chunker: dict):
+    """
+    Gera Documents a partir das páginas, sem juntar o documento inteiro.
+    Mesma regra do ingestao.py: com "secoes", cada seção numerada vira chunk(s) com o
+    título junto; o texto antes da 1ª seção só vira chunk se o documento não tiver seções.
+    """
+    tamanho = config_chunker["chunk_size"]
+    por_secoes = config_chunker.get("estrategia") == "secoes"
+
+    titulo = nome
+    secao = None              # None = antes da 1ª seção (ou documento sem seções)
+    viu_secao = False
+    emitiu_sem_secao = False  # o começo já virou chunk: o documento não tem cara de seções
+    linhas = []
+    acumulado = 0
+
+    def documento(texto):
+        if secao:
+            return Document(name=nome, content=f"{titulo} - {secao}\n{texto}", meta_data={"secao": secao})
+        return Document(name=nome, content=texto)
+
+    for pagina in paginas:
+        for linha in pagina.splitlines():
+            marca = PADRAO_SECAO.match(linha) if por_secoes else None
+            if marca:
+                texto = "\n".join(linhas).strip()
+                if texto and (viu_secao or emitiu_sem_secao):
+                    for parte in _dividir_por_tamanho(texto, tamanho):
+                        yield documento(parte)
+                elif not viu_secao:
+                    # Começo curto antes da 1ª seção: só serve de título
+                    preenchidas = [l.strip() for l in linhas if l.strip()]
+                    titulo = preenchidas[-1] if preenchidas else nome
+
+                secao = f"{marca.group(1)}) {marca.group(2)}"
+                viu_secao = True
+                linhas, acumulado = [], 0
+                continue
+
+            linhas.append(linha)
+            acumulado += len(linha) + 1
+
+            # Seção (ou documento sem seções) grande: solta os chunks completos, guarda o resto
+            if acumulado >= 2 * tamanho:
+                partes = _dividir_por_tamanho("\n".join(linhas).strip(), tamanho)
+                for parte in partes[:-1]:
+                    yield documento(parte)
+                emitiu_sem_secao = emitiu_sem_secao or not viu_secao
+                linhas = [partes[-1]] if partes else []
+                acumulado = sum(len(l) + 1 for l in linhas)
+
+    # Resto da última seção (ou o documento inteiro, se for curto e sem seções)
+    texto = "\n".join(linhas).strip()
+    if texto:
+        for parte in _dividir_por_tamanho(texto, tamanho):
+            yield documento(parte)
+
+
+# 3) Lotes -> embedder -> LanceDB
+
+async def ingerir_em_fluxo(
+    kb,
+    caminho: str,
+    nome: str,
+    config_chunker: dict,
+    embedder_deployment: str,
+    caminho_manifesto: str = CAMINHO_MANIFESTO,
+    metadados: dict = None,
+    tamanho_lote: int = INGESTAO_LOTE,
+    lotes_na_fila: int = INGESTAO_LOTES_NA_FILA,
+    workers: int = INGESTAO_WORKERS,
+) -> int:
+    """
+    Mesmo contrato do ingerir_documento (manifesto, chunks reaproveitados, removidos),
+    mas lendo, embedando e gravando em lotes. Retorna quantos chunks foram embedados.
+    """
+    vector_db = kb.vector_db
+    manifesto = verificar_embedder(vector_db, carregar_manifesto(caminho_manifesto), embedder_deployment)
+    tabela_existe = vector_db.exists()
+    registro = manifesto["documentos"].get(nome)
+
+    if documento_em_dia(manifesto, nome, caminho, config_chunker, tabela_existe):
+        print(f"⏭️  '{nome}' sem alterações - embeddings reaproveitados.")
+        return 0
+    info = os.stat(caminho)
+    hash_atual = hash_arquivo(caminho)
+
+    reaproveitar = tabela_existe and registro is not None and registro["chunker"] == config_chunker
+    chunks_antigos = set(registro["chunks"]) if reaproveitar else set()
+
+    if not tabela_existe:
+        vector_db.create()
+    elif registro is not None and not reaproveitar:
+        vector_db.delete_by_name(nome)
+
+    # Produtor (thread): páginas -> chunks -> lotes na fila. A fila cheia segura a leitura.
+    fila = queue.Queue(maxsize=lotes_na_fila)
+    parar = threading.Event()
+    hashes = []          # todos os chunks do documento, na ordem (vão para o manifesto)
+
+    def colocar(item):
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def produzir():
+        try:
+            vistos = set()
+            lote = []
+            for documento in chunks_em_fluxo(ler_paginas(caminho, workers), nome, config_chunker):
+                hash_chunk = hash_texto(documento.content)
+                if hash_chunk in vistos:
+                    continue
+                vistos.add(hash_chunk)
+                hashes.append(hash_chunk)
+                if hash_chunk in chunks_antigos:
+                    continue  # já está no LanceDB
+
+                documento.meta_data = {**documento.meta_data, **(metadados or {}),
+                                       "documento": nome, "chunk_hash": hash_chunk}
+                lote.append(documento)
+                if len(lote) >= tamanho_lote:
+                    colocar(lote)
+                    lote = []
+                if parar.is_set():
+                    return
+            if lote:
+                colocar(lote)
+            colocar(None)
+        except Exception as e:
+            colocar(e)
+
+    threading.Thread(target=produzir, name=f"ingestao-{nome}", daemon=True).start()
+
+    # Consumidor: cada lote é embedado (em lotes pelo embedder) e gravado num append só
+    novos = 0
+    try:
+        while True:
+            item = await asyncio.to_thread(fila.get)
+            if item is None:
+                break
+            if isinstance(item, Exception):
+                raise item
+            await gravar_chunks(vector_db, item, hash_atual)
+            novos += len(item)
+            print(f"   📦 '{nome}': {novos} chunk(s) gravado(s)...", flush=True)
+    finally:
+        parar.set()
+
+    removidos = chunks_antigos - set(hashes)
+    if removidos:
+        remover_chunks(vector_db, nome, removidos)
+
+    # Manifesto só no fim: se cair no meio, a próxima carga refaz este documento
+    manifesto["documentos"][nome] = {
+        "arquivo": caminho,
+        "hash": hash_atual,
+        "mtime": info.st_mtime,
+        "tamanho": info.st_size,
+        "chunker": config_chunker,
+        "chunks": hashes,
+    }
+    salvar_manifesto(manifesto, caminho_manifesto)
+
+    print(f"📥 '{nome}': {novos} chunk(s) embedado(s), {len(removidos)} removido(s), "
+          f"{len(hashes) - novos} reaproveitado(s).")
+    return novos
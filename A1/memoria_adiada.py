@@ -0,0 +1,139 @@
+import os
+import time
+import queue
+import threading
+from collections import defaultdict
+
+from agno.models.message import Message
+from agno.session.summary import SessionSummaryManager
+from agno.db.base import SessionType
+
+
+# Memória adiada (fora do caminho da resposta)
+#
+# Com enable_user_memories / enable_session_summaries, cada pergunta fazia mais
+# duas chamadas ao LLM (extrair memórias + resumir a sessão) ANTES de o usuário
+# receber a resposta. Aqui a resposta sai assim que o modelo termina, e os turnos
+# vão para uma fila:
+#   - Uma thread junta vários turnos do mesmo usuário/sessão
+#   - Faz UMA extração de memórias para o lote inteiro
+#   - Atualiza o resumo da sessão uma vez por lote
+#
+# Um lote é processado quando junta MEMORIA_LOTE turnos ou quando o turno mais
+# antigo espera MEMORIA_ESPERA_SEGUNDOS (o que vier primeiro).
+
+MEMORIA_LOTE = int(os.getenv("MEMORIA_LOTE", "4"))
+MEMORIA_ESPERA_SEGUNDOS = float(os.getenv("MEMORIA_ESPERA_SEGUNDOS", "20"))
+
+_PARAR = object()
+
+
+class FilaMemoria:
+    """
+    Worker em segundo plano para memórias do usuário e resumos de sessão.
+    """
+
+    def __init__(self, memory_manager, db, modelo, tamanho_lote: int = MEMORIA_LOTE,
+                 espera_maxima: float = MEMORIA_ESPERA_SEGUNDOS, resumir_sessao: bool = True):
+        self.memory_manager = memory_manager
+        self.db = db
+        self.resumir_sessao = resumir_sessao  # False quando o histórico.py já mantém o resumo
+        self.resumidor = SessionSummaryManager(model=modelo)
+        self.tamanho_lote = tamanho_lote
+        self.espera_maxima = espera_maxima
+
+        self._fila = queue.Queue()
+        self._pendentes = defaultdict(list)   # (user_id, session_id) -> turnos
+        self._desde = {}                      # (user_id, session_id) -> quando chegou o 1º turno
+        self._lock = threading.Lock()         # pendentes() lê de outra thread enquanto o worker mexe
+        self._thread = threading.Thread(target=self._rodar, name="fila-memoria", daemon=True)
+        self._thread.start()
+
+    # Uso
+
+    def registrar_turno(self, user_id: str, session_id: str, pergunta: str, resposta: str):
+        """
+        Enfileira o turno e retorna na hora.
+        """
+        self._fila.put((user_id, session_id, pergunta, resposta))
+
+    def esvaziar(self, timeout: float = None):
+        """
+        Processa tudo que está pendente agora e espera terminar
+        (antes de mostrar memórias ou ao fechar o programa).
+        """
+        pronto = threading.Event()
+        self._fila.put(pronto)
+        pronto.wait(timeout)
+
+    def pendentes(self) -> int:
+        with self._lock:
+            na_espera = sum(len(turnos) for turnos in self._pendentes.values())
+        return self._fila.qsize() + na_espera
+
+    def parar(self):
+        self._fila.put(_PARAR)
+        self._thread.join()
+
+    # Worker
+
+    def _rodar(self):
+        while True:
+            try:
+                item = self._fila.get(timeout=1.0)
+            except queue.Empty:
+                item = None
+
+            if item is _PARAR:
+                self._processar_todos()
+                return
+
+            if isinstance(item, threading.Event):
+                self._processar_todos()
+                item.set()
+                continue
+
+            agora = time.monotonic()
+            with self._lock:
+                if item is not None:
+                    user_id, session_id, pergunta, resposta = item
+                    chave = (user_id, session_id)
+                    self._pendentes[chave].append((pergunta, resposta))
+                    self._desde.setdefault(chave, agora)
+
+                prontos = [chave for chave, turnos in self._pendentes.items()
+                           if len(turnos) >= self.tamanho_lote or agora - self._desde[chave] >= self.espera_maxima]
+
+            for chave in prontos:
+                self._processar(chave)
+
+    def _processar_todos(self):
+        with self._lock:
+            chaves = list(self._pendentes)
+        for chave in chaves:
+            self._processar(chave)
+
+    def _processar(self, chave):
+        # Tira o lote da espera com o lock; as chamadas ao LLM ficam fora dele
+        with self._lock:
+            turnos = self._pendentes.pop(chave)
+            self._desde.pop(chave, None)
+        user_id, session_id = chave
+
+        try:
+            # 1) Uma extração de memórias para todos os turnos do lote
+            mensagens = []
+            for pergunta, resposta in turnos:
+                mensagens.append(Message(role="user", content=pergunta))
+                mensagens.append(Message(role="assistant", content=resposta))
+            self.memory_manager.create_user_memories(messages=mensagens, user_id=user_id)
+
+            # 2) Um resumo da sessão atualizado (a sessão já tem todas as mensagens do lote)
+            if session_id and self.resumir_sessao:
+                sessao = self.db.get_session(session_id=session_id, session_type=SessionType.AGENT, user_id=user_id)
+                if sessao is not None:
+                    self.resumidor.create_session_summary(session=sessao)
+                    self.db.upsert_session(sessao)
+
+        except Exception as e:
+            print(f"\n⚠️  Erro ao atualizar memórias de {user_id} ({len(turnos)} turno(s)): {e}")
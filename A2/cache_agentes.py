@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+
+# Cache de respostas dos agentes (endereçado por conteúdo)
+#
+# A chave é o hash de tudo que influencia a resposta do modelo:
+#   (nome do agente, modelo, hash das instruções, hash do prompt, temperatura)
+# Mesma entrada -> mesma chave -> resposta guardada, sem chamar o LLM.
+# Se as instruções de um agente mudarem, o hash muda e as respostas antigas
+# simplesmente deixam de ser usadas (e saem pelo LRU com o tempo).
+#
+# Fica em disco (SQLite), então vale entre execuções: gerar de novo um
+# comunicado que não mudou não custa nada.
+#
+# Modo replay: nenhuma chamada ao modelo é permitida - o fluxo inteiro sai do
+# cache, e uma resposta que não estiver guardada vira erro (útil para reproduzir
+# uma execução anterior ou testar o fluxo sem gastar tokens).
+
+CAMINHO_CACHE = os.getenv("A2_CACHE_CAMINHO", "../tmp/cache_agentes.db")
+MAX_ITENS = int(os.getenv("A2_CACHE_MAX_ITENS", "5000"))
+
+
+class RespostaForaDoCache(Exception):
+    pass
+
+
+def hash_texto(texto: str) -> str:
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def hash_instrucoes(agente) -> str:
+    """
+    Tudo que vai na mensagem de sistema do agente: papel, instruções, formato de saída.
+    """
+    schema = agente.output_schema.model_json_schema() if agente.output_schema else None
+    partes = {
+        "role": agente.role,
+        "instructions": agente.instructions,
+        "markdown": agente.markdown,
+        "output_schema": schema,
+    }
+    return hash_texto(json.dumps(partes, ensure_ascii=False, sort_keys=True, default=str))
+
+
+def chave_resposta(agente, prompt: str) -> str:
+    partes = {
+        "agente": agente.name,
+        "modelo": agente.model.id,
+        "instrucoes": hash_instrucoes(agente),
+        "prompt": hash_texto(prompt),
+        "temperatura": agente.model.temperature,
+    }
+    return hash_texto(json.dumps(partes, sort_keys=True))
+
+
+class CacheAgentes:
+    """
+    LRU em disco: cada leitura atualiza `ultimo_acesso`; acima de `max_itens`
+    as entradas menos usadas recentemente são apagadas.
+    """
+
+    def __init__(self, caminho: str = CAMINHO_CACHE, max_itens: int = MAX_ITENS, replay: bool = False):
+        self.caminho = caminho
+        self.max_itens = max_itens
+        self.replay = replay
+        self.acertos = 0
+        self.faltas = 0
+        self._lock = threading.Lock()
+
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self.conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS respostas (
+                chave          TEXT PRIMARY KEY,
+                agente         TEXT NOT NULL,
+                conteudo       TEXT NOT NULL,
+                criado_em      REAL NOT NULL,
+                ultimo_acesso  REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas (ultimo_acesso);
+        """)
+
+    def buscar(self, chave: str):
+        """
+        Retorna o conteúdo guardado ou None. No modo replay, a falta vira erro.
+        """
+        with self._lock:
+            linha = self.conexao.execute("SELECT conteudo FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                self.faltas += 1
+                if self.replay:
+                    raise RespostaForaDoCache(f"Modo replay: resposta {chave[:12]}… não está no cache")
+                return None
+
+            self.acertos += 1
+            self.conexao.execute("UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (time.time(), chave))
+            return linha[0]
+
+    def guardar(self, chave: str, agente: str, conteudo: str):
+        agora = time.time()
+        with self._lock:
+            self.conexao.execute(
+                "INSERT OR REPLACE INTO respostas (chave, agente, conteudo, criado_em, ultimo_acesso) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (chave, agente, conteudo, agora, agora),
+            )
+            # Remove as menos usadas se passou do limite
+            self.conexao.execute(
+                "DELETE FROM respostas WHERE chave IN ("
+                "  SELECT chave FROM respostas ORDER BY ultimo_acesso DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_itens,),
+            )
+
+    def estatisticas(self):
+        with self._lock:
+            total = self.conexao.execute("SELECT COUNT(*) FROM respostas").fetchone()[0]
+        return {"itens": total, "acertos": self.acertos, "faltas": self.faltas, "replay": self.replay}
+
+    def limpar(self):
+        with self._lock:
+            self.conexao.execute("DELETE FROM respostas")
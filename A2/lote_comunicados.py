@@ -0,0 +1,228 @@
+import os
+import csv
+import json
+import asyncio
+import argparse
+from datetime import datetime
+
+from multiagente import (
+    POLITICA_PADRAO,
+    montar_solicitacao_inicial,
+    formatar_analise,
+    etapa_redacao,
+    etapa_critica,
+    etapa_final,
+)
+from metricas import metricas, iniciar_servidor_metricas  # pasta comum/ (o multiagente já a coloca no sys.path)
+from clientes_modelo import executar_async
+
+
+# Geração de comunicados em lote
+#
+# Lê várias políticas de um arquivo (JSONL ou CSV), roda Redator → Crítico → Editor
+# para cada uma num pipeline por etapas com concorrência limitada e grava cada
+# resultado assim que fica pronto (uma linha JSON por item).
+#
+# Checkpoint: o próprio arquivo de saída. Ao rodar de novo, os itens que já têm
+# resultado "ok" são pulados - se o processo cair no item 800, recomeça do 800.
+#
+# Campos de cada política: id, prazo, condicao, como_solicitar, tempo_processamento
+# (opcionais: produto, idioma). Campos ausentes usam a política padrão.
+
+WORKERS_PADRAO = int(os.getenv("LOTE_WORKERS", "4"))
+
+
+def ler_politicas(caminho):
+    """
+    Lê as políticas uma a uma (gerador), sem carregar o arquivo inteiro na memória.
+    """
+    with open(caminho, "r", encoding="utf-8", newline="") as arquivo:
+        if caminho.endswith(".csv"):
+            linhas = csv.DictReader(arquivo)
+        else:
+            linhas = (json.loads(linha) for linha in arquivo if linha.strip())
+
+        for numero, politica in enumerate(linhas, 1):
+            politica = {**POLITICA_PADRAO, **{k: v for k, v in politica.items() if v not in (None, "")}}
+            politica["id"] = str(politica.get("id") or numero)
+            yield politica
+
+
+def carregar_concluidos(caminho_saida):
+    """
+    IDs que já têm resultado "ok" no arquivo de saída (checkpoint).
+    """
+    concluidos = set()
+    if not os.path.exists(caminho_saida):
+        return concluidos
+
+    with open(caminho_saida, "r", encoding="utf-8") as arquivo:
+        for linha in arquivo:
+            try:
+                resultado = json.loads(linha)
+            except json.JSONDecodeError:
+                continue  # última linha cortada por uma queda no meio da escrita
+            if resultado.get("status") == "ok":
+                concluidos.add(resultado["id"])
+    return concluidos
+
+
+def garantir_fim_de_linha(caminho_saida):
+    # Se a última escrita foi cortada no meio, começa a próxima numa linha nova
+    if not os.path.exists(caminho_saida) or os.path.getsize(caminho_saida) == 0:
+        return
+    with open(caminho_saida, "rb+") as arquivo:
+        arquivo.seek(-1, os.SEEK_END)
+        if arquivo.read(1) != b"\n":
+            arquivo.write(b"\n")
+
+
+def gravar_resultado(arquivo, resultado):
+    # Uma linha por item + flush/fsync: o que foi gravado sobrevive a uma queda
+    arquivo.write(json.dumps(resultado, ensure_ascii=False) + "\n")
+    arquivo.flush()
+    os.fsync(arquivo.fileno())
+
+
+# Estágios do pipeline em lote
+#
+# Em vez de cada worker levar um item do começo ao fim, cada etapa tem os seus
+# próprios workers e uma fila para a etapa seguinte:
+#
+#   leitor → [Redator] → fila → [Crítico ⇄ revisão] → fila → [Editor] → fila → gravador
+#
+# Assim o Crítico do item k roda ao mesmo tempo que o Redator do item k+1 e o Editor do k-1.
+# Um item com erro segue pelas filas sem passar pelas próximas etapas, até o gravador.
+
+async def _redigir(item):
+    item["rascunho"] = await etapa_redacao(montar_solicitacao_inicial(item["politica"]))
+
+
+async def _criticar(item):
+    item["rascunho"], item["analise_estruturada"], item["rodadas"] = await etapa_critica(item["rascunho"])
+
+
+async def _editar(item):
+    item["versao_final"], item["editor_usado"] = await etapa_final(item["rascunho"], item["analise_estruturada"])
+
+
+async def _estagio(funcao, entrada, saida, workers, consumidores):
+    """
+    Roda `workers` cópias de uma etapa: tira da fila de entrada, processa, passa para a saída.
+    No fim manda um sinal de parada (None) para cada consumidor da etapa seguinte.
+    """
+    async def worker():
+        while True:
+            item = await entrada.get()
+            if item is None:
+                return
+            if "erro" not in item:
+                try:
+                    await funcao(item)
+                except Exception as e:
+                    item["erro"] = str(e)
+            await saida.put(item)
+
+    await asyncio.gather(*[worker() for _ in range(workers)])
+    for _ in range(consumidores):
+        await saida.put(None)
+
+
+async def _gravador(entrada, arquivo_saida, contadores):
+    while True:
+        item = await entrada.get()
+        if item is None:
+            return
+
+        politica = item["politica"]
+        duracao = (datetime.now() - item["inicio"]).total_seconds()
+
+        if "erro" in item:
+            resultado = {"id": politica["id"], "status": "erro", "politica": politica, "erro": item["erro"]}
+            contadores["erro"] += 1
+            print(f"❌ {politica['id']} falhou: {item['erro']}")
+        else:
+            resultado = {
+                "id": politica["id"],
+                "status": "ok",
+                "politica": politica,
+                "rascunho": item["rascunho"],
+                "analise": formatar_analise(item["analise_estruturada"]),
+                "rodadas": item["rodadas"],
+                "editor_usado": item["editor_usado"],
+                "versao_final": item["versao_final"],
+            }
+            contadores["ok"] += 1
+            print(f"✅ {politica['id']} concluído em {duracao:.1f}s")
+
+        resultado["concluido_em"] = datetime.now().isoformat(timespec="seconds")
+        gravar_resultado(arquivo_saida, resultado)
+
+
+async def _alimentar(caminho_entrada, concluidos, saida, workers, contadores):
+    for politica in ler_politicas(caminho_entrada):
+        if politica["id"] in concluidos:
+            contadores["pulados"] += 1
+            continue
+        await saida.put({"politica": politica, "inicio": datetime.now()})
+
+    # Um sinal de parada por worker da primeira etapa (as outras repassam)
+    for _ in range(workers):
+        await saida.put(None)
+
+
+async def executar_lote(caminho_entrada, caminho_saida, workers=WORKERS_PADRAO):
+    """
+    Processa todas as políticas do arquivo de entrada com até `workers` chamadas
+    em andamento por etapa. Retorna a contagem de itens ok / erro / pulados.
+    """
+    concluidos = carregar_concluidos(caminho_saida)
+    contadores = {"ok": 0, "erro": 0, "pulados": 0}
+
+    print("=" * 80)
+    print(f"🚀 LOTE DE COMUNICADOS: {caminho_entrada} → {caminho_saida} ({workers} workers por etapa)")
+    if concluidos:
+        print(f"♻️  Retomando: {len(concluidos)} item(ns) já concluído(s) serão pulados")
+    print("=" * 80)
+
+    garantir_fim_de_linha(caminho_saida)
+
+    # Filas limitadas: nenhuma etapa passa muito à frente da seguinte (memória constante)
+    fila_redacao, fila_critica, fila_edicao, fila_gravacao = (asyncio.Queue(maxsize=workers * 2) for _ in range(4))
+
+    with open(caminho_saida, "a", encoding="utf-8") as arquivo_saida:
+        tarefas = [
+            asyncio.create_task(_estagio(_redigir, fila_redacao, fila_critica, workers, workers)),
+            asyncio.create_task(_estagio(_criticar, fila_critica, fila_edicao, workers, workers)),
+            asyncio.create_task(_estagio(_editar, fila_edicao, fila_gravacao, workers, 1)),
+            asyncio.create_task(_gravador(fila_gravacao, arquivo_saida, contadores)),
+            asyncio.create_task(_alimentar(caminho_entrada, concluidos, fila_redacao, workers, contadores)),
+        ]
+
+        # Se uma tarefa quebrar (ex.: o gravador sem disco), ninguém mais esvazia a fila
+        # dela e as outras travam no put: cancela todas e deixa o erro subir
+        try:
+            await asyncio.gather(*tarefas)
+        except BaseException:
+            for tarefa in tarefas:
+                tarefa.cancel()
+            await asyncio.gather(*tarefas, return_exceptions=True)
+            raise
+
+    print("=" * 80)
+    print(f"✅ LOTE CONCLUÍDO: {contadores['ok']} ok | {contadores['erro']} com erro | {contadores['pulados']} pulados")
+    print("⏱️  Latência e tokens por etapa:")
+    metricas.imprimir_resumo()
+    print("=" * 80)
+    return contadores
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera comunicados em lote a partir de um catálogo de políticas")
+    parser.add_argument("entrada", help="Arquivo .jsonl ou .csv com uma política por linha")
+    parser.add_argument("saida", help="Arquivo .jsonl de resultados (também serve de checkpoint)")
+    parser.add_argument("--workers", type=int, default=WORKERS_PADRAO, help="Chamadas simultâneas por etapa")
+    args = parser.parse_args()
+
+    iniciar_servidor_metricas()
+    executar_async(executar_lote(args.entrada, args.saida, args.workers))
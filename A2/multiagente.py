@@ -1,17 +1,56 @@
 import os                              
+import sys
+import time
+import asyncio
+import argparse
 from dotenv import load_dotenv        
 from agno.agent import Agent           
-from agno.models.azure.openai_chat import AzureOpenAI
+from agno.run.agent import RunEvent
 from textwrap import dedent
+from typing import List
+from pydantic import BaseModel, Field
+
+from cache_agentes import CacheAgentes, chave_resposta
 
 
 load_dotenv()
 
+# Clientes de modelo compartilhados com o A1 (pasta comum/ na raiz do repositório)
+# Importado depois do load_dotenv: os limites de conexão/taxa vêm do .env
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "comum"))
+from clientes_modelo import criar_modelo_chat, executar_async
+from metricas import metricas, iniciar_servidor_metricas
+
 # Verifica se as variáveis necessárias estão configuradas
-chat_model = AzureOpenAI(
-        id=os.getenv("OPENAI_MODEL_NAME"),
+# Um único modelo (e um único pool de conexões) para os 3 agentes
+chat_model = criar_modelo_chat(
+        deployment=os.getenv("OPENAI_MODEL_NAME"),
         api_version=os.getenv("OPENAI_API_VERSION")
-    ),
+    )
+
+
+# Máximo de rodadas Redator ⇄ Crítico antes de passar para o Editor
+MAX_RODADAS = int(os.getenv("MAX_RODADAS", "2"))
+
+CABECALHO_OFICIAL = "📢 COMUNICADO OFICIAL - POLÍTICA DE REEMBOLSOS"
+
+# Cache em disco das respostas dos agentes (A2_CACHE=0 desliga; A2_REPLAY=1 só usa o cache)
+cache_agentes = None
+if os.getenv("A2_CACHE", "1") == "1":
+    cache_agentes = CacheAgentes(replay=os.getenv("A2_REPLAY", "0") == "1")
+
+
+# Resposta estruturada do Crítico (em vez de texto livre)
+# Com ela o fluxo sabe se o texto foi aprovado sem precisar "ler" a resposta
+
+class ProblemaComunicado(BaseModel):
+    descricao: str = Field(..., description="O que está confuso, incompleto ou ambíguo")
+    fonte: str = Field(..., description="Trecho exato do comunicado onde está o problema")
+
+
+class AnaliseCritica(BaseModel):
+    aprovado: bool = Field(..., description="True se o comunicado pode ser publicado sem alterações")
+    problemas: List[ProblemaComunicado] = Field(default_factory=list, description="Problemas encontrados")
 
 
 # O Redator é responsável por escrever o comunicado inicial
@@ -63,15 +102,15 @@ critico = Agent(
         - Verificar AMBIGUIDADES: Algo pode ser mal interpretado?
         
         IMPORTANTE:
-        - SEMPRE cite a FONTE dos problemas (qual frase/parágrafo)
-        - Use formato: "❌ Problema: [descrição] | 📍 Fonte: [trecho exato]"
-        - Se estiver tudo OK, diga: "✅ Aprovado sem ressalvas"
+        - SEMPRE cite a FONTE dos problemas (trecho exato da frase/parágrafo)
+        - Cada problema tem: descrição + fonte
+        - Se estiver tudo OK, marque aprovado = true e deixe a lista de problemas vazia
         
         Seja específico e construtivo!
     """),
     
-    
-    markdown=True,
+    # Resposta estruturada: aprovado + lista de problemas
+    output_schema=AnaliseCritica,
 )
 
 
@@ -111,14 +150,280 @@ editor = Agent(
 
 
 
-# Esta função coordena os 3 agentes em sequência
+# Solicitações (prompts) usadas pelo fluxo
+# Parte fixa primeiro e conteúdo variável no final: as instruções dos agentes e o
+# começo de cada prompt ficam iguais entre chamadas e aproveitam o cache de prompt
+# do provedor (que funciona por prefixo).
+
+# Política usada quando nenhuma outra é informada
+POLITICA_PADRAO = {
+    "prazo": "30 dias após a compra",
+    "condicao": "produto não utilizado e na embalagem original",
+    "como_solicitar": "através do portal de atendimento ou email suporte@empresa.com",
+    "tempo_processamento": "até 10 dias úteis",
+}
+
+
+def montar_solicitacao_inicial(politica):
+    # Cria a solicitação (prompt) para o Redator a partir de uma política
+    # (campos opcionais "produto" e "idioma" permitem uma versão por linha de produto/locale)
+    publico = f"\n    - Linha de produtos: {politica['produto']}" if politica.get("produto") else ""
+    idioma = f"\n    - Idioma do comunicado: {politica['idioma']}" if politica.get("idioma") else ""
+    return f"""
+    Escreva um comunicado claro sobre a política de reembolsos da empresa.
+    
+    Informações a incluir:
+    - Prazo: {politica["prazo"]}
+    - Condição: {politica["condicao"]}
+    - Como solicitar: {politica["como_solicitar"]}
+    - Tempo de processamento: {politica["tempo_processamento"]}{publico}{idioma}
+    """
+
+
+SOLICITACAO_INICIAL = montar_solicitacao_inicial(POLITICA_PADRAO)
+
+
+def montar_solicitacao_critica(texto_inicial):
+    # O Crítico recebe o texto do Redator e analisa
+    return f"""
+    Analise o comunicado sobre reembolsos abaixo.
+    Identifique problemas de clareza, completude ou ambiguidade.
+    Cite a fonte específica de cada problema.
+    
+    COMUNICADO:
+    {texto_inicial}
+    """
+
 
-def executar_sistema_multiagentes():
+def montar_solicitacao_revisao(texto_atual, analise_critica):
+    # O Redator corrige o próprio texto a partir das críticas (nova rodada)
+    return f"""
+    Revise o seu comunicado corrigindo os problemas apontados pelo Crítico.
+    Entregue apenas o comunicado revisado.
+    
+    COMUNICADO ATUAL:
+    {texto_atual}
+    
+    PROBLEMAS APONTADOS:
+    {analise_critica}
+    """
+
+
+def montar_solicitacao_final(texto_inicial, analise_critica):
+    # Aqui o Editor recebe TANTO o texto inicial QUANTO as críticas
+    return f"""
+    Produza a versão final do comunicado.
+    Corrija todos os problemas apontados e entregue a versão final.
+    
+    TEXTO ORIGINAL DO REDATOR:
+    {texto_inicial}
+    
+    ANÁLISE DO CRÍTICO:
+    {analise_critica}
+    """
+
+
+def esta_aprovado(analise):
+    return analise.aprovado and not analise.problemas
+
+
+def contar_problemas(analise):
+    # Reprovado sem lista de problemas conta como 1 (o Crítico não disse o quê)
+    if esta_aprovado(analise):
+        return 0
+    return max(len(analise.problemas), 1)
+
+
+def formatar_analise(analise):
+    # Converte a análise estruturada no formato de texto do Crítico (para mostrar e para o Editor)
+    if esta_aprovado(analise):
+        return "✅ Aprovado sem ressalvas"
+    if not analise.problemas:
+        return "❌ Problema: comunicado reprovado sem detalhes | 📍 Fonte: texto completo"
+    return "\n".join(f"❌ Problema: {p.descricao} | 📍 Fonte: {p.fonte}" for p in analise.problemas)
+
+
+def finalizar_sem_editor(texto):
+    # Texto aprovado pelo Crítico: só garante o cabeçalho oficial que o Editor colocaria
+    if CABECALHO_OFICIAL in texto:
+        return texto
+    return f"{CABECALHO_OFICIAL}\n\n{texto}"
+
+
+
+# Streaming: cada agente manda o texto em pedaços, conforme o modelo gera
+#
+# As etapas não imprimem direto: elas chamam `emitir(evento)` com dicts simples
+#   {"tipo": "etapa", "agente": ..., "titulo": ...}     -> começou uma etapa
+#   {"tipo": "conteudo", "agente": ..., "texto": ...}   -> mais um pedaço de texto
+#   {"tipo": "fim_etapa", "agente": ...}                -> etapa terminou
+# Quem chama decide o que fazer: o console imprime (imprimir_evento) e o
+# servidor_sse.py repassa para o navegador.
+
+def imprimir_evento(evento):
+    # Console ao vivo: o texto aparece enquanto o agente escreve
+    if evento["tipo"] == "etapa":
+        print(evento["titulo"])
+        print("-" * 80)
+    elif evento["tipo"] == "conteudo":
+        print(evento["texto"], end="", flush=True)
+    elif evento["tipo"] == "fim_etapa":
+        print()
+        print()
+
+
+def _sem_saida(evento):
+    pass
+
+
+async def _rodar_agente(agente, solicitacao, emitir):
+    """
+    Roda o agente em streaming e devolve a resposta completa.
+    Agentes com resposta estruturada (Crítico) devolvem o objeto pronto, sem pedaços de texto.
+    
+    Se a mesma chamada já foi feita (mesmo agente, modelo, instruções, prompt e
+    temperatura), a resposta vem do cache em disco e o modelo não é chamado.
+    """
+    chave = None
+    if cache_agentes is not None:
+        chave = chave_resposta(agente, solicitacao)
+        with metricas.medir(f"{agente.name} (cache)"):
+            guardado = cache_agentes.buscar(chave)
+        if guardado is not None:
+            if agente.output_schema is not None:
+                return agente.output_schema.model_validate_json(guardado)
+            emitir({"tipo": "conteudo", "agente": agente.name, "texto": guardado})
+            return guardado
+    
+    # Latência medida aqui; tokens vêm do evento final do Agno
+    inicio = time.perf_counter()
+    try:
+        resposta, metricas_execucao = await _chamar_modelo(agente, solicitacao, emitir)
+    except Exception:
+        metricas.registrar(agente.name, time.perf_counter() - inicio, erro=True)
+        raise
+    metricas.registrar_execucao(agente.name, metricas_execucao, duracao=time.perf_counter() - inicio)
+    
+    if chave is not None:
+        conteudo = resposta.model_dump_json() if isinstance(resposta, BaseModel) else resposta
+        cache_agentes.guardar(chave, agente.name, conteudo)
+    return resposta
+
+
+async def _chamar_modelo(agente, solicitacao, emitir):
+    partes = []
+    resultado = None
+    metricas_execucao = None
+    
+    async for evento in agente.arun(solicitacao, stream=True, stream_intermediate_steps=True):
+        if evento.event == RunEvent.run_completed:
+            metricas_execucao = getattr(evento, "metrics", None)
+            continue
+        if evento.event != RunEvent.run_content or evento.content is None:
+            continue
+        
+        if isinstance(evento.content, BaseModel):
+            resultado = evento.content
+        elif agente.output_schema is None:
+            partes.append(evento.content)
+            emitir({"tipo": "conteudo", "agente": agente.name, "texto": evento.content})
+        else:
+            partes.append(evento.content)  # JSON parcial: só monta no final
+    
+    if resultado is None and agente.output_schema is not None:
+        resultado = agente.output_schema.model_validate_json("".join(partes))
+    if resultado is None:
+        resultado = "".join(partes)
+    return resultado, metricas_execucao
+
+
+
+# Etapas do fluxo (usadas juntas no executar_pipeline_async ou separadas no lote)
+
+async def etapa_redacao(solicitacao_inicial, emitir=_sem_saida):
+    emitir({"tipo": "etapa", "agente": redator.name, "titulo": "📝 ETAPA 1: Redator escrevendo comunicado inicial..."})
+    texto = await _rodar_agente(redator, solicitacao_inicial, emitir)
+    emitir({"tipo": "fim_etapa", "agente": redator.name})
+    return texto
+
+
+async def etapa_critica(texto, max_rodadas=MAX_RODADAS, emitir=_sem_saida):
+    """
+    Crítico analisa; se reprovar, o Redator revisa e o Crítico analisa de novo (até `max_rodadas`).
+    Retorna (texto, analise, rodadas).
+    """
+    max_rodadas = max(1, max_rodadas)  # o Crítico analisa pelo menos uma vez
+    for rodada in range(1, max_rodadas + 1):
+        emitir({"tipo": "etapa", "agente": critico.name,
+                "titulo": f"🔍 ETAPA 2: Crítico analisando o comunicado (rodada {rodada}/{max_rodadas})..."})
+        analise = await _rodar_agente(critico, montar_solicitacao_critica(texto), emitir)
+        emitir({"tipo": "conteudo", "agente": critico.name, "texto": formatar_analise(analise)})
+        emitir({"tipo": "fim_etapa", "agente": critico.name})
+        
+        # Regra de parada: aprovado ou última rodada
+        if esta_aprovado(analise) or rodada == max_rodadas:
+            break
+        
+        emitir({"tipo": "etapa", "agente": redator.name, "titulo": "📝 Redator revisando o comunicado..."})
+        texto = await _rodar_agente(redator, montar_solicitacao_revisao(texto, formatar_analise(analise)), emitir)
+        emitir({"tipo": "fim_etapa", "agente": redator.name})
+    
+    return texto, analise, rodada
+
+
+async def etapa_final(texto, analise, emitir=_sem_saida):
+    """
+    Editor só roda se ainda sobrarem problemas. Retorna (versao_final, editor_usado).
+    """
+    if esta_aprovado(analise):
+        versao_final = finalizar_sem_editor(texto)
+        emitir({"tipo": "etapa", "agente": editor.name, "titulo": "⏭️  ETAPA 3: Crítico aprovou - Editor não é necessário"})
+        emitir({"tipo": "conteudo", "agente": editor.name, "texto": versao_final})
+        emitir({"tipo": "fim_etapa", "agente": editor.name})
+        return versao_final, False
+    
+    emitir({"tipo": "etapa", "agente": editor.name, "titulo": "✍️ ETAPA 3: Editor produzindo versão final..."})
+    versao_final = await _rodar_agente(editor, montar_solicitacao_final(texto, formatar_analise(analise)), emitir)
+    emitir({"tipo": "fim_etapa", "agente": editor.name})
+    return versao_final, True
+
+
+# Fluxo completo: Redator ⇄ Crítico (até aprovar ou acabar as rodadas) → Editor só se precisar
+
+async def executar_pipeline_async(solicitacao_inicial, max_rodadas=MAX_RODADAS, mostrar=False, emitir=None):
+    """
+    Executa o fluxo para uma solicitação e retorna os textos de cada etapa.
+    
+    - O Crítico devolve uma análise estruturada (aprovado + lista de problemas)
+    - Se reprovar, o Redator revisa e o Crítico analisa de novo (até `max_rodadas`)
+    - O Editor só roda se ainda sobrarem problemas no fim das rodadas
+    - `mostrar=True` imprime tudo ao vivo; `emitir` recebe os eventos de streaming
+    """
+    if emitir is None:
+        emitir = imprimir_evento if mostrar else _sem_saida
+    
+    texto = await etapa_redacao(solicitacao_inicial, emitir)
+    texto, analise, rodadas = await etapa_critica(texto, max_rodadas, emitir)
+    versao_final, editor_usado = await etapa_final(texto, analise, emitir)
+    
+    return {
+        "rascunho": texto,
+        "analise": formatar_analise(analise),
+        "rodadas": rodadas,
+        "editor_usado": editor_usado,
+        "versao_final": versao_final,
+    }
+
+
+
+# Esta função coordena os 3 agentes
+
+def executar_sistema_multiagentes(max_rodadas=MAX_RODADAS):
     """
     Executa o fluxo completo do sistema multi-agentes.
     
     Fluxo:
-    1. Redator escreve → 2. Crítico analisa → 3. Editor finaliza
+    1. Redator escreve → 2. Crítico analisa (Redator revisa se preciso) → 3. Editor finaliza (se ainda houver problemas)
     """
     
     print("=" * 80)
@@ -126,80 +431,106 @@ def executar_sistema_multiagentes():
     print("=" * 80)
     print()
     
-   
-    print("📝 ETAPA 1: Redator escrevendo comunicado inicial...")
-    print("-" * 80)
-    
-    # Cria a solicitação (prompt) para o Redator
-    solicitacao_inicial = """
-    Escreva um comunicado claro sobre a política de reembolsos da empresa.
+    resultado = executar_async(executar_pipeline_async(SOLICITACAO_INICIAL, max_rodadas, mostrar=True))
     
-    Informações a incluir:
-    - Prazo: 30 dias após a compra
-    - Condição: produto não utilizado e na embalagem original
-    - Como solicitar: através do portal de atendimento ou email suporte@empresa.com
-    - Tempo de processamento: até 10 dias úteis
-    """
-    
-    # O Redator gera a resposta (comunicado inicial)
-    resposta_redator = redator.run(solicitacao_inicial)
-    texto_inicial = resposta_redator.content
+    # FIM
     
-    print(texto_inicial)
+    print("⏱️  Latência e tokens por etapa:")
+    metricas.imprimir_resumo()
     print()
     
+    print("=" * 80)
+    print("✅ SISTEMA MULTI-AGENTES CONCLUÍDO COM SUCESSO!")
+    print("=" * 80)
     
-    print("🔍 ETAPA 2: Crítico analisando o comunicado...")
-    print("-" * 80)
+    return resultado["versao_final"]
+
+
+
+# Modo com vários rascunhos em paralelo
+#
+# N Redatores escrevem ao mesmo tempo; cada rascunho vai para o Crítico assim que fica pronto
+# (sem esperar os outros). O Editor roda uma vez só, sobre o rascunho com menos problemas
+# (e nem roda, se esse rascunho foi aprovado).
+# Tempo total ≈ 1 rascunho + 1 crítica + 1 edição, e não N vezes a cadeia inteira.
+
+async def _rascunho_com_critica(numero, total):
+    # Pede abordagens diferentes para os rascunhos não saírem iguais
+    solicitacao = SOLICITACAO_INICIAL + f"""
+    (Rascunho {numero} de {total}: proponha a sua própria estrutura e abordagem.)
+    """
     
-    # O Crítico recebe o texto do Redator e analisa
-    solicitacao_critica = f"""
-    Analise este comunicado sobre reembolsos:
+    texto = await _rodar_agente(redator, solicitacao, _sem_saida)
+    print(f"📝 Rascunho {numero} pronto - enviando ao Crítico...")
     
-    {texto_inicial}
+    analise = await _rodar_agente(critico, montar_solicitacao_critica(texto), _sem_saida)
+    problemas = contar_problemas(analise)
+    print(f"🔍 Rascunho {numero} analisado: {problemas} problema(s)")
     
-    Identifique problemas de clareza, completude ou ambiguidade.
-    Cite a fonte específica de cada problema.
+    return {"numero": numero, "texto": texto, "analise": analise, "problemas": problemas}
+
+
+async def executar_multiplos_rascunhos(n_rascunhos=3):
+    """
+    Executa o fluxo com N rascunhos em paralelo e edita só o melhor.
     """
     
-    resposta_critico = critico.run(solicitacao_critica)
-    analise_critica = resposta_critico.content
-    
-    print(analise_critica)
+    print("=" * 80)
+    print(f"🚀 INICIANDO SISTEMA MULTI-AGENTES ({n_rascunhos} rascunhos em paralelo)")
+    print("=" * 80)
     print()
     
-    print("✍️ ETAPA 3: Editor produzindo versão final...")
+    print("📝🔍 ETAPAS 1 e 2: Redatores escrevendo e Crítico analisando...")
     print("-" * 80)
     
-    # Aqui o Editor recebe TANTO o texto inicial QUANTO as críticas
-    solicitacao_final = f"""
-    Produza a versão final do comunicado considerando:
+    resultados = await asyncio.gather(
+        *[_rascunho_com_critica(numero, n_rascunhos) for numero in range(1, n_rascunhos + 1)]
+    )
     
-    TEXTO ORIGINAL DO REDATOR:
-    {texto_inicial}
-    
-    ANÁLISE DO CRÍTICO:
-    {analise_critica}
-    
-    Corrija todos os problemas apontados e entregue a versão final.
-    """
+    # Melhor rascunho = menos problemas apontados (empate: o primeiro)
+    melhor = min(resultados, key=lambda r: r["problemas"])
+    analise_critica = formatar_analise(melhor["analise"])
+    print()
+    print(f"🏆 Melhor rascunho: {melhor['numero']} ({melhor['problemas']} problema(s))")
+    print()
+    print(melhor["texto"])
+    print()
+    print(analise_critica)
+    print()
     
-    resposta_editor = editor.run(solicitacao_final)
-    versao_final = resposta_editor.content
+    versao_final, _ = await etapa_final(melhor["texto"], melhor["analise"], imprimir_evento)
     
-    print(versao_final)
+    print("⏱️  Latência e tokens por etapa:")
+    metricas.imprimir_resumo()
     print()
     
-    # FIM
-    
     print("=" * 80)
     print("✅ SISTEMA MULTI-AGENTES CONCLUÍDO COM SUCESSO!")
     print("=" * 80)
+    
+    return versao_final
 
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sistema multi-agentes: Redator · Crítico · Editor")
+    parser.add_argument("--rascunhos", type=int, default=1,
+                        help="Quantos rascunhos gerar em paralelo (1 = fluxo sequencial original)")
+    parser.add_argument("--rodadas", type=int, default=MAX_RODADAS,
+                        help="Máximo de rodadas Redator ⇄ Crítico antes do Editor")
+    parser.add_argument("--replay", action="store_true",
+                        help="Reproduz a execução só com respostas do cache (sem chamar o modelo)")
+    args = parser.parse_args()
+    
+    if args.replay:
+        if cache_agentes is None:
+            parser.error("--replay precisa do cache ligado (A2_CACHE=1)")
+        cache_agentes.replay = True
+    
+    iniciar_servidor_metricas()
+    
     # Executa a função principal
-    executar_sistema_multiagentes()
-
-
+    if args.rascunhos > 1:
+        executar_async(executar_multiplos_rascunhos(args.rascunhos))
+    else:
+        executar_sistema_multiagentes(args.rodadas)
@@ -0,0 +1,94 @@
+import json
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from multiagente import POLITICA_PADRAO, MAX_RODADAS, montar_solicitacao_inicial, executar_pipeline_async
+from metricas import metricas  # pasta comum/ (o multiagente já a coloca no sys.path)
+from clientes_modelo import executar_async
+
+
+# Endpoint de Server-Sent Events (SSE)
+#
+# Mostra o fluxo Redator → Crítico → Editor ao vivo no navegador (ou via curl):
+#   GET /comunicado?prazo=15 dias&produto=Assinatura
+#
+# Cada evento de streaming vira uma mensagem SSE:
+#   event: etapa | conteudo | fim_etapa | concluido | erro
+#   data: {"agente": "...", "texto": "..."}
+#
+# GET /metrics devolve latência e tokens por etapa no formato do Prometheus.
+#
+# Só usa a biblioteca padrão (http.server); cada conexão roda numa thread própria.
+
+PORTA_PADRAO = 8001
+LIMITE_RODADAS = 5  # ?rodadas= aceita de 1 até aqui (cada rodada são duas chamadas ao modelo)
+
+
+class ManipuladorSSE(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            self.enviar_metricas()
+            return
+        if url.path != "/comunicado":
+            self.send_error(404, "Use /comunicado")
+            return
+
+        # Parâmetros da URL sobrescrevem a política padrão (mesmos campos do lote)
+        parametros = {chave: valores[0] for chave, valores in parse_qs(url.query).items()}
+        politica = {**POLITICA_PADRAO, **parametros}
+
+        # Valida antes dos cabeçalhos: com o 200 enviado, não dá mais para responder 400
+        try:
+            max_rodadas = int(parametros.get("rodadas", MAX_RODADAS))
+        except ValueError:
+            max_rodadas = None
+        if max_rodadas is None or not 1 <= max_rodadas <= LIMITE_RODADAS:
+            self.send_error(400, f"'rodadas' deve ser um número de 1 a {LIMITE_RODADAS}")
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "keep-alive")
+        self.end_headers()
+
+        try:
+            resultado = executar_async(executar_pipeline_async(
+                montar_solicitacao_inicial(politica), max_rodadas, emitir=self.enviar_evento
+            ))
+            self.enviar_evento({"tipo": "concluido", **resultado})
+        except (BrokenPipeError, ConnectionResetError):
+            # Cliente fechou a conexão: o fluxo é interrompido junto
+            print(f"⚠️  Cliente {self.client_address[0]} desconectou no meio do fluxo")
+        except Exception as e:
+            self.enviar_evento({"tipo": "erro", "texto": str(e)})
+
+    def enviar_metricas(self):
+        corpo = metricas.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def enviar_evento(self, evento):
+        dados = {chave: valor for chave, valor in evento.items() if chave != "tipo"}
+        mensagem = f"event: {evento['tipo']}\ndata: {json.dumps(dados, ensure_ascii=False)}\n\n"
+        self.wfile.write(mensagem.encode("utf-8"))
+        self.wfile.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor SSE do sistema multi-agentes")
+    parser.add_argument("--porta", type=int, default=PORTA_PADRAO)
+    args = parser.parse_args()
+
+    servidor = ThreadingHTTPServer(("0.0.0.0", args.porta), ManipuladorSSE)
+    print(f"📡 Servidor SSE em http://localhost:{args.porta}/comunicado")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n👋 Servidor encerrado")
@@ -1,49 +1,98 @@
 
 # Importações necessárias
+import os
+import sys
 import json
-import time
+import asyncio
 from datetime import datetime
 
-estornos = {}
+# Motor de cálculo compartilhado com o A1 (pasta comum/ na raiz do repositório)
+# Mesma regra da política: imposto de 15% e aprovação do Financeiro se o líquido passar de R$ 1.000
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "comum"))
+from motor_reembolso import calcular, formatar_reais
+
+# Banco de dados dos estornos (SQLite em modo WAL, com índices)
+from repositorio_estornos import RepositorioEstornos
+
+# IDs ordenáveis pelo tempo e sem colisão (mesmo criando milhares por segundo)
+from gerador_ids import GeradorIds
+
+# Processamento em segundo plano (retry com backoff exponencial + jitter)
+from fila_processamento import FilaProcessamento
+
+repositorio = RepositorioEstornos(os.getenv("ESTORNOS_DB", "estornos.db"))
+
+# Quantos estornos mostrar nas listagens (o banco pode ter milhões)
+LIMITE_LISTAGEM = 100
+
+
+async def integracao_bancaria(estorno, tentativa):
+    # Simula o envio do dinheiro para o banco
+    # Na primeira tentativa, simula um erro de rede; na segunda, funciona
+    await asyncio.sleep(1)  # Simula tempo de processamento (sem travar os outros estornos)
+    if tentativa == 1:
+        raise ConnectionError("Erro de conexão")
+
+
+fila = FilaProcessamento(
+    repositorio,
+    integracao_bancaria,
+    workers=int(os.getenv("ESTORNO_WORKERS", "100")),
+    max_tentativas=int(os.getenv("ESTORNO_MAX_TENTATIVAS", "2")),
+    espera_base=float(os.getenv("ESTORNO_ESPERA_BASE", "1")),
+)
+
+
+def formatar_data(data_iso):
+    # No banco a data fica em ISO (ordenável pelo índice); na tela, no formato brasileiro
+    return datetime.strptime(data_iso, "%Y-%m-%d %H:%M:%S").strftime("%d/%m/%Y %H:%M")
+
+gerador_ids = GeradorIds(prefixo="EST_")
 
 def gerar_id_estorno():
     # Gera um ID único para cada estorno
-    # Usa a data/hora atual para criar um ID único
-    agora = datetime.now()
-    return f"EST_{agora.strftime('%Y%m%d_%H%M%S')}"
+    # Começa pelo instante em milissegundos + sequência do processo:
+    # dois estornos no mesmo segundo não se sobrescrevem mais
+    return gerador_ids.gerar()
 
 def criar_estorno(valor, cliente_id, motivo=""):
     
     # Gera um ID único para este estorno
     estorno_id = gerar_id_estorno()
     
+    # Calcula imposto, valor líquido e se precisa de aprovação (centavos exatos)
+    calculo = calcular(valor)
+    
     # Cria o registro do estorno
     novo_estorno = {
         "id": estorno_id,
         "valor": float(valor),
+        "valor_liquido": calculo["liquido_centavos"] / 100,
+        "precisa_aprovacao": calculo["precisa_aprovacao"],
         "cliente": cliente_id,
         "motivo": motivo,
         "status": "pendente",  # pendente, aprovado, processando, concluido, erro
-        "data_criacao": datetime.now().strftime("%d/%m/%Y %H:%M"),
+        "data_criacao": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "aprovador": "",
         "erro": ""
     }
     
     # Salva no banco de dados
-    estornos[estorno_id] = novo_estorno
+    repositorio.inserir(novo_estorno)
     
     print(f"✅ Estorno criado: {estorno_id}")
-    print(f"   Valor: R$ {valor:.2f}")
+    print(f"   Valor: R$ {valor:.2f} | Líquido: {formatar_reais(calculo['liquido_centavos'])}")
     print(f"   Cliente: {cliente_id}")
     
-    # Se o valor for pequeno (até R$ 1000), processa automaticamente
-    if valor <= 1000:
+    # Se o valor líquido for pequeno (até R$ 1000), processa automaticamente
+    if not calculo["precisa_aprovacao"]:
         print("   💰 Valor baixo - processando automaticamente...")
         processar_estorno(estorno_id)
     else:
         print("   ⚠️  Valor alto - precisa de aprovação!")
     
-    return novo_estorno
+    # Devolve o registro atualizado (o processamento pode ter mudado o status)
+    return repositorio.obter(estorno_id)
 
 
 def aprovar_estorno(estorno_id, aprovador):
@@ -52,35 +101,33 @@ def aprovar_estorno(estorno_id, aprovador):
     print("\n📋 ESTORNOS DISPONÍVEIS PARA APROVAÇÃO:")
     print("-" * 50)
     
-    estornos_pendentes = [e for e in estornos.values() if e["status"] == "pendente" and e["valor"] > 1000]
+    estornos_pendentes = repositorio.listar_pendentes_aprovacao(limite=LIMITE_LISTAGEM)
     
     if not estornos_pendentes:
         print("📭 Nenhum estorno pendente de aprovação encontrado")
-        print("   (Apenas estornos com valor > R$ 1000 precisam de aprovação)")
+        print("   (Apenas estornos com valor líquido > R$ 1000 precisam de aprovação)")
         return False
     
     for estorno in estornos_pendentes:
         print(f"⏳ {estorno['id']} - R$ {estorno['valor']:.2f} | Cliente: {estorno['cliente']}")
         if estorno["motivo"]:
             print(f"   📝 Motivo: {estorno['motivo']}")
-        print(f"   📅 Criado em: {estorno['data_criacao']}")
+        print(f"   📅 Criado em: {formatar_data(estorno['data_criacao'])}")
         print()
     
     # Verifica se o estorno existe
-    if estorno_id not in estornos:
+    estorno = repositorio.obter(estorno_id)
+    if estorno is None:
         print("❌ Estorno não encontrado!")
         return False
     
-    estorno = estornos[estorno_id]
-    
     # Verifica se realmente precisa de aprovação
-    if estorno["valor"] <= 1000:
+    if not estorno["precisa_aprovacao"]:
         print("ℹ️  Este estorno não precisa de aprovação (valor baixo)")
         return False
     
     # Aprova o estorno
-    estorno["status"] = "aprovado"
-    estorno["aprovador"] = aprovador
+    repositorio.atualizar(estorno_id, status="aprovado", aprovador=aprovador)
     
     print(f"✅ Estorno {estorno_id} aprovado por {aprovador}")
     print("   🚀 Iniciando processamento...")
@@ -92,15 +139,12 @@ def aprovar_estorno(estorno_id, aprovador):
 def rejeitar_estorno(estorno_id, aprovador):
     
     # Verifica se o estorno existe
-    if estorno_id not in estornos:
+    if repositorio.obter(estorno_id) is None:
         print("❌ Estorno não encontrado!")
         return False
     
-    estorno = estornos[estorno_id]
-    
     # Rejeita o estorno
-    estorno["status"] = "rejeitado"
-    estorno["aprovador"] = aprovador
+    repositorio.atualizar(estorno_id, status="rejeitado", aprovador=aprovador)
     
     print(f"❌ Estorno {estorno_id} rejeitado por {aprovador}")
     return True
@@ -109,72 +153,45 @@ def rejeitar_estorno(estorno_id, aprovador):
 def processar_estorno(estorno_id):
     
     # Verifica se o estorno existe
-    if estorno_id not in estornos:
+    estorno = repositorio.obter(estorno_id)
+    if estorno is None:
         print("❌ Estorno não encontrado!")
         return
     
-    estorno = estornos[estorno_id]
-    
     # Verifica se não foi rejeitado
     if estorno["status"] == "rejeitado":
         print("⚠️  Estorno foi rejeitado - não será processado")
         return
     
-    # Muda status para "processando"
-    estorno["status"] = "processando"
-    print(f"🔄 Processando estorno {estorno_id}...")
-    
-    # Simula o processamento (como se fosse enviar dinheiro para o banco)
-    # Vamos tentar 2 vezes para simular problemas de rede
-    for tentativa in range(1, 3):
-        print(f"   Tentativa {tentativa}...")
-        time.sleep(1)  # Simula tempo de processamento
-        
-        # Na primeira tentativa, simula um erro
-        # Na segunda tentativa, funciona
-        if tentativa == 1:
-            print("   ❌ Erro temporário (simulado)")
-            estorno["erro"] = "Erro de conexão"
-        else:
-            # Sucesso!
-            estorno["status"] = "concluido"
-            estorno["erro"] = ""
-            print(f"   ✅ Sucesso! Dinheiro enviado para o cliente")
-            print(f"   💰 R$ {estorno['valor']:.2f} estornado com sucesso!")
-            return
-    
-    # Se chegou aqui, todas as tentativas falharam
-    estorno["status"] = "erro"
-    print(f"   ❌ Falha definitiva - estorno não pôde ser processado")
+    # Muda status para "processando" e coloca na fila - retorna na hora.
+    # As tentativas (com backoff exponencial + jitter) rodam em segundo plano
+    # e o status vai para "concluido" ou "erro" quando terminarem.
+    repositorio.atualizar(estorno_id, status="processando")
+    fila.enfileirar(estorno_id)
+    print(f"🔄 Estorno {estorno_id} enviado para processamento")
 
 
 def reprocessar_estorno(estorno_id):
     
-    if estorno_id not in estornos:
+    estorno = repositorio.obter(estorno_id)
+    if estorno is None:
         print("❌ Estorno não encontrado!")
         return False
     
-    estorno = estornos[estorno_id]
-    
     if estorno["status"] != "erro":
         print("ℹ️  Este estorno não está com erro - não precisa reprocessar")
         return False
     
     print(f"🔄 Tentando reprocessar estorno {estorno_id}...")
-    estorno["erro"] = ""  # Limpa o erro anterior
+    repositorio.atualizar(estorno_id, erro="")  # Limpa o erro anterior
     processar_estorno(estorno_id)
     return True
 
-def listar_estornos(filtro=None):
-    
-    # Pega todos os estornos
-    todos_estornos = list(estornos.values())
+def listar_estornos(filtro=None, limite=LIMITE_LISTAGEM):
     
-    # Se foi pedido um filtro, aplica ele
-    if filtro:
-        estornos_filtrados = [e for e in todos_estornos if e["status"] == filtro]
-    else:
-        estornos_filtrados = todos_estornos
+    # Consulta pelo índice de status (mais recentes primeiro)
+    total = repositorio.contar(filtro)
+    estornos_filtrados = repositorio.listar(status=filtro, limite=limite)
     
     # Verifica se tem estornos para mostrar
     if not estornos_filtrados:
@@ -182,7 +199,9 @@ def listar_estornos(filtro=None):
         return
     
     # Mostra os estornos
-    print(f"\n📋 ESTORNOS ({len(estornos_filtrados)}):")
+    print(f"\n📋 ESTORNOS ({total}):")
+    if total > len(estornos_filtrados):
+        print(f"   (mostrando os {len(estornos_filtrados)} mais recentes)")
     print("-" * 60)
     
     for estorno in estornos_filtrados:
@@ -198,7 +217,7 @@ def listar_estornos(filtro=None):
         
         print(f"{emoji_status} {estorno['id']}")
         print(f"   💰 R$ {estorno['valor']:.2f} | 👤 {estorno['cliente']}")
-        print(f"   📅 {estorno['data_criacao']} | Status: {estorno['status']}")
+        print(f"   📅 {formatar_data(estorno['data_criacao'])} | Status: {estorno['status']}")
         
         if estorno["motivo"]:
             print(f"   📝 Motivo: {estorno['motivo']}")
@@ -210,21 +229,20 @@ def listar_estornos(filtro=None):
 
 def estatisticas():
     
-    total_estornos = len(estornos)
+    # Conta estornos por status (GROUP BY no próprio banco)
+    contador_status = {}
+    valor_total = 0.0
+    
+    for status, quantidade, valor in repositorio.contar_por_status():
+        contador_status[status] = quantidade
+        valor_total += valor
+    
+    total_estornos = sum(contador_status.values())
     
     if total_estornos == 0:
         print("📊 Nenhum estorno registrado ainda")
         return
     
-    # Conta estornos por status
-    contador_status = {}
-    valor_total = 0.0
-    
-    for estorno in estornos.values():
-        status = estorno["status"]
-        contador_status[status] = contador_status.get(status, 0) + 1
-        valor_total += estorno["valor"]
-    
     # Mostra as estatísticas
     print("\n📊 ESTATÍSTICAS:")
     print("-" * 30)
@@ -245,18 +263,24 @@ def estatisticas():
 
 def salvar_estornos():
     """
-    Salva todos os estornos em um arquivo JSON
+    Exporta todos os estornos em um arquivo JSON (os dados já ficam salvos no banco;
+    isto é só uma cópia para auditoria). Escreve em lotes, sem carregar tudo na memória.
     """
-    if not estornos:
+    if repositorio.contar() == 0:
         print("📭 Nenhum estorno para salvar")
         return
     
     # Cria nome do arquivo com data/hora
     nome_arquivo = f"estornos_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     
-    # Salva no arquivo
+    # Salva no arquivo, um estorno por vez
     with open(nome_arquivo, "w", encoding="utf-8") as arquivo:
-        json.dump(list(estornos.values()), arquivo, indent=2, ensure_ascii=False)
+        arquivo.write("[\n")
+        for i, estorno in enumerate(repositorio.iterar_todos()):
+            if i > 0:
+                arquivo.write(",\n")
+            arquivo.write(json.dumps(estorno, indent=2, ensure_ascii=False))
+        arquivo.write("\n]\n")
     
     print(f"💾 Estornos salvos em: {nome_arquivo}")
 
@@ -273,12 +297,13 @@ def demo():
     criar_estorno(500.0, "CLIENTE001", "Produto defeituoso")
     
     print("\n2️⃣ Criando estorno de valor alto (precisa aprovação):")
-    criar_estorno(1500.0, "CLIENTE002", "Cancelamento de pedido")
+    estorno_alto = criar_estorno(1500.0, "CLIENTE002", "Cancelamento de pedido")
     
     print("\n3️⃣ Aprovando o estorno de valor alto:")
-    # Pega o último estorno criado (que precisa de aprovação)
-    ultimo_estorno = list(estornos.keys())[-1]
-    aprovar_estorno(ultimo_estorno, "GERENTE_SILVA")
+    aprovar_estorno(estorno_alto["id"], "GERENTE_SILVA")
+    
+    print("\n⏳ Aguardando o processamento em segundo plano...")
+    fila.aguardar()
     
     print("\n4️⃣ Listando todos os estornos:")
     listar_estornos()
@@ -293,10 +318,14 @@ def menu():
     print("🏛️  SISTEMA DE ESTORNO - 2025 - v1.0")
     print("=" * 50)
     print("Este sistema gerencia estornos de dinheiro para clientes")
-    print("Valores até R$ 1000 são processados automaticamente")
-    print("Valores acima de R$ 1000 precisam de aprovação")
+    print("Valores líquidos (após imposto de 15%) até R$ 1000 são processados automaticamente")
+    print("Valores líquidos acima de R$ 1000 precisam de aprovação")
     print("=" * 50)
     
+    # Estornos que ficaram "processando" quando o programa fechou voltam para a fila
+    for estorno in repositorio.listar(status="processando"):
+        fila.enfileirar(estorno["id"])
+    
     while True:
         print("\n📋 MENU PRINCIPAL:")
         print("1. 💰 Criar Novo Estorno")
@@ -359,6 +388,9 @@ def menu():
                 demo()
                 
             elif opcao == "9":
+                # Espera os estornos que ainda estão na fila terminarem
+                print("\n⏳ Finalizando estornos em processamento...")
+                fila.aguardar()
                 print("\n👋 Obrigado por usar o Sistema de Estorno!")
                 print("   Até logo! 🚪")
                 break
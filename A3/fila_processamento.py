@@ -0,0 +1,125 @@
+import asyncio
+import random
+import threading
+
+
+# Fila de processamento de estornos
+#
+# Antes, cada estorno era processado na hora com time.sleep entre as tentativas,
+# travando quem chamou por vários segundos e processando um estorno de cada vez.
+# Agora criar/aprovar só enfileiram: um event loop numa thread separada roda
+# vários workers, e as novas tentativas esperam com backoff exponencial + jitter
+# (igual ao nó "exponencial backoff + jitter" do fluxo n8n) sem bloquear ninguém.
+
+
+def calcular_espera(tentativa: int, espera_base: float, espera_maxima: float, jitter: float) -> float:
+    """
+    Backoff exponencial + jitter: base * 2^(tentativa-1) + aleatório(0, jitter), com teto.
+    """
+    return min(espera_maxima, espera_base * (2 ** (tentativa - 1))) + random.uniform(0, jitter)
+
+
+class FilaProcessamento:
+    """
+    Processa estornos em segundo plano.
+
+    `integracao` é uma função assíncrona (estorno, tentativa) que envia o dinheiro
+    ao banco e levanta uma exceção quando a tentativa falha.
+    """
+
+    def __init__(self, repositorio, integracao, workers: int = 100, max_tentativas: int = 2,
+                 espera_base: float = 1.0, espera_maxima: float = 60.0, jitter: float = 1.0):
+        self.repositorio = repositorio
+        self.integracao = integracao
+        self.workers = workers
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.jitter = jitter
+
+        self._loop = None
+        self._fila = None
+        self._thread = None
+        self._pronto = threading.Event()
+        self._lock = threading.Lock()
+
+    # Ciclo de vida
+
+    def iniciar(self):
+        """
+        Sobe o event loop numa thread própria (só na primeira vez).
+        """
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._rodar_loop, name="fila-estornos", daemon=True)
+            self._thread.start()
+        self._pronto.wait()
+
+    def _rodar_loop(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._fila = asyncio.Queue()
+        for _ in range(self.workers):
+            self._loop.create_task(self._worker())
+        self._pronto.set()
+        self._loop.run_forever()
+
+    def enfileirar(self, estorno_id: str):
+        """
+        Coloca o estorno na fila e retorna na hora (pode ser chamado de qualquer thread).
+        """
+        self.iniciar()
+        self._loop.call_soon_threadsafe(self._fila.put_nowait, estorno_id)
+
+    def pendentes(self) -> int:
+        return self._fila.qsize() if self._fila is not None else 0
+
+    def aguardar(self, timeout: float = None):
+        """
+        Bloqueia até a fila esvaziar (usado na demonstração e ao sair do programa).
+        """
+        if self._thread is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._fila.join(), self._loop).result(timeout)
+
+    # Processamento
+
+    async def _worker(self):
+        while True:
+            estorno_id = await self._fila.get()
+            try:
+                await self._processar(estorno_id)
+            except Exception as e:
+                self.repositorio.atualizar(estorno_id, status="erro", erro=f"Erro inesperado: {e}")
+                print(f"\n   🚨 {estorno_id}: erro inesperado no processamento ({e})")
+            finally:
+                self._fila.task_done()
+
+    async def _processar(self, estorno_id: str):
+        estorno = self.repositorio.obter(estorno_id)
+        if estorno is None or estorno["status"] == "rejeitado":
+            return
+
+        self.repositorio.atualizar(estorno_id, status="processando")
+
+        for tentativa in range(1, self.max_tentativas + 1):
+            try:
+                await self.integracao(estorno, tentativa)
+            except Exception as e:
+                self.repositorio.atualizar(estorno_id, erro=str(e))
+
+                if tentativa < self.max_tentativas:
+                    espera = calcular_espera(tentativa, self.espera_base, self.espera_maxima, self.jitter)
+                    print(f"\n   ⏳ {estorno_id}: tentativa {tentativa} falhou ({e}) - nova tentativa em {espera:.1f}s")
+                    await asyncio.sleep(espera)
+                continue
+
+            # Sucesso!
+            self.repositorio.atualizar(estorno_id, status="concluido", erro="")
+            print(f"\n   ✅ {estorno_id}: R$ {estorno['valor']:.2f} estornado com sucesso!")
+            return
+
+        # Se chegou aqui, todas as tentativas falharam
+        self.repositorio.atualizar(estorno_id, status="erro")
+        print(f"\n   ❌ {estorno_id}: falha definitiva após {self.max_tentativas} tentativas")
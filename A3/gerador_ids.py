@@ -0,0 +1,69 @@
+import os
+import time
+import random
+import threading
+from datetime import datetime
+
+
+# Gerador de IDs ordenáveis (estilo ULID)
+#
+# 128 bits codificados em 26 caracteres Base32 (Crockford):
+#   - 48 bits: milissegundos desde 1970 -> IDs ordenados pelo tempo
+#   - 16 bits: identificador do processo -> processos diferentes não colidem
+#   - 64 bits: sequência do processo    -> vários IDs no mesmo milissegundo não colidem
+#
+# Como o tempo vem primeiro, a ordem alfabética dos IDs é a ordem de criação,
+# o que permite buscas por intervalo de datas direto pela chave primária.
+
+ALFABETO = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+
+def _codificar(numero: int, tamanho: int) -> str:
+    caracteres = []
+    for _ in range(tamanho):
+        numero, resto = divmod(numero, 32)
+        caracteres.append(ALFABETO[resto])
+    return "".join(reversed(caracteres))
+
+
+def _decodificar(texto: str) -> int:
+    numero = 0
+    for caractere in texto:
+        numero = numero * 32 + ALFABETO.index(caractere)
+    return numero
+
+
+class GeradorIds:
+    """
+    Gera IDs únicos e monotônicos (seguro para várias threads).
+    """
+
+    def __init__(self, prefixo: str = ""):
+        self.prefixo = prefixo
+        self._lock = threading.Lock()
+        self._ultimo_ms = 0
+        self._sequencia = random.getrandbits(32)
+        # PID + aleatório: dois processos (ou o mesmo PID reiniciado) dificilmente repetem
+        self._processo = (os.getpid() ^ random.getrandbits(16)) & 0xFFFF
+
+    def gerar(self) -> str:
+        with self._lock:
+            # Se o relógio voltar (ajuste de NTP), segura o último instante para manter a ordem
+            agora_ms = max(time.time_ns() // 1_000_000, self._ultimo_ms)
+            self._ultimo_ms = agora_ms
+            self._sequencia = (self._sequencia + 1) & 0xFFFFFFFFFFFFFFFF
+            sequencia = self._sequencia
+
+        numero = (agora_ms << 80) | (self._processo << 64) | sequencia
+        return self.prefixo + _codificar(numero, 26)
+
+    def id_minimo(self, data: datetime) -> str:
+        """
+        Menor ID possível para um instante - útil como limite em buscas por intervalo.
+        Ex.: WHERE id >= id_minimo(inicio) AND id < id_minimo(fim)
+        """
+        return self.prefixo + _codificar(int(data.timestamp() * 1000) << 80, 26)
+
+    def data_do_id(self, identificador: str) -> datetime:
+        numero = _decodificar(identificador[len(self.prefixo):])
+        return datetime.fromtimestamp((numero >> 80) / 1000)
@@ -0,0 +1,158 @@
+import sqlite3
+import threading
+
+
+# Repositório de estornos em SQLite
+# Substitui o dicionário em memória: os dados sobrevivem ao fechamento do programa
+# e as consultas usam índices (status, cliente, data_criacao) em vez de varrer tudo.
+#
+# Modo WAL: leituras não bloqueiam a escrita (útil quando o processamento roda em paralelo).
+
+CAMPOS = (
+    "id",
+    "valor",
+    "valor_liquido",
+    "precisa_aprovacao",
+    "cliente",
+    "motivo",
+    "status",
+    "data_criacao",
+    "aprovador",
+    "erro",
+)
+
+
+class RepositorioEstornos:
+    """
+    Interface pequena para guardar e consultar estornos.
+    Os estornos entram e saem como dicts (mesmo formato usado no estorno.py).
+    """
+
+    def __init__(self, caminho: str = "estornos.db"):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+        # isolation_level=None -> autocommit (cada comando já é gravado)
+        self.conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self.conexao.row_factory = sqlite3.Row
+
+        self.conexao.execute("PRAGMA journal_mode=WAL")
+        self.conexao.execute("PRAGMA synchronous=NORMAL")
+        self._criar_tabela()
+
+    def _criar_tabela(self):
+        self.conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS estornos (
+                id                TEXT PRIMARY KEY,
+                valor             REAL NOT NULL,
+                valor_liquido     REAL NOT NULL,
+                precisa_aprovacao INTEGER NOT NULL,
+                cliente           TEXT NOT NULL,
+                motivo            TEXT NOT NULL DEFAULT '',
+                status            TEXT NOT NULL,
+                data_criacao      TEXT NOT NULL,
+                aprovador         TEXT NOT NULL DEFAULT '',
+                erro              TEXT NOT NULL DEFAULT ''
+            );
+            CREATE INDEX IF NOT EXISTS idx_estornos_status ON estornos (status, data_criacao);
+            CREATE INDEX IF NOT EXISTS idx_estornos_cliente ON estornos (cliente, data_criacao);
+            CREATE INDEX IF NOT EXISTS idx_estornos_data_criacao ON estornos (data_criacao);
+        """)
+
+    def _para_dict(self, linha):
+        if linha is None:
+            return None
+        estorno = dict(linha)
+        estorno["precisa_aprovacao"] = bool(estorno["precisa_aprovacao"])
+        return estorno
+
+    def _executar(self, sql: str, parametros=()):
+        with self._lock:
+            return self.conexao.execute(sql, parametros).fetchall()
+
+    # Escrita
+
+    def inserir(self, estorno: dict):
+        valores = [estorno.get(campo, "") for campo in CAMPOS]
+        marcadores = ", ".join("?" for _ in CAMPOS)
+        self._executar(f"INSERT INTO estornos ({', '.join(CAMPOS)}) VALUES ({marcadores})", valores)
+
+    def atualizar(self, estorno_id: str, **campos):
+        """
+        Atualiza só os campos informados. Ex.: atualizar(id, status="concluido", erro="")
+        """
+        invalidos = set(campos) - set(CAMPOS)
+        if invalidos:
+            raise ValueError(f"Campos inválidos: {', '.join(sorted(invalidos))}")
+
+        atribuicoes = ", ".join(f"{campo} = ?" for campo in campos)
+        self._executar(f"UPDATE estornos SET {atribuicoes} WHERE id = ?", [*campos.values(), estorno_id])
+
+    # Leitura
+
+    def obter(self, estorno_id: str):
+        linhas = self._executar("SELECT * FROM estornos WHERE id = ?", (estorno_id,))
+        return self._para_dict(linhas[0]) if linhas else None
+
+    def listar(self, status: str = None, cliente: str = None, limite: int = None):
+        """
+        Lista estornos (mais recentes primeiro), filtrando por status e/ou cliente via índice.
+        """
+        condicoes, parametros = [], []
+        if status:
+            condicoes.append("status = ?")
+            parametros.append(status)
+        if cliente:
+            condicoes.append("cliente = ?")
+            parametros.append(cliente)
+
+        sql = "SELECT * FROM estornos"
+        if condicoes:
+            sql += " WHERE " + " AND ".join(condicoes)
+        sql += " ORDER BY data_criacao DESC"
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(limite)
+
+        return [self._para_dict(linha) for linha in self._executar(sql, parametros)]
+
+    def listar_pendentes_aprovacao(self, limite: int = None):
+        sql = "SELECT * FROM estornos WHERE status = 'pendente' AND precisa_aprovacao = 1 ORDER BY data_criacao DESC"
+        parametros = []
+        if limite:
+            sql += " LIMIT ?"
+            parametros.append(limite)
+        return [self._para_dict(linha) for linha in self._executar(sql, parametros)]
+
+    def contar(self, status: str = None) -> int:
+        if status:
+            return self._executar("SELECT COUNT(*) FROM estornos WHERE status = ?", (status,))[0][0]
+        return self._executar("SELECT COUNT(*) FROM estornos")[0][0]
+
+    def contar_por_status(self):
+        """
+        Retorna [(status, quantidade, valor_total), ...] agregados pelo próprio SQLite.
+        """
+        linhas = self._executar(
+            "SELECT status, COUNT(*), COALESCE(SUM(valor), 0) FROM estornos GROUP BY status"
+        )
+        return [tuple(linha) for linha in linhas]
+
+    def iterar_todos(self, tamanho_lote: int = 1000):
+        """
+        Percorre todos os estornos em lotes (paginação por id), sem carregar tudo na memória.
+        """
+        ultimo_id = ""
+        while True:
+            linhas = self._executar(
+                "SELECT * FROM estornos WHERE id > ? ORDER BY id LIMIT ?", (ultimo_id, tamanho_lote)
+            )
+            if not linhas:
+                return
+            for linha in linhas:
+                yield self._para_dict(linha)
+            ultimo_id = linhas[-1]["id"]
+
+    def fechar(self):
+        with self._lock:
+            self.conexao.close()
@@ -0,0 +1,261 @@
+import os
+import re
+import time
+import asyncio
+import threading
+import importlib.util
+
+import httpx
+from openai import AzureOpenAI as ClienteAzure, AsyncAzureOpenAI as ClienteAzureAsync
+
+
+# Registro de clientes de modelo compartilhado (A1 - agente, A2 - multiagentes)
+#
+# Antes cada módulo criava o seu AzureOpenAI / AzureOpenAIEmbedder, e cada um
+# abria as suas próprias conexões (um handshake TLS por cliente) e fazia retry
+# sozinho - um cliente estourava o limite do deployment e os outros levavam 429.
+#
+# Agora todos usam os mesmos clientes OpenAI por endpoint:
+#   - Pool de conexões httpx com keep-alive (e HTTP/2 se o pacote "h2" estiver instalado)
+#   - Cliente sync único para o processo; cliente async um por event loop (as conexões
+#     de um httpx.AsyncClient só funcionam no loop em que foram abertas, e o A2 roda um
+#     asyncio.run por requisição/lote). Use executar_async() no lugar do asyncio.run:
+#     ele fecha (aclose) os clientes do loop antes de o loop terminar
+#   - Um balde de tokens (token bucket) por deployment: as chamadas esperam a vez
+#     em vez de disparar juntas e voltar com 429
+#   - Retries configuráveis (o SDK da OpenAI respeita o Retry-After do Azure)
+#
+# Configuração (.env):
+#   AZURE_OPENAI_RPM            requisições por minuto por deployment (padrão 120)
+#   AZURE_OPENAI_RPM_<NOME>     limite de um deployment específico (ex.: AZURE_OPENAI_RPM_GPT_4O=300)
+#   AZURE_OPENAI_MAX_TENTATIVAS retries do SDK para 429/5xx/timeout (padrão 3)
+#   AZURE_OPENAI_MAX_CONEXOES   tamanho do pool de conexões (padrão 20)
+#   AZURE_OPENAI_TIMEOUT        timeout de cada requisição em segundos (padrão 60)
+
+RPM_PADRAO = float(os.getenv("AZURE_OPENAI_RPM", "120"))
+MAX_TENTATIVAS = int(os.getenv("AZURE_OPENAI_MAX_TENTATIVAS", "3"))
+MAX_CONEXOES = int(os.getenv("AZURE_OPENAI_MAX_CONEXOES", "20"))
+TIMEOUT_SEGUNDOS = float(os.getenv("AZURE_OPENAI_TIMEOUT", "60"))
+
+# HTTP/2 só se o pacote opcional estiver instalado (pip install httpx[http2])
+HTTP2_DISPONIVEL = importlib.util.find_spec("h2") is not None
+
+# URLs do Azure: /openai/deployments/<deployment>/chat/completions
+PADRAO_DEPLOYMENT = re.compile(r"/deployments/([^/]+)/")
+
+
+class BaldeTokens:
+    """
+    Token bucket: enche `taxa` fichas por segundo até `capacidade`; cada requisição gasta uma.
+    Quem chega com o balde vazio reserva a ficha e espera o tempo que falta.
+    """
+
+    def __init__(self, por_minuto: float, capacidade: float = None):
+        self.taxa = por_minuto / 60.0
+        self.capacidade = capacidade or max(1.0, por_minuto / 6)  # rajada de até 10s de cota
+        self.fichas = self.capacidade
+        self.ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reservar(self) -> float:
+        """
+        Gasta uma ficha e retorna quantos segundos esperar antes de usar.
+        """
+        with self._lock:
+            agora = time.monotonic()
+            self.fichas = min(self.capacidade, self.fichas + (agora - self.ultimo) * self.taxa)
+            self.ultimo = agora
+            self.fichas -= 1
+            return 0.0 if self.fichas >= 0 else -self.fichas / self.taxa
+
+
+def _limite_deployment(deployment: str) -> float:
+    nome = re.sub(r"[^A-Za-z0-9]", "_", deployment).upper()
+    return float(os.getenv(f"AZURE_OPENAI_RPM_{nome}", RPM_PADRAO))
+
+
+class ClienteAsyncPorLoop:
+    """
+    Fica no lugar do AsyncAzureOpenAI no Agno: a cada uso, repassa para o cliente
+    async do event loop que está rodando (criado na primeira vez nesse loop).
+    """
+
+    def __init__(self, registro, chave, api_key: str):
+        self._registro = registro
+        self._chave = chave
+        self._api_key = api_key
+
+    def __getattr__(self, nome):
+        return getattr(self._registro.cliente_async(self._chave, self._api_key), nome)
+
+
+class RegistroClientes:
+    """
+    Guarda os clientes e os baldes criados no processo (um por endpoint / deployment).
+    """
+
+    def __init__(self):
+        self._clientes = {}
+        self._clientes_async = {}  # event loop (ou None, fora de um loop) -> {(endpoint, api_version): cliente}
+        self._baldes = {}
+        self._lock = threading.Lock()
+
+    # Limite por deployment
+
+    def balde(self, deployment: str) -> BaldeTokens:
+        with self._lock:
+            if deployment not in self._baldes:
+                self._baldes[deployment] = BaldeTokens(_limite_deployment(deployment))
+            return self._baldes[deployment]
+
+    def _espera(self, request) -> float:
+        encontrado = PADRAO_DEPLOYMENT.search(request.url.path)
+        if not encontrado:
+            return 0.0
+        return self.balde(encontrado.group(1)).reservar()
+
+    def _antes_da_requisicao(self, request):
+        espera = self._espera(request)
+        if espera:
+            time.sleep(espera)
+
+    async def _antes_da_requisicao_async(self, request):
+        espera = self._espera(request)
+        if espera:
+            await asyncio.sleep(espera)
+
+    # Clientes
+
+    def clientes(self, endpoint: str = None, api_key: str = None, api_version: str = None):
+        """
+        Retorna (cliente_sync, cliente_async) do SDK OpenAI para o endpoint, criando na primeira vez.
+        O cliente_async é um ClienteAsyncPorLoop: pode ser guardado e usado em qualquer event loop.
+        """
+        endpoint = endpoint or os.getenv("AZURE_OPENAI_ENDPOINT")
+        api_key = api_key or os.getenv("AZURE_OPENAI_API_KEY")
+        api_version = api_version or os.getenv("AZURE_OPENAI_API_VERSION")
+        chave = (endpoint, api_version)
+
+        with self._lock:
+            if chave in self._clientes:
+                return self._clientes[chave]
+
+            # retries=1 no transporte: só para falha de conexão (o resto é com o SDK)
+            http_sync = httpx.Client(
+                transport=httpx.HTTPTransport(http2=HTTP2_DISPONIVEL, limits=_limites(), retries=1),
+                timeout=_timeout(),
+                event_hooks={"request": [self._antes_da_requisicao]},
+            )
+            par = (
+                ClienteAzure(http_client=http_sync, **_parametros(chave, api_key)),
+                ClienteAsyncPorLoop(self, chave, api_key),
+            )
+            self._clientes[chave] = par
+            return par
+
+    def cliente_async(self, chave, api_key: str):
+        """
+        Cliente async do endpoint para o event loop atual, criando na primeira vez nesse loop.
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        with self._lock:
+            # Loops que terminaram sem executar_async (asyncio.run direto) levam os clientes junto
+            for antigo in [l for l in self._clientes_async if l is not None and l.is_closed()]:
+                del self._clientes_async[antigo]
+
+            do_loop = self._clientes_async.setdefault(loop, {})
+            if chave not in do_loop:
+                http_async = httpx.AsyncClient(
+                    transport=httpx.AsyncHTTPTransport(http2=HTTP2_DISPONIVEL, limits=_limites(), retries=1),
+                    timeout=_timeout(),
+                    event_hooks={"request": [self._antes_da_requisicao_async]},
+                )
+                do_loop[chave] = ClienteAzureAsync(http_client=http_async, **_parametros(chave, api_key))
+            return do_loop[chave]
+
+    async def fechar_clientes_async(self):
+        """
+        Fecha os clientes async do event loop atual (e o pool de conexões de cada um).
+        Chamar no fim do loop - depois que ele fecha, o aclose() não roda mais.
+        """
+        with self._lock:
+            do_loop = self._clientes_async.pop(asyncio.get_running_loop(), {})
+        for cliente in do_loop.values():
+            try:
+                await cliente.close()
+            except Exception as e:
+                print(f"⚠️  Erro ao fechar cliente async: {e}")
+
+
+def _limites():
+    return httpx.Limits(
+        max_connections=MAX_CONEXOES,
+        max_keepalive_connections=MAX_CONEXOES,
+        keepalive_expiry=60,
+    )
+
+
+def _timeout():
+    return httpx.Timeout(TIMEOUT_SEGUNDOS, connect=10.0)
+
+
+def _parametros(chave, api_key: str) -> dict:
+    endpoint, api_version = chave
+    return dict(azure_endpoint=endpoint, api_key=api_key, api_version=api_version, max_retries=MAX_TENTATIVAS)
+
+
+registro = RegistroClientes()
+
+
+def executar_async(corrotina):
+    """
+    asyncio.run que fecha os clientes async abertos no loop antes de ele terminar.
+    Sem isso, cada asyncio.run (uma requisição SSE, um lote...) deixava para trás
+    um httpx.AsyncClient com as conexões abertas.
+    """
+    async def com_fechamento():
+        try:
+            return await corrotina
+        finally:
+            await registro.fechar_clientes_async()
+
+    return asyncio.run(com_fechamento())
+
+
+def criar_modelo_chat(deployment: str = None, api_version: str = None, **opcoes):
+    """
+    Modelo de chat do Agno usando os clientes compartilhados.
+    `opcoes` vai direto para o AzureOpenAI do Agno (ex.: temperature=0.0).
+    """
+    from agno.models.azure.openai_chat import AzureOpenAI
+
+    deployment = deployment or os.getenv("AZURE_OPENAI_DEPLOYMENT")
+    cliente, cliente_async = registro.clientes(api_version=api_version)
+    # Sem deployment fixo no cliente, o SDK monta a URL com o id do modelo
+    return AzureOpenAI(
+        id=deployment,
+        azure_deployment=deployment,
+        client=cliente,
+        async_client=cliente_async,
+        **opcoes,
+    )
+
+
+def criar_embedder(deployment: str, api_version: str = None, **opcoes):
+    """
+    Embedder do Agno usando o cliente compartilhado (mesmo pool e mesmo limite por deployment).
+    """
+    from agno.knowledge.embedder.azure_openai import AzureOpenAIEmbedder
+
+    cliente, cliente_async = registro.clientes(api_version=api_version)
+    return AzureOpenAIEmbedder(
+        id=deployment,
+        azure_deployment=deployment,
+        openai_client=cliente,
+        async_client=cliente_async,
+        **opcoes,
+    )
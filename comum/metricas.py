@@ -0,0 +1,219 @@
+import os
+import time
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Métricas de latência e tokens (A1 - agente, A2 - multiagentes)
+#
+# Cada chamada medida vira um registro (etapa, usuário, duração, tokens de entrada/saída).
+# Etapas usadas:
+#   A1: "agente" (chamada ao modelo), "rag" (busca na Knowledge), "rerank", "memoria",
+#       "ferramenta:<nome>", "cache", "calculo_direto", "fato_politica"
+#   A2: "Redator", "Crítico", "Editor" (e "<agente> (cache)" quando veio do cache)
+#
+# Os números são agregados por (etapa, usuário) e podem ser vistos:
+#   - no terminal (comando "stats" do A1 / fim da execução do A2)
+#   - em formato Prometheus em http://localhost:<METRICAS_PORTA>/metrics
+
+PORTA_METRICAS = int(os.getenv("METRICAS_PORTA", "0"))  # 0 = servidor desligado
+AMOSTRAS_LATENCIA = 1000  # últimas N durações por (etapa, usuário), para o p95
+
+# Usuário da requisição em andamento - as etapas internas (RAG, memória) não recebem o user_id
+usuario_atual = ContextVar("usuario_atual", default="-")
+
+
+def _numero(objeto, campo):
+    # Campos de métricas do Agno podem não existir (ou vir None) dependendo da versão/modelo
+    return getattr(objeto, campo, None) or 0
+
+
+def _escapar(valor) -> str:
+    # Valores de rótulo no Prometheus: barra invertida, aspas e quebra de linha escapadas
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+class ColetorMetricas:
+    """
+    Acumula contadores por (etapa, usuário). Seguro para várias threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados = defaultdict(lambda: {"chamadas": 0, "erros": 0, "segundos": 0.0,
+                                           "tokens_entrada": 0, "tokens_saida": 0})
+        self._latencias = defaultdict(lambda: deque(maxlen=AMOSTRAS_LATENCIA))
+
+    def registrar(self, etapa: str, duracao: float, user_id: str = None,
+                  tokens_entrada: int = 0, tokens_saida: int = 0, erro: bool = False):
+        user_id = user_id or usuario_atual.get()
+        with self._lock:
+            dados = self._dados[(etapa, user_id)]
+            dados["chamadas"] += 1
+            dados["erros"] += int(erro)
+            dados["segundos"] += duracao
+            dados["tokens_entrada"] += tokens_entrada
+            dados["tokens_saida"] += tokens_saida
+            self._latencias[(etapa, user_id)].append(duracao)
+
+    @contextmanager
+    def medir(self, etapa: str, user_id: str = None):
+        """
+        with metricas.medir("rag"): ...  -> registra a duração (e se deu erro)
+        """
+        inicio = time.perf_counter()
+        erro = False
+        try:
+            yield
+        except BaseException:
+            erro = True
+            raise
+        finally:
+            self.registrar(etapa, time.perf_counter() - inicio, user_id, erro=erro)
+
+    def registrar_execucao(self, etapa: str, metricas_execucao, duracao: float = None,
+                           user_id: str = None, erro: bool = False):
+        """
+        Registra uma execução de agente a partir das métricas do Agno (RunOutput.metrics
+        ou o evento RunCompleted): tokens de entrada/saída e duração.
+        """
+        if duracao is None:
+            duracao = _numero(metricas_execucao, "duration")
+        self.registrar(
+            etapa,
+            duracao,
+            user_id,
+            tokens_entrada=_numero(metricas_execucao, "input_tokens"),
+            tokens_saida=_numero(metricas_execucao, "output_tokens"),
+            erro=erro,
+        )
+
+    def registrar_ferramenta(self, execucao_ferramenta, user_id: str = None):
+        # ToolExecution do Agno: nome + métricas com a duração da chamada
+        duracao = _numero(getattr(execucao_ferramenta, "metrics", None), "duration")
+        erro = bool(getattr(execucao_ferramenta, "tool_call_error", False))
+        self.registrar(f"ferramenta:{execucao_ferramenta.tool_name}", duracao, user_id, erro=erro)
+
+    # Consulta
+
+    def resumo(self, user_id: str = None):
+        """
+        Agregado por etapa (de todos os usuários ou só de `user_id`).
+        """
+        with self._lock:
+            itens = [(chave, dict(dados)) for chave, dados in self._dados.items()]
+            latencias = {chave: list(valores) for chave, valores in self._latencias.items()}
+
+        por_etapa = {}
+        amostras = defaultdict(list)
+        for (etapa, usuario), dados in itens:
+            if user_id is not None and usuario != user_id:
+                continue
+            total = por_etapa.setdefault(etapa, {"chamadas": 0, "erros": 0, "segundos": 0.0,
+                                                 "tokens_entrada": 0, "tokens_saida": 0})
+            for campo, valor in dados.items():
+                total[campo] += valor
+            amostras[etapa] += latencias.get((etapa, usuario), [])
+
+        for etapa, total in por_etapa.items():
+            total["media"] = total["segundos"] / total["chamadas"] if total["chamadas"] else 0.0
+            total["p95"] = _percentil(amostras[etapa], 95)
+        return por_etapa
+
+    def imprimir_resumo(self, user_id: str = None):
+        por_etapa = self.resumo(user_id)
+        if not por_etapa:
+            print("   • Nenhuma chamada medida ainda")
+            return
+
+        for etapa, total in sorted(por_etapa.items()):
+            tokens = ""
+            if total["tokens_entrada"] or total["tokens_saida"]:
+                tokens = f" | tokens {total['tokens_entrada']} entrada / {total['tokens_saida']} saída"
+            erros = f" | {total['erros']} erro(s)" if total["erros"] else ""
+            print(f"   • {etapa}: {total['chamadas']} chamada(s) | média {total['media']:.2f}s"
+                  f" | p95 {total['p95']:.2f}s{tokens}{erros}")
+
+    def prometheus(self) -> str:
+        """
+        Texto no formato de exposição do Prometheus.
+        """
+        with self._lock:
+            itens = sorted((chave, dict(dados)) for chave, dados in self._dados.items())
+
+        def rotulos(etapa, usuario, **extras):
+            pares = {"etapa": etapa, "user_id": usuario, **extras}
+            return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares.items()) + "}"
+
+        linhas = [
+            "# HELP agentes_latencia_segundos Duração das chamadas por etapa e usuário",
+            "# TYPE agentes_latencia_segundos summary",
+        ]
+        for (etapa, usuario), dados in itens:
+            linhas.append(f"agentes_latencia_segundos_sum{rotulos(etapa, usuario)} {dados['segundos']:.6f}")
+            linhas.append(f"agentes_latencia_segundos_count{rotulos(etapa, usuario)} {dados['chamadas']}")
+
+        linhas += ["# HELP agentes_tokens_total Tokens usados por etapa e usuário",
+                   "# TYPE agentes_tokens_total counter"]
+        for (etapa, usuario), dados in itens:
+            linhas.append(f"agentes_tokens_total{rotulos(etapa, usuario, tipo='entrada')} {dados['tokens_entrada']}")
+            linhas.append(f"agentes_tokens_total{rotulos(etapa, usuario, tipo='saida')} {dados['tokens_saida']}")
+
+        linhas += ["# HELP agentes_erros_total Chamadas que terminaram com erro",
+                   "# TYPE agentes_erros_total counter"]
+        for (etapa, usuario), dados in itens:
+            linhas.append(f"agentes_erros_total{rotulos(etapa, usuario)} {dados['erros']}")
+
+        return "\n".join(linhas) + "\n"
+
+
+metricas = ColetorMetricas()
+
+
+# Servidor /metrics (Prometheus) - só biblioteca padrão
+
+class _ManipuladorMetricas(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path != "/metrics":
+            self.send_error(404, "Use /metrics")
+            return
+        corpo = metricas.prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass  # sem uma linha no terminal a cada coleta do Prometheus
+
+
+_servidor = None
+_lock_servidor = threading.Lock()
+
+
+def iniciar_servidor_metricas(porta: int = PORTA_METRICAS):
+    """
+    Sobe o endpoint /metrics numa thread (uma vez por processo). Porta 0 = não sobe.
+    """
+    global _servidor
+
+    if not porta:
+        return None
+    with _lock_servidor:
+        if _servidor is None:
+            _servidor = ThreadingHTTPServer(("0.0.0.0", porta), _ManipuladorMetricas)
+            threading.Thread(target=_servidor.serve_forever, name="metricas", daemon=True).start()
+            print(f"📈 Métricas em http://localhost:{porta}/metrics")
+    return _servidor
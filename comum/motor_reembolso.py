@@ -0,0 +1,171 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+from politica import carregar_fatos
+
+
+# Motor de cálculo de reembolso compartilhado (A1 - agente, A3 - estornos)
+#
+# Regra da política (os números vêm do texto da política, ver politica.py):
+#   - Imposto de 15% sobre o valor do reembolso
+#   - Se o valor final (descontando o imposto) passar de R$ 1.000,00, precisa de aprovação do Financeiro
+#
+# Todas as contas são feitas em centavos inteiros (nada de 0.1 + 0.2 = 0.30000000000000004).
+# A formatação em reais só acontece na saída (formatar_reais).
+
+_fatos = carregar_fatos()
+PERCENTUAL_IMPOSTO = _fatos.percentual_imposto
+TETO_APROVACAO = _fatos.teto_aprovacao
+
+
+def para_centavos(valor) -> int:
+    """
+    Converte um valor em reais (float, int, str ou Decimal) para centavos inteiros.
+    """
+    reais = Decimal(str(valor)).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return int(reais * 100)
+
+
+def _pontos_base(percentual) -> int:
+    # 15% -> 1500 pontos base (permite percentuais com até 2 casas, ex.: 12,5%)
+    return int(Decimal(str(percentual)) * 100)
+
+
+def _imposto_centavos(centavos: int, pontos_base: int) -> int:
+    # Arredonda meio centavo para cima (ROUND_HALF_UP), só com inteiros
+    return (centavos * pontos_base + 5000) // 10000
+
+
+def calcular(valor, percentual_imposto=PERCENTUAL_IMPOSTO, teto=TETO_APROVACAO) -> dict:
+    """
+    Calcula o reembolso de um único valor.
+    Retorna tudo em centavos + a flag de aprovação.
+    """
+    centavos = para_centavos(valor)
+    imposto = _imposto_centavos(centavos, _pontos_base(percentual_imposto))
+    liquido = centavos - imposto
+
+    return {
+        "valor_centavos": centavos,
+        "imposto_centavos": imposto,
+        "liquido_centavos": liquido,
+        "precisa_aprovacao": liquido > para_centavos(teto),
+    }
+
+
+def precisa_aprovacao(valor, percentual_imposto=PERCENTUAL_IMPOSTO, teto=TETO_APROVACAO) -> bool:
+    return calcular(valor, percentual_imposto, teto)["precisa_aprovacao"]
+
+
+def calcular_lote(valores, percentual_imposto=PERCENTUAL_IMPOSTO, teto=TETO_APROVACAO) -> dict:
+    """
+    Calcula o reembolso de um array inteiro de valores numa única passada vetorizada (NumPy).
+
+    `valores` pode ser lista, array NumPy ou coluna do pandas, em reais.
+    Retorna um dict de arrays int64 em centavos + array booleano de aprovação,
+    com o mesmo resultado de calcular() item a item.
+    """
+    import numpy as np
+
+    reais = np.asarray(valores, dtype=np.float64)
+    if not np.all(np.isfinite(reais)):
+        raise ValueError("Valores inválidos no lote (NaN ou infinito)")
+
+    # Meio centavo sobe, longe do zero (ROUND_HALF_UP, igual a para_centavos)
+    escala = np.abs(reais) * 100
+    centavos = (np.sign(reais) * np.floor(escala + 0.5)).astype(np.int64)
+
+    # Perto do meio centavo o float engana (1.005 * 100 = 100.49999999999999):
+    # esses poucos casos passam pelo Decimal, exatamente como no calcular()
+    duvidosos = np.flatnonzero(np.abs(escala - np.floor(escala) - 0.5) < 1e-6)
+    for i in duvidosos:
+        centavos.flat[i] = para_centavos(reais.flat[i])
+
+    imposto = (centavos * _pontos_base(percentual_imposto) + 5000) // 10000
+    liquido = centavos - imposto
+
+    return {
+        "valor_centavos": centavos,
+        "imposto_centavos": imposto,
+        "liquido_centavos": liquido,
+        "precisa_aprovacao": liquido > para_centavos(teto),
+    }
+
+
+def conferir_lote(valores=("0.005", "0.125", "1.005", "2.675", "-0.125", "-1.005", "0.1249999",
+                           "1000.005", "1176.47", "1176.475", "0", "12345678.905")) -> None:
+    """
+    Confere que calcular_lote() dá exatamente o mesmo resultado de calcular()
+    nos valores de fronteira do arredondamento.
+    """
+    lote = calcular_lote([float(v) for v in valores])
+    for i, valor in enumerate(valores):
+        um = calcular(float(valor))
+        assert lote["valor_centavos"][i] == um["valor_centavos"], valor
+        assert lote["imposto_centavos"][i] == um["imposto_centavos"], valor
+        assert lote["liquido_centavos"][i] == um["liquido_centavos"], valor
+        assert lote["precisa_aprovacao"][i] == um["precisa_aprovacao"], valor
+
+    for invalido in (float("nan"), float("inf")):
+        try:
+            calcular_lote([1.0, invalido])
+        except ValueError:
+            continue
+        raise AssertionError(f"calcular_lote aceitou {invalido}")
+
+
+def calcular_arquivo(caminho: str, coluna: str = "valor", caminho_saida: str = None,
+                     percentual_imposto=PERCENTUAL_IMPOSTO, teto=TETO_APROVACAO):
+    """
+    Lê uma coluna de valores de um CSV ou Parquet (pandas), calcula tudo de uma vez
+    e acrescenta as colunas do resultado. Se `caminho_saida` for informado, grava o arquivo.
+
+    Colunas adicionadas:
+      - imposto_centavos, valor_liquido_centavos (exatas)
+      - imposto, valor_liquido (em reais, só para leitura)
+      - precisa_aprovacao
+    """
+    import pandas as pd
+
+    if caminho.endswith(".parquet"):
+        tabela = pd.read_parquet(caminho)
+    else:
+        tabela = pd.read_csv(caminho)
+
+    resultado = calcular_lote(tabela[coluna].to_numpy(), percentual_imposto, teto)
+
+    tabela["imposto_centavos"] = resultado["imposto_centavos"]
+    tabela["valor_liquido_centavos"] = resultado["liquido_centavos"]
+    tabela["imposto"] = resultado["imposto_centavos"] / 100
+    tabela["valor_liquido"] = resultado["liquido_centavos"] / 100
+    tabela["precisa_aprovacao"] = resultado["precisa_aprovacao"]
+
+    if caminho_saida:
+        if caminho_saida.endswith(".parquet"):
+            tabela.to_parquet(caminho_saida, index=False)
+        else:
+            tabela.to_csv(caminho_saida, index=False)
+
+    return tabela
+
+
+def formatar_reais(centavos: int) -> str:
+    """
+    125000 -> "R$ 1.250,00"
+    """
+    sinal = "-" if centavos < 0 else ""
+    reais, resto = divmod(abs(int(centavos)), 100)
+    inteiro = f"{reais:,}".replace(",", ".")
+    return f"{sinal}R$ {inteiro},{resto:02d}"
+
+
+def formatar_percentual(percentual=PERCENTUAL_IMPOSTO) -> str:
+    """
+    Decimal("15") -> "15%", Decimal("12.5") -> "12,5%"
+    """
+    texto = format(Decimal(str(percentual)).normalize(), "f")
+    return texto.replace(".", ",") + "%"
+
+
+if __name__ == "__main__":
+    conferir_lote()
+    print("✅ calcular_lote confere com calcular")
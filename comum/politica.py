@@ -0,0 +1,102 @@
+import os
+import re
+from dataclasses import dataclass
+from decimal import Decimal
+from functools import lru_cache
+from typing import Dict, Optional
+
+
+# Fatos da política de reembolso (A1 - agente, A3 - estornos, motor_reembolso)
+#
+# Os números da política (prazos por causa, imposto, teto de aprovação, prazos de
+# pagamento) são lidos UMA vez do politica_reembolso_v1.0.txt quando o módulo é
+# usado pela primeira vez e ficam num objeto em memória. Assim:
+#   - O motor de cálculo não tem mais 15% / R$ 1.000,00 escritos no código
+#   - Perguntas como "qual o prazo para arrependimento?" são respondidas na hora,
+#     sem busca na Knowledge e sem LLM
+#   - Mudou a política? Mudou o .txt, e todo mundo lê o mesmo valor
+#
+# Se o texto não tiver algum fato obrigatório, carregar_fatos() levanta ValueError:
+# melhor parar do que calcular com um número desatualizado.
+
+ARQUIVO_POLITICA = os.getenv(
+    "POLITICA_ARQUIVO",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "A1", "politica_reembolso_v1.0.txt"),
+)
+
+
+@dataclass(frozen=True)
+class FatosPolitica:
+    prazos_dias: Dict[str, int]              # causa da devolução -> prazo máximo em dias
+    percentual_imposto: Decimal              # 15 -> 15%
+    teto_aprovacao: Decimal                  # valor final acima disso precisa de aprovação
+    aprovador: str                           # quem aprova acima do teto ("Financeiro")
+    contagem_prazo: Optional[str] = None     # a partir de quando o prazo conta
+    regra_evidencias: Optional[str] = None   # como a devolução é avaliada
+    evidencia_invalida: Optional[str] = None # o que fazer com evidências sem relação com o produto
+    procedimento: Optional[str] = None       # como pedir o reembolso
+    dias_confirmacao: Optional[int] = None   # espera máxima pela confirmação
+    dias_uteis_pagamento: Optional[int] = None
+    forma_pagamento: Optional[str] = None
+
+    def prazo(self, causa: str) -> Optional[int]:
+        return self.prazos_dias.get(causa.lower())
+
+
+def _reais(texto: str) -> Decimal:
+    # "1.000,00" -> Decimal("1000.00")
+    return Decimal(texto.replace(".", "").replace(",", "."))
+
+
+def _buscar(padrao: str, texto: str):
+    encontrado = re.search(padrao, texto, re.IGNORECASE)
+    return encontrado.group(1).strip() if encontrado else None
+
+
+def extrair_fatos(texto: str) -> FatosPolitica:
+    """
+    Extrai os fatos do texto da política. Levanta ValueError se faltar prazo, imposto ou teto.
+    """
+    # As frases quebram linha no meio ("exige\naprovação do Financeiro"): junta tudo numa linha só
+    corrido = re.sub(r"\s+", " ", texto)
+
+    prazos = {
+        causa.lower(): int(dias)
+        for causa, dias in re.findall(r"Causa da devolução:\s*([^\s(]+)\s*\(máximo de (\d+) dias\)",
+                                      corrido, re.IGNORECASE)
+    }
+    imposto = _buscar(r"imposto de (\d+(?:,\d+)?)\s*%", corrido)
+    teto = _buscar(r"maior que R\$\s*(\d{1,3}(?:\.\d{3})*,\d{2})", corrido)
+    aprovador = _buscar(r"exige aprovação d[oa] (\w+)", corrido)
+
+    faltando = [nome for nome, valor in [("prazos por causa", prazos), ("imposto", imposto),
+                                         ("teto de aprovação", teto), ("aprovador", aprovador)] if not valor]
+    if faltando:
+        raise ValueError(f"Política sem {', '.join(faltando)} - confira o texto da política")
+
+    dias_confirmacao = _buscar(r"aguardar até (\d+) dias", corrido)
+    dias_pagamento = _buscar(r"reembolso será realizado em até (\d+) dias úteis", corrido)
+
+    return FatosPolitica(
+        prazos_dias=prazos,
+        percentual_imposto=Decimal(imposto.replace(",", ".")),
+        teto_aprovacao=_reais(teto),
+        aprovador=aprovador,
+        contagem_prazo=_buscar(r"contado a partir de (.+?)\.", corrido),
+        regra_evidencias=_buscar(r"(A análise será feita a partir de evidências[^.]*\.)", corrido),
+        evidencia_invalida=_buscar(r"(Se o cliente enviar evidências[^.]*\.)", corrido),
+        procedimento=_buscar(r"O cliente deve (preencher[^.]*)\.", corrido),
+        dias_confirmacao=int(dias_confirmacao) if dias_confirmacao else None,
+        dias_uteis_pagamento=int(dias_pagamento) if dias_pagamento else None,
+        forma_pagamento=_buscar(r"dias úteis via (\w+)", corrido),
+    )
+
+
+@lru_cache(maxsize=None)
+def carregar_fatos(caminho: str = ARQUIVO_POLITICA) -> FatosPolitica:
+    """
+    Lê e extrai os fatos da política (uma vez por arquivo, depois vem da memória).
+    """
+    with open(caminho, "r", encoding="utf-8") as f:
+        return extrair_fatos(f.read())
+